@@ -1,38 +1,59 @@
 """Analytics utilities for spending summaries.
 
 This module computes monthly totals, detects recurring
-charges, highlights overspending patterns and generates
+charges, highlights overspending patterns and anomalies and generates
 summary outputs validated against the summary_v1 schema.
+
+Transactions are converted once into :class:`TransactionColumns` and
+every aggregate is a vectorised group-by over those arrays.  Each public
+function also accepts the raw transaction dicts.
 """
 from __future__ import annotations
 
+import contextlib
 import csv
+import io
 import json
 import math
-from collections import defaultdict
+import os
+import tempfile
 from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
-from statistics import mean, median, pstdev
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bankcleanr import registry
 
-import jsonschema
+from .anomalies import detect_anomalies
+from .columnar import (
+    CREDIT,
+    DEBIT,
+    TransactionColumns,
+    as_columns,
+    exact_group_sum,
+    first_index,
+    group_sum,
+    pence_moments,
+    segment_starts,
+)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-CATEGORIES_PATH = BASE_DIR / "data" / "taxonomy" / "categories.json"
+CATEGORIES_PATH = registry.TAXONOMY_PATH
 SCHEMA_PATH = BASE_DIR / "schemas" / "summary_v1.json"
 
 
 def load_categories(path: Path = CATEGORIES_PATH) -> List[str]:
-    """Load canonical category list from JSON file."""
-    with path.open() as f:
-        return json.load(f)
+    """Load canonical category list from the shared taxonomy cache."""
+    return registry.load_categories(path)
 
 
 def validate_rule_categories(
     rules: Iterable[Dict[str, Any] | Any], categories: Optional[List[str]] = None
 ) -> None:
     """Ensure rules use categories from the sanctioned taxonomy."""
-    categories_set = set(categories or load_categories())
+    categories_set = set(categories) if categories else registry.category_set()
 
     def _cat(rule: Any) -> str | None:
         if isinstance(rule, dict):
@@ -55,135 +76,301 @@ def _signed_amount(tx: Dict[str, Any]) -> float:
     return amt
 
 
-def compute_monthly_totals(transactions: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+def compute_monthly_totals(
+    transactions: Iterable[Dict[str, Any]] | TransactionColumns,
+) -> Dict[str, float]:
     """Aggregate transaction amounts per YYYY-MM."""
-    totals: Dict[str, float] = defaultdict(float)
-    for tx in transactions:
-        month = tx["date"][:7]
-        totals[month] += _signed_amount(tx)
-    return dict(totals)
+    cols = as_columns(transactions)
+    size = len(cols.month_labels)
+    sums = group_sum(cols.months, cols.amounts, size)
+    first = first_index(cols.months, size)
+    return {cols.month_labels[m]: float(sums[m]) for m in np.argsort(first, kind="stable")}
+
+
+CADENCE_BANDS = (
+    ("weekly", 6, 8),
+    ("monthly", 28, 31),
+    ("quarterly", 85, 100),
+    ("yearly", 355, 375),
+)
 
 
 def _determine_cadence(days: int) -> Optional[str]:
-    if 6 <= days <= 8:
-        return "weekly"
-    if 28 <= days <= 31:
-        return "monthly"
-    if 85 <= days <= 100:
-        return "quarterly"
-    if 355 <= days <= 375:
-        return "yearly"
+    for name, low, high in CADENCE_BANDS:
+        if low <= days <= high:
+            return name
     return None
 
 
-def detect_recurring(
-    transactions: Iterable[Dict[str, Any]], amount_tolerance: float = 0.1
+def _cadence_codes(days: np.ndarray) -> np.ndarray:
+    """Vectorised :func:`_determine_cadence`; ``-1`` for no cadence."""
+    codes = np.full(days.shape, -1, dtype=np.int64)
+    for i, (_, low, high) in enumerate(CADENCE_BANDS):
+        codes[(days >= low) & (days <= high)] = i
+    return codes
+
+
+def _segment_percentile(
+    values: np.ndarray, starts: np.ndarray, counts: np.ndarray, pct: float
+) -> np.ndarray:
+    """Linear-interpolated percentile of each sorted segment of ``values``."""
+    k = (counts - 1) * pct / 100
+    f = np.floor(k).astype(np.int64)
+    c = np.ceil(k).astype(np.int64)
+    low = values[starts + f]
+    high = values[starts + c]
+    return np.where(f == c, low, low + (high - low) * (k - f))
+
+
+def _group_median(values: np.ndarray, groups: np.ndarray, size: int) -> np.ndarray:
+    """Median of ``values`` per group; ``nan`` for empty groups."""
+    counts = np.bincount(groups, minlength=size)
+    order = np.lexsort((values, groups))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+    out = np.full(size, np.nan)
+    has = counts > 0
+    out[has] = _segment_percentile(values[order], starts[has], counts[has], 50)
+    return out
+
+
+# Interval spread (median absolute deviation) allowed for a regular series:
+# the larger of a fixed number of days and a fraction of the median interval.
+INTERVAL_MAD_DAYS = 2.0
+INTERVAL_MAD_FRACTION = 0.1
+
+# No single charge may differ from the median amount by more than this
+# fraction.  With only a few charges the MAD ignores one outlier entirely,
+# so 10/10/50 would otherwise pass as a stable series.
+MAX_AMOUNT_DEVIATION = 0.5
+
+# Most recent charges per merchant whose intervals and amounts feed the
+# median/MAD checks.  Counts, averages and first/last dates use every charge.
+RECURRING_WINDOW = 24
+
+
+def recurring_moments(count: int, total: Decimal, total_sq: Decimal) -> Tuple[float, float]:
+    """Mean and population standard deviation from exact running sums."""
+    mean = total / count
+    variance = (total_sq * count - total * total) / (count * count)
+    return float(mean), float(variance.sqrt()) if variance > 0 else 0.0
+
+
+def _amount_sums(
+    group: np.ndarray, amounts: np.ndarray, size: int
+) -> Tuple[List[Decimal], List[Decimal]]:
+    """Per-group sums of ``amounts`` and of their squares as decimals."""
+    exact = pence_moments(group, amounts, size)
+    if exact is not None:
+        sums, squares = exact
+        return (
+            [Decimal(int(v)) / 100 for v in sums],
+            [Decimal(int(v)) / 10000 for v in squares],
+        )
+    sums = group_sum(group, amounts, size)
+    squares = group_sum(group, amounts * amounts, size)
+    return [Decimal(float(v)) for v in sums], [Decimal(float(v)) for v in squares]
+
+
+def recurring_from_windows(
+    merchants: Sequence[str],
+    counts: np.ndarray,
+    first_seen: Sequence[str],
+    totals: Sequence[Decimal],
+    totals_sq: Sequence[Decimal],
+    group: np.ndarray,
+    days: np.ndarray,
+    amounts: np.ndarray,
+    dates: Sequence[str],
+    amount_tolerance: float = 0.1,
 ) -> List[Dict[str, Any]]:
-    """Identify recurring transactions grouped by merchant.
+    """Classify merchants from their recent charges and running totals.
 
-    A recurring series requires at least three transactions with a
-    recognised cadence and amounts within ``amount_tolerance`` of the
-    average amount.
+    ``merchants``, ``counts``, ``first_seen``, ``totals`` and ``totals_sq``
+    describe every charge of each merchant.  ``group``, ``days``,
+    ``amounts`` and ``dates`` list the charges in each merchant's window,
+    ordered by merchant and then date.  Results keep merchant order.
     """
-
-    by_merchant: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-    for tx in transactions:
-        by_merchant[tx["merchant_signature"]].append(tx)
-
-    recurring: List[Dict[str, Any]] = []
-    for merchant, txs in by_merchant.items():
-        txs.sort(key=lambda t: t["date"])
-        if len(txs) < 3:
-            continue
-
-        intervals = [
-            (datetime.fromisoformat(txs[i]["date"]) - datetime.fromisoformat(txs[i - 1]["date"]))
-            .days
-            for i in range(1, len(txs))
-        ]
-        cadence = _determine_cadence(round(mean(intervals)))
-        if not cadence:
-            continue
-
-        amounts = [abs(_signed_amount(t)) for t in txs]
-        avg_amount = mean(amounts)
-        if any(abs(a - avg_amount) > amount_tolerance * abs(avg_amount) for a in amounts):
-            continue
-
-        recurring.append(
+    n_groups = len(merchants)
+    if not n_groups or not group.size:
+        return []
+    window_counts = np.bincount(group, minlength=n_groups)
+    ends = np.cumsum(window_counts) - 1
+
+    # intervals between consecutive charges of the same merchant
+    gaps = np.diff(days)
+    gap_group = group[1:]
+    valid = (gap_group == group[:-1]) & (gaps > 0)
+    gaps = gaps[valid].astype(np.float64)
+    gap_group = gap_group[valid]
+    n_gaps = np.bincount(gap_group, minlength=n_groups)
+    interval = _group_median(gaps, gap_group, n_groups)
+    interval_mad = _group_median(np.abs(gaps - interval[gap_group]), gap_group, n_groups)
+
+    eligible = (counts >= 3) & (n_gaps >= 2)
+    rounded = np.rint(np.nan_to_num(interval)).astype(np.int64)
+    cadence = np.where(eligible, _cadence_codes(rounded), -1)
+    regular = interval_mad <= np.maximum(INTERVAL_MAD_DAYS, INTERVAL_MAD_FRACTION * interval)
+
+    medians = _group_median(amounts, group, n_groups)
+    deviation = np.abs(amounts - medians[group])
+    amount_mad = _group_median(deviation, group, n_groups)
+    max_deviation = np.zeros(n_groups)
+    np.maximum.at(max_deviation, group, deviation)
+    stable = (amount_mad <= amount_tolerance * np.abs(medians)) & (
+        max_deviation <= MAX_AMOUNT_DEVIATION * np.abs(medians)
+    )
+
+    out: List[Dict[str, Any]] = []
+    for g in np.flatnonzero((cadence >= 0) & regular & stable).tolist():
+        last = int(ends[g])
+        avg, stddev = recurring_moments(int(counts[g]), totals[g], totals_sq[g])
+        out.append(
             {
-                "merchant": merchant,
-                "cadence": cadence,
-                "avg_amount": avg_amount,
-                "median_amount": median(amounts),
-                "amount_stddev": pstdev(amounts) if len(amounts) > 1 else 0.0,
-                "count": len(txs),
-                "first_seen": txs[0]["date"],
-                "last_seen": txs[-1]["date"],
-                "last_amount": amounts[-1],
+                "merchant": merchants[g],
+                "cadence": CADENCE_BANDS[cadence[g]][0],
+                "avg_amount": avg,
+                "median_amount": float(medians[g]),
+                "amount_stddev": stddev,
+                "count": int(counts[g]),
+                "first_seen": first_seen[g],
+                "last_seen": dates[last],
+                "last_amount": float(amounts[last]),
             }
         )
+    return out
 
-    return recurring
 
+def detect_recurring(
+    transactions: Iterable[Dict[str, Any]] | TransactionColumns,
+    amount_tolerance: float = 0.1,
+) -> List[Dict[str, Any]]:
+    """Identify recurring transactions grouped by merchant.
 
-def _percentile(data: List[float], pct: float) -> float:
-    if not data:
-        return 0.0
-    data_sorted = sorted(data)
-    k = (len(data_sorted) - 1) * pct / 100
-    f = math.floor(k)
-    c = math.ceil(k)
-    if f == c:
-        return data_sorted[int(k)]
-    return data_sorted[f] + (data_sorted[c] - data_sorted[f]) * (k - f)
+    Works on integer day numbers for all merchants at once.  For each
+    merchant the gaps between its last :data:`RECURRING_WINDOW` charge days
+    are summarised by their median and median absolute deviation (MAD):
+
+    * the median interval, rounded to whole days, must fall in one of the
+      :data:`CADENCE_BANDS`;
+    * the interval MAD must be within ``INTERVAL_MAD_DAYS`` or
+      ``INTERVAL_MAD_FRACTION`` of the median, so a single missed month or
+      a stray extra charge does not break the series;
+    * the MAD of the amounts must be within ``amount_tolerance`` of the
+      median amount, so a one-off price change is tolerated, but no charge
+      may differ from the median by more than ``MAX_AMOUNT_DEVIATION``, so
+      a one-off spike is not reported as a recurring increase.
+
+    Same-day repeats are treated as duplicates and ignored for the interval
+    statistics.  At least three charges on two or more distinct intervals
+    are required.
+    """
+    cols = as_columns(transactions)
+    n_sigs = len(cols.signature_labels)
+    if not len(cols):
+        return []
+
+    # rows ordered by merchant, then date, then original position
+    order = np.lexsort((cols.days, cols.signatures))
+    sigs = cols.signatures[order]
+    amounts = np.abs(cols.amounts[order])
+    dates = cols.dates[order]
+    starts = segment_starts(sigs)
+    n_groups = starts.shape[0]
+    counts = np.diff(np.append(starts, sigs.shape[0]))
+    ends = starts + counts - 1
+    group = np.repeat(np.arange(n_groups), counts)
+    totals, totals_sq = _amount_sums(group, amounts, n_groups)
+
+    window = ends[group] - np.arange(sigs.shape[0]) < RECURRING_WINDOW
+    recurring = recurring_from_windows(
+        [cols.signature_labels[sig] for sig in sigs[starts]],
+        counts,
+        dates[starts].tolist(),
+        totals,
+        totals_sq,
+        group[window],
+        cols.days[order][window],
+        amounts[window],
+        dates[window].tolist(),
+        amount_tolerance,
+    )
+    first = first_index(cols.signatures, n_sigs)
+    codes = {label: code for code, label in enumerate(cols.signature_labels)}
+    return sorted(recurring, key=lambda rec: first[codes[rec["merchant"]]])
+
+
+def _pair_totals(
+    outer: np.ndarray, months: np.ndarray, n_months: int, amounts: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Sum ``amounts`` per (outer, month) pair.
+
+    Returns the present pairs sorted by (outer, month) as outer codes,
+    month codes, totals and the row index at which each pair first occurs.
+    """
+    keys = outer * max(n_months, 1) + months
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    totals = exact_group_sum(inverse, amounts, pairs.shape[0])
+    first = first_index(inverse, pairs.shape[0])
+    return pairs // max(n_months, 1), pairs % max(n_months, 1), totals, first
 
 
 def detect_overspending(
-    transactions: Iterable[Dict[str, Any]], recurring: Optional[List[Dict[str, Any]]] = None
+    transactions: Iterable[Dict[str, Any]] | TransactionColumns,
+    recurring: Optional[List[Dict[str, Any]]] = None,
 ) -> List[str]:
     """Flag overspending based on three heuristics."""
+    cols = as_columns(transactions)
     highlights: List[str] = []
+    magnitudes = np.abs(cols.amounts)
+    n_months = len(cols.month_labels)
 
     # 1. Category month-over-month increase ≥ 30%
-    cat_month: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
-    for tx in transactions:
-        cat = tx.get("category")
-        if not cat:
-            continue
-        month = tx["date"][:7]
-        cat_month[cat][month] += abs(_signed_amount(tx))
-
-    for cat, months in cat_month.items():
-        items = sorted(months.items())
-        if len(items) >= 3:
-            for i in range(1, len(items)):
-                prev_total = items[i - 1][1]
-                curr_total = items[i][1]
-                if prev_total != 0 and curr_total >= 1.3 * prev_total:
-                    pct = (curr_total - prev_total) / abs(prev_total) * 100
-                    highlights.append(
-                        f"Category {cat} up {pct:.0f}% in {items[i][0]}"
-                    )
-                    break
+    has_cat = cols.categories >= 0
+    if has_cat.any():
+        cats, months, totals, first = _pair_totals(
+            cols.categories[has_cat], cols.months[has_cat], n_months, magnitudes[has_cat]
+        )
+        starts = segment_starts(cats)
+        counts = np.diff(np.append(starts, cats.shape[0]))
+        prev = np.concatenate(([0.0], totals[:-1]))
+        same_cat = np.concatenate(([False], cats[1:] == cats[:-1]))
+        jumps = same_cat & (prev != 0) & (totals >= 1.3 * prev)
+        jumps &= np.repeat(counts >= 3, counts)
+        cat_first = np.minimum.reduceat(first, starts)
+        for j in np.argsort(cat_first, kind="stable"):
+            hits = np.flatnonzero(jumps[starts[j] : starts[j] + counts[j]])
+            if not hits.size:
+                continue
+            i = starts[j] + hits[0]
+            pct = (totals[i] - prev[i]) / abs(prev[i]) * 100
+            highlights.append(
+                f"Category {cols.category_labels[cats[i]]} up {pct:.0f}% in {cols.month_labels[months[i]]}"
+            )
 
     # 2. Merchant monthly total exceeds 75th percentile
-    merch_month: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
-    for tx in transactions:
-        merchant = tx["merchant_signature"]
-        month = tx["date"][:7]
-        merch_month[merchant][month] += abs(_signed_amount(tx))
-
-    for merchant, months in merch_month.items():
-        totals = list(months.values())
-        if len(totals) >= 3:
-            p75 = _percentile(totals, 75)
-            for month, total in months.items():
-                if total > p75:
-                    highlights.append(
-                        f"Merchant {merchant} spent {total:.2f} in {month} exceeding 75th percentile"
-                    )
-                    break
+    if len(cols):
+        sigs, months, totals, first = _pair_totals(
+            cols.signatures, cols.months, n_months, magnitudes
+        )
+        starts = segment_starts(sigs)
+        counts = np.diff(np.append(starts, sigs.shape[0]))
+        group = np.repeat(np.arange(starts.shape[0]), counts)
+        by_total = np.lexsort((totals, group))
+        p75 = _segment_percentile(totals[by_total], starts, counts, 75)
+        over = (totals > p75[group]) & (counts[group] >= 3)
+        # first qualifying month per merchant, in the order months were seen
+        none = np.iinfo(np.int64).max
+        first_over = np.full(starts.shape[0], none)
+        np.minimum.at(first_over, group[over], first[over])
+        hits = np.flatnonzero(over & (first == first_over[group]))
+        merchant_first = np.minimum.reduceat(first, starts)
+        for i in hits[np.argsort(merchant_first[group[hits]], kind="stable")]:
+            total = float(totals[i])
+            highlights.append(
+                f"Merchant {cols.signature_labels[sigs[i]]} spent {total:.2f} in "
+                f"{cols.month_labels[months[i]]} exceeding 75th percentile"
+            )
 
     # 3. Recurring charge increased by ≥15% vs median
     if recurring:
@@ -197,57 +384,146 @@ def detect_overspending(
     return highlights
 
 
+def overspending_from_totals(
+    category_months: Mapping[str, Mapping[str, float]],
+    merchant_months: Mapping[str, Mapping[str, float]],
+    recurring: Optional[List[Dict[str, Any]]] = None,
+) -> List[str]:
+    """Apply the :func:`detect_overspending` heuristics to pre-aggregated totals.
+
+    ``category_months`` and ``merchant_months`` map each category or
+    merchant to its absolute spend per YYYY-MM.  Outer and inner mappings
+    must be in first-seen order.
+    """
+    highlights: List[str] = []
+    for cat, months in category_months.items():
+        items = sorted(months.items())
+        if len(items) < 3:
+            continue
+        for (_, prev_total), (month, curr_total) in zip(items, items[1:]):
+            if prev_total != 0 and curr_total >= 1.3 * prev_total:
+                pct = (curr_total - prev_total) / abs(prev_total) * 100
+                highlights.append(f"Category {cat} up {pct:.0f}% in {month}")
+                break
+
+    for merchant, months in merchant_months.items():
+        totals = list(months.values())
+        if len(totals) < 3:
+            continue
+        ordered = sorted(totals)
+        k = (len(ordered) - 1) * 75 / 100
+        f, c = math.floor(k), math.ceil(k)
+        p75 = ordered[f] if f == c else ordered[f] + (ordered[c] - ordered[f]) * (k - f)
+        for month, total in months.items():
+            if total > p75:
+                highlights.append(
+                    f"Merchant {merchant} spent {total:.2f} in {month} exceeding 75th percentile"
+                )
+                break
+
+    for rec in recurring or []:
+        if rec["last_amount"] > 1.15 * rec["median_amount"]:
+            pct = (rec["last_amount"] / rec["median_amount"] - 1) * 100
+            highlights.append(f"Recurring {rec['merchant']} increased {pct:.0f}%")
+    return highlights
+
+
 def generate_summary(
-    transactions: List[Dict[str, Any]],
+    transactions: List[Dict[str, Any]] | TransactionColumns,
     job_id: str,
     user_id: str,
     period: Dict[str, str],
     currency: str = "GBP",
     output_dir: Path | None = None,
+    prefix: str = "",
+    write: bool = True,
 ) -> Dict[str, Any]:
-    """Generate summary_v1 JSON and CSV outputs for the given transactions."""
+    """Generate summary_v1 JSON and CSV outputs for the given transactions.
+
+    Files are written to ``output_dir`` as ``{prefix}summary_v1.json`` and
+    ``{prefix}summary.csv``.  With ``write=False`` nothing touches disk;
+    use :func:`render_summary` for the file contents.
+    """
     output_dir = output_dir or Path.cwd()
 
-    categories = load_categories()
+    categories = registry.load_json(CATEGORIES_PATH)
+    cols = as_columns(transactions)
 
-    income = sum(_signed_amount(t) for t in transactions if t.get("type") == "credit")
-    expenses = sum(_signed_amount(t) for t in transactions if t.get("type") == "debit")
+    by_type = exact_group_sum(cols.types.astype(np.int64) + 1, cols.amounts, 3)
+    income = float(by_type[CREDIT + 1])
+    expenses = float(by_type[DEBIT + 1])
     totals = {"income": income, "expenses": expenses, "net": income + expenses}
 
     # category breakdown
-    cat_totals: Dict[str, Dict[str, Any]] = {
-        c: {"total": 0.0, "count": 0, "merchants": set()} for c in categories
-    }
-    for tx in transactions:
-        cat = tx.get("category")
-        if cat in cat_totals:
-            amt = _signed_amount(tx)
-            cat_totals[cat]["total"] += amt
-            cat_totals[cat]["count"] += 1
-            cat_totals[cat]["merchants"].add(tx["merchant_signature"])
-
-    categories_out = [
-        {
-            "name": name,
-            "total": data["total"],
-            "count": data["count"],
-            "sample_merchants": sorted(list(data["merchants"]))[:3],
-        }
-        for name, data in cat_totals.items()
-        if data["count"] > 0
-    ]
-
-    recurring = detect_recurring(transactions)
-    overspending = detect_overspending(transactions, recurring)
-
-    summary: Dict[str, Any] = {
+    n_cats = len(cols.category_labels)
+    known = cols.categories >= 0
+    cat_codes = cols.categories[known]
+    cat_sums = exact_group_sum(cat_codes, cols.amounts[known], n_cats)
+    cat_counts = np.bincount(cat_codes, minlength=n_cats)
+    # unique (category, merchant) pairs, sorted so merchants come in name order
+    n_sigs = max(len(cols.signature_labels), 1)
+    pairs = np.unique(cat_codes * n_sigs + cols.signatures[known])
+    pair_cats = pairs // n_sigs
+    pair_sigs = pairs % n_sigs
+
+    codes = {name: code for code, name in enumerate(cols.category_labels)}
+    categories_out = []
+    for name in categories:
+        code = codes.get(name)
+        if code is None:
+            continue
+        lo, hi = np.searchsorted(pair_cats, [code, code + 1])
+        categories_out.append(
+            {
+                "name": name,
+                "total": float(cat_sums[code]),
+                "count": int(cat_counts[code]),
+                "sample_merchants": [
+                    cols.signature_labels[sig] for sig in pair_sigs[lo : min(hi, lo + 3)]
+                ],
+            }
+        )
+
+    recurring = detect_recurring(cols)
+    overspending = detect_overspending(cols, recurring)
+    anomalies = detect_anomalies(cols)
+
+    summary = build_summary_document(
+        job_id,
+        user_id,
+        period,
+        currency,
+        totals,
+        categories_out,
+        recurring,
+        overspending,
+        anomalies,
+    )
+    if write:
+        write_summary(summary, output_dir, prefix)
+    return summary
+
+
+def build_summary_document(
+    job_id: str,
+    user_id: str,
+    period: Dict[str, str],
+    currency: str,
+    totals: Dict[str, float],
+    categories: List[Dict[str, Any]],
+    recurring: List[Dict[str, Any]],
+    overspending: List[str],
+    anomalies: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Assemble a summary_v1 document from computed aggregates."""
+    return {
         "job_id": job_id,
         "user_id": user_id,
         "period": period,
         "currency": currency,
         "generated_at": datetime.utcnow().isoformat() + "Z",
         "totals": totals,
-        "categories": categories_out,
+        "categories": categories,
         "recurring": [
             {
                 k: v
@@ -256,25 +532,54 @@ def generate_summary(
             }
             for r in recurring
         ],
-        "highlights": {"overspending": overspending, "anomalies": []},
+        "highlights": {"overspending": overspending, "anomalies": anomalies or []},
     }
 
+
+def render_summary(summary: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Validate ``summary`` against summary_v1 and return its JSON and CSV bytes."""
     if not SCHEMA_PATH.exists():
         raise FileNotFoundError(
             f"Schema file not found at {SCHEMA_PATH}."
         )
 
-    with SCHEMA_PATH.open() as f:
-        schema = json.load(f)
-    jsonschema.validate(summary, schema)
+    registry.validate(summary, registry.get_validator(SCHEMA_PATH))
 
-    # write files
-    (output_dir / "summary_v1.json").write_text(json.dumps(summary, indent=2))
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["category", "total", "count"])
+    for cat in summary["categories"]:
+        writer.writerow([cat["name"], cat["total"], cat["count"]])
+    return json.dumps(summary, indent=2).encode("utf-8"), buf.getvalue().encode("utf-8")
 
-    with (output_dir / "summary.csv").open("w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["category", "total", "count"])
-        for cat in categories_out:
-            writer.writerow([cat["name"], cat["total"], cat["count"]])
 
-    return summary
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write ``data`` to a uniquely named temp file beside ``path``, then rename it."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def summary_paths(output_dir: Path, prefix: str = "") -> Tuple[Path, Path]:
+    """Paths of the summary JSON and CSV files written with ``prefix``."""
+    return output_dir / f"{prefix}summary_v1.json", output_dir / f"{prefix}summary.csv"
+
+
+def write_summary(summary: Dict[str, Any], output_dir: Path, prefix: str = "") -> None:
+    """Validate ``summary`` and atomically write its JSON and CSV files.
+
+    The files are ``{prefix}summary_v1.json`` and ``{prefix}summary.csv``.
+    Each file is renamed into place from its own temp file, so concurrent
+    writers with different prefixes never share a path and readers never
+    see a partial file.
+    """
+    json_bytes, csv_bytes = render_summary(summary)
+    json_path, csv_path = summary_paths(output_dir, prefix)
+    atomic_write(json_path, json_bytes)
+    atomic_write(csv_path, csv_bytes)
@@ -0,0 +1,221 @@
+"""Streaming anomaly detection for summary highlights.
+
+:class:`AnomalyDetector` looks at each spending transaction once, in
+arrival order, and keeps only small online statistics per merchant,
+category and overall, so its state can be persisted and updated as new
+jobs arrive.  It flags:
+
+* amounts far from a merchant's usual charge (EWMA mean and variance, so
+  gradual price changes are absorbed);
+* unusually large spends within a category (Welford mean and variance);
+* the same charge to the same merchant repeated within a short window;
+* large first payments to merchants never seen before.
+"""
+from __future__ import annotations
+
+import math
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .columnar import TransactionColumns
+
+STATE_VERSION = 1
+
+Z_THRESHOLD = 3.0
+MIN_HISTORY = 3
+EWMA_ALPHA = 0.3
+# spread never drops below this fraction of the mean, so a merchant that
+# always charges exactly the same amount is not flagged for pennies
+MIN_RELATIVE_SPREAD = 0.1
+DUPLICATE_WINDOW_DAYS = 1
+FIRST_SEEN_MIN_AMOUNT = 100.0
+MAX_ANOMALIES = 100
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class RunningStats:
+    """Welford mean/variance alongside an exponentially weighted mean/variance."""
+
+    __slots__ = ("n", "mean", "m2", "ewma", "ewvar")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0, ewma: float = 0.0, ewvar: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.ewvar = ewvar
+
+    def update(self, x: float, alpha: float = EWMA_ALPHA) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if self.n == 1:
+            self.ewma = x
+            self.ewvar = 0.0
+        else:
+            diff = x - self.ewma
+            incr = alpha * diff
+            self.ewma += incr
+            self.ewvar = (1 - alpha) * (self.ewvar + diff * incr)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+    @property
+    def ewstd(self) -> float:
+        return math.sqrt(self.ewvar)
+
+    def to_list(self) -> List[float]:
+        return [self.n, self.mean, self.m2, self.ewma, self.ewvar]
+
+    @classmethod
+    def from_list(cls, data: List[float]) -> "RunningStats":
+        n, mean, m2, ewma, ewvar = data
+        return cls(int(n), mean, m2, ewma, ewvar)
+
+
+def _spread(std: float, mean: float) -> float:
+    return max(std, MIN_RELATIVE_SPREAD * abs(mean), 0.01)
+
+
+class AnomalyDetector:
+    """One-pass detector whose state can be saved and resumed."""
+
+    def __init__(self) -> None:
+        self.merchants: Dict[str, RunningStats] = {}
+        self.categories: Dict[str, RunningStats] = {}
+        self.overall = RunningStats()
+        # "signature|amount" -> last day (since 1970-01-01) it was charged
+        self.recent: Dict[str, int] = {}
+        self.anomalies: List[str] = []
+
+    def observe(self, tx: Dict[str, Any]) -> List[str]:
+        """Check ``tx`` against the history so far, then add it to the history.
+
+        Only dated spending (debits, or negative untyped amounts) is
+        considered.  Returns the anomalies found for this transaction.
+        """
+        tx_date = tx.get("date")
+        amount = float(tx["amount"])
+        kind = tx.get("type")
+        if kind == "credit":
+            amount = abs(amount)
+        elif kind == "debit":
+            amount = -abs(amount)
+        if not tx_date or amount >= 0:
+            return []
+        day = date.fromisoformat(tx_date[:10]).toordinal() - _EPOCH
+        return self.observe_spend(
+            tx_date, day, -amount, tx["merchant_signature"], tx.get("category") or None
+        )
+
+    def observe_spend(
+        self, tx_date: str, day: int, x: float, sig: str, cat: Optional[str]
+    ) -> List[str]:
+        """:meth:`observe` for an already decoded spend of ``x`` on epoch ``day``."""
+        found: List[str] = []
+
+        key = f"{sig}|{x:.2f}"
+        last = self.recent.get(key)
+        if last is not None and abs(day - last) <= DUPLICATE_WINDOW_DAYS:
+            found.append(f"Possible duplicate charge {x:.2f} at {sig} on {tx_date}")
+        self.recent[key] = day
+
+        merchant = self.merchants.get(sig)
+        if merchant is None:
+            overall = self.overall
+            if (
+                x >= FIRST_SEEN_MIN_AMOUNT
+                and overall.n >= MIN_HISTORY
+                and x > overall.mean + Z_THRESHOLD * _spread(overall.std, overall.mean)
+            ):
+                found.append(f"First payment of {x:.2f} to new merchant {sig} on {tx_date}")
+            merchant = self.merchants[sig] = RunningStats()
+        elif merchant.n >= MIN_HISTORY and abs(x - merchant.ewma) > Z_THRESHOLD * _spread(
+            merchant.ewstd, merchant.ewma
+        ):
+            found.append(
+                f"Unusual amount {x:.2f} at {sig} on {tx_date} (usually about {merchant.ewma:.2f})"
+            )
+
+        category = self.categories.get(cat) if cat else None
+        if (
+            not found
+            and category is not None
+            and category.n >= MIN_HISTORY
+            and x > category.mean + Z_THRESHOLD * _spread(category.std, category.mean)
+        ):
+            found.append(f"Unusually large {cat} spend {x:.2f} at {sig} on {tx_date}")
+
+        merchant.update(x)
+        if cat:
+            self.categories.setdefault(cat, RunningStats()).update(x)
+        self.overall.update(x)
+        if found:
+            self.anomalies.extend(found)
+            del self.anomalies[:-MAX_ANOMALIES]
+        return found
+
+    def _prune_recent(self) -> None:
+        if not self.recent:
+            return
+        horizon = max(self.recent.values()) - DUPLICATE_WINDOW_DAYS
+        self.recent = {k: d for k, d in self.recent.items() if d >= horizon}
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._prune_recent()
+        return {
+            "version": STATE_VERSION,
+            "merchants": {k: s.to_list() for k, s in self.merchants.items()},
+            "categories": {k: s.to_list() for k, s in self.categories.items()},
+            "overall": self.overall.to_list(),
+            "recent": self.recent,
+            "anomalies": self.anomalies,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnomalyDetector":
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported anomaly state version {data.get('version')}")
+        detector = cls()
+        detector.merchants = {k: RunningStats.from_list(v) for k, v in data["merchants"].items()}
+        detector.categories = {k: RunningStats.from_list(v) for k, v in data["categories"].items()}
+        detector.overall = RunningStats.from_list(data["overall"])
+        detector.recent = dict(data["recent"])
+        detector.anomalies = list(data["anomalies"])
+        return detector
+
+
+def detect_anomalies(
+    transactions: Iterable[Dict[str, Any]] | TransactionColumns,
+) -> List[str]:
+    """Run a fresh detector over ``transactions`` in order."""
+    detector = AnomalyDetector()
+    if not isinstance(transactions, TransactionColumns):
+        for tx in transactions:
+            detector.observe(tx)
+        return detector.anomalies
+
+    cols = transactions
+    spend = np.flatnonzero(cols.amounts < 0)
+    sig_labels = cols.signature_labels
+    cat_labels = cols.category_labels
+    for tx_date, day, amount, sig, cat in zip(
+        cols.dates[spend].tolist(),
+        cols.days[spend].tolist(),
+        cols.amounts[spend].tolist(),
+        cols.signatures[spend].tolist(),
+        cols.categories[spend].tolist(),
+    ):
+        detector.observe_spend(
+            tx_date, day, -amount, sig_labels[sig], cat_labels[cat] if cat >= 0 else None
+        )
+    return detector.anomalies
+
+
+__all__ = ["AnomalyDetector", "RunningStats", "detect_anomalies"]
@@ -1,21 +1,20 @@
-import gzip
 import os
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, Iterator, cast
 
-from fastapi import FastAPI, Depends, Request, HTTPException, Query, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, Request, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import FileResponse, StreamingResponse
 from .report import router as report_router
 from sqlmodel import Session, select
 from .database import init_db, get_session
 from .auth import auth_dependency
 from .signing import verify_signed_url, _canonicalize_path, generate_signed_url
 from .models import (
-    Upload,
     ProcessingJob,
     UserRule,
     ClassifyRequest,
     SummaryRequest,
+    RelabelRequest,
     LLMCost,
     Transaction,
 )
@@ -23,21 +22,41 @@ from rules.engine import (
     load_global_rules,
     merge_rules,
     evaluate,
+    rules_version,
     Rule,
     norm,
     Match,
     Action,
     CATEGORIES,
 )
-from backend.llm_adapter import get_adapter, AbstractAdapter
+from backend.llm_adapter import get_adapter, AbstractAdapter, cost_tracker
+from .local_classifier import (
+    LocalClassifier,
+    confidence_threshold,
+    get_local_classifier,
+    model_version,
+)
+from bankcleanr.jsonl import default_dumps
 from bankcleanr.signature import normalise_signature
-from .analytics import generate_summary
+from .analytics import summary_paths, write_summary
+from .summary_state import SummaryAggregate, load_state, save_state, stored_state
+from .summary_sql import summary_from_db
+from . import summary_shards
+from .history import merge_job, relabel_history, user_summary
+from .search import description_filter
+from .uploads import reusable_job, store_upload, upload_lines
+from . import export
+import hashlib
 import json
+import logging
 from datetime import datetime
 
 app = FastAPI()
+logger = logging.getLogger(__name__)
 
 MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100 MB
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 1000
 ALLOWED_CONTENT_TYPES = {
     "application/x-ndjson",
     "text/plain",
@@ -59,13 +78,29 @@ def get_adapter_dependency() -> AbstractAdapter:
         raise HTTPException(status_code=400, detail=str(exc))
 
 
-def _summary_paths(job_id: int) -> tuple[Path, Path]:
-    """Return output paths for a job's summary JSON and CSV files."""
+def get_local_classifier_dependency() -> LocalClassifier | None:
+    try:
+        return get_local_classifier()
+    except (OSError, ValueError, KeyError):
+        # a broken artifact should not block classification
+        logger.exception("Failed to load local classifier; using LLM only")
+        return None
+
+
+def _summary_dir() -> Path:
     storage_dir = Path(os.environ.get("STORAGE_DIR", "./storage"))
     storage_dir.mkdir(parents=True, exist_ok=True)
-    json_path = storage_dir / f"{job_id}_summary_v1.json"
-    csv_path = storage_dir / f"{job_id}_summary.csv"
-    return json_path, csv_path
+    return storage_dir
+
+
+def _summary_paths(job_id: int) -> tuple[Path, Path]:
+    """Return output paths for a job's summary JSON and CSV files."""
+    return summary_paths(_summary_dir(), f"{job_id}_")
+
+
+def _write_summary_files(job_id: int, summary: dict) -> None:
+    write_summary(summary, _summary_dir(), f"{job_id}_")
+
 
 def _convert_user_rule(rule: UserRule) -> Rule:
     return Rule(
@@ -88,6 +123,12 @@ def on_startup() -> None:
     GLOBAL_RULES = load_global_rules()
 
 
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    # make sure buffered LLM cost entries reach the database
+    cost_tracker.close()
+
+
 @app.post("/upload")
 async def upload(
     request: Request,
@@ -113,19 +154,20 @@ async def upload(
 
     if len(data) > MAX_UPLOAD_SIZE:
         raise HTTPException(status_code=413, detail="Payload too large")
-    if request.headers.get("Content-Encoding") == "gzip":
-        data = gzip.decompress(data)
-
-    text = data.decode("utf-8")
-    upload = Upload(content=text)
-    session.add(upload)
-    session.commit()
-    session.refresh(upload)
-    job = ProcessingJob(upload_id=upload.id, status="uploaded")
+    try:
+        # gzip bodies are stored as sent, without recompressing
+        upload_id, created = store_upload(
+            session, data, gzipped=request.headers.get("Content-Encoding") == "gzip"
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 text")
+    except (OSError, EOFError):
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    job = ProcessingJob(upload_id=upload_id, status="uploaded")
     session.add(job)
     session.commit()
     session.refresh(job)
-    return {"job_id": job.id}
+    return {"job_id": job.id, "duplicate": not created}
 
 
 @app.get("/status/{job_id}")
@@ -149,6 +191,7 @@ def costs(
     job = session.get(ProcessingJob, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    cost_tracker.flush()
     entries = session.exec(select(LLMCost).where(LLMCost.job_id == job_id)).all()
     tokens_in = sum(e.tokens_in for e in entries)
     tokens_out = sum(e.tokens_out for e in entries)
@@ -249,34 +292,20 @@ def classify(
     req: ClassifyRequest,
     session: Session = Depends(get_session),
     adapter: AbstractAdapter = Depends(get_adapter_dependency),
+    local_classifier: LocalClassifier | None = Depends(get_local_classifier_dependency),
     _: None = Depends(auth_dependency),
 ) -> dict:
     job = session.get(ProcessingJob, req.job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    upload = session.get(Upload, job.upload_id)
-    if upload is None:
+    lines = upload_lines(session, job.upload_id)
+    if lines is None:
         raise HTTPException(status_code=404, detail="Upload not found")
     # Update status so async clients know work has started
     job.status = "processing"
     session.add(job)
     session.commit()
     try:
-        # Parse NDJSON content into transaction records
-        transactions = []
-        for line in upload.content.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                tx = json.loads(line)
-            except json.JSONDecodeError as e:
-                raise HTTPException(status_code=400, detail=f"Invalid JSON line: {e}")
-            description = tx.get("description", "")
-            signature = normalise_signature(description)
-            tx_record = {**tx, "merchant_signature": signature}
-            transactions.append(tx_record)
-
         user_rules_all = session.exec(
             select(UserRule).where(UserRule.user_id == req.user_id)
         ).all()
@@ -286,6 +315,34 @@ def classify(
                 latest[r.pattern] = r
         engine_rules = [_convert_user_rule(r) for r in latest.values()]
         rules = merge_rules(GLOBAL_RULES, engine_rules)
+        job.user_id = req.user_id
+        job.rules_version = rules_version(rules)
+        job.classifier_version = _classifier_version(adapter, local_classifier)
+
+        enriched: list[dict] = []
+        previous = reusable_job(
+            session, job, req.user_id, job.rules_version, job.classifier_version
+        )
+        if previous is not None:
+            enriched = _reuse_classification(session, req, previous)
+            job.degraded = False
+            job.status = "completed"
+            session.add(job)
+            session.commit()
+            return {"transactions": enriched}
+
+        # Parse NDJSON content into transaction records; the upload is
+        # decompressed line by line as it is read
+        transactions = []
+        for line in lines:
+            try:
+                tx = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON line: {e}")
+            description = tx.get("description", "")
+            signature = normalise_signature(description)
+            tx_record = {**tx, "merchant_signature": signature}
+            transactions.append(tx_record)
 
         unknown_signatures: list[str] = []
         for tx in transactions:
@@ -301,27 +358,65 @@ def classify(
                 if sig not in SIGNATURE_CACHE and sig not in unknown_signatures:
                     unknown_signatures.append(sig)
 
+        # cheap local model first; only low-confidence signatures hit the LLM
+        local_results: dict[str, dict] = {}
+        if unknown_signatures and local_classifier is not None:
+            threshold = confidence_threshold()
+            escalate: list[str] = []
+            for sig in unknown_signatures:
+                local_label, local_conf = local_classifier.predict(sig)
+                if local_label in CATEGORIES and local_conf >= threshold:
+                    local_results[sig] = {
+                        "label": local_label,
+                        "confidence": local_conf,
+                        "source": "local",
+                    }
+                else:
+                    escalate.append(sig)
+            unknown_signatures = escalate
+
+        llm_results: dict[str, dict] = {}
+        job.degraded = False
         if unknown_signatures:
             responses = adapter.classify(unknown_signatures, job_id=req.job_id)
             for sig, resp in zip(unknown_signatures, responses):
-                SIGNATURE_CACHE[sig] = resp
-
+                llm_results[sig] = resp
+                # signatures skipped for budget reasons are retried next job,
+                # so neither they nor the job are reused
+                if resp.get("skipped"):
+                    job.degraded = True
+                else:
+                    SIGNATURE_CACHE[sig] = resp
+
+        summary_state = load_state(session, req.job_id)
         processed_signatures: set[str] = set()
-        enriched: list[dict] = []
+        rows: list[Transaction] = []
         for tx in transactions:
             label = tx.get("_label", "")
             category = tx.get("_category", "")
             source = "rule" if label else "llm"
             sig = tx["merchant_signature"]
             if not label:
-                response = SIGNATURE_CACHE[sig]
+                response = (
+                    local_results.get(sig)
+                    or SIGNATURE_CACHE.get(sig)
+                    or llm_results[sig]
+                )
+                source = response.get("source", "llm")
                 label = response["label"]
                 category = response.get("category", label)
                 confidence = response.get("confidence", 0.0)
                 if category not in CATEGORIES:
                     label = ""
                     category = ""
-                if sig not in processed_signatures and confidence >= 0.85 and label:
+                # only LLM answers are promoted to rules; local predictions
+                # would otherwise reinforce themselves
+                if (
+                    source == "llm"
+                    and sig not in processed_signatures
+                    and confidence >= 0.85
+                    and label
+                ):
                     if sum(c.isalpha() for c in norm(sig)) < 6:
                         processed_signatures.add(sig)
                     else:
@@ -369,31 +464,19 @@ def classify(
             tx["label"] = label
             tx["category"] = category
             tx["classification_type"] = source
-            transaction = Transaction(
-                job_id=req.job_id,
-                description=tx.get("description"),
-                data=tx,
-                label=label,
-                classification_type=source,
-            )
+            transaction = Transaction.from_data(req.job_id, tx)
             session.add(transaction)
             session.commit()
+            summary_state.add(tx)
             enriched.append(tx)
-        # Generate analytics summary and persist outputs
-        dated = [t for t in enriched if t.get("date")]
-        dates = [t["date"] for t in dated]
-        period = {"start": min(dates), "end": max(dates)} if dates else {"start": "", "end": ""}
-        json_path, csv_path = _summary_paths(req.job_id)
-        summary_dir = json_path.parent
-        generate_summary(
-            dated,
-            job_id=str(req.job_id),
-            user_id=str(req.user_id),
-            period=period,
-            output_dir=summary_dir,
+            rows.append(transaction)
+        # Persist the aggregates and generate the analytics summary from them
+        save_state(session, req.job_id, summary_state)
+        merge_job(session, req.user_id, req.job_id, rows)
+        session.commit()
+        _write_summary_files(
+            req.job_id, summary_state.summary(str(req.job_id), str(req.user_id))
         )
-        (summary_dir / "summary_v1.json").replace(json_path)
-        (summary_dir / "summary.csv").replace(csv_path)
 
         # Mark completion
         job.status = "completed"
@@ -407,31 +490,72 @@ def classify(
         raise
 
 
+def _classifier_version(
+    adapter: AbstractAdapter, local_classifier: LocalClassifier | None
+) -> str:
+    """Digest of the classifiers behind rule misses, for :func:`reusable_job`."""
+    parts = [adapter.provider_key, adapter.model]
+    if local_classifier is not None:
+        parts += [model_version(local_classifier), str(confidence_threshold())]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _reuse_classification(
+    session: Session, req: ClassifyRequest, previous: ProcessingJob
+) -> list[dict]:
+    """Copy the results of an identical earlier classification into ``req.job_id``."""
+    rows = session.exec(
+        select(Transaction)
+        .where(Transaction.job_id == previous.id)
+        .order_by(Transaction.id)  # type: ignore[arg-type]
+    ).all()
+    enriched = [row.data for row in rows]
+    copies = [Transaction.from_data(req.job_id, tx) for tx in enriched]
+    session.add_all(copies)
+    session.commit()
+    summary_state = SummaryAggregate.from_transactions(enriched)
+    save_state(session, req.job_id, summary_state)
+    merge_job(session, req.user_id, req.job_id, copies)
+    session.commit()
+    _write_summary_files(
+        req.job_id, summary_state.summary(str(req.job_id), str(req.user_id))
+    )
+    return enriched
+
+
 @app.post("/summary")
 def create_summary(
     req: SummaryRequest,
     session: Session = Depends(get_session),
     _: None = Depends(auth_dependency),
 ):
-    entries = session.exec(select(Transaction).where(Transaction.job_id == req.job_id)).all()
-    if not entries:
+    exists = session.exec(
+        select(Transaction.id).where(Transaction.job_id == req.job_id).limit(1)
+    ).first()
+    if exists is None:
         raise HTTPException(status_code=404, detail="Transactions not found")
-    txs = [e.data for e in entries]
-    dated = [t for t in txs if t.get("date")]
-    dates = [t["date"] for t in dated]
-    period = {"start": min(dates), "end": max(dates)} if dates else {"start": "", "end": ""}
-    json_path, csv_path = _summary_paths(req.job_id)
-    summary_dir = json_path.parent
-    generate_summary(
-        dated,
-        job_id=str(req.job_id),
-        user_id=str(req.user_id),
-        period=period,
-        output_dir=summary_dir,
-    )
-    (summary_dir / "summary_v1.json").replace(json_path)
-    (summary_dir / "summary.csv").replace(csv_path)
-    return json.loads(json_path.read_text())
+    summary = summary_from_db(session, req.job_id, str(req.user_id))
+    if summary is None:
+        # fields kept only in extras cannot be grouped in SQL
+        summary = _fallback_summary(session, req.job_id, str(req.user_id))
+    _write_summary_files(req.job_id, summary)
+    return summary
+
+
+def _fallback_summary(session: Session, job_id: int, user_id: str) -> dict:
+    """Summarise from stored aggregates, or recompute if they are missing.
+
+    Jobs with at least ``SUMMARY_SHARD_MIN_ROWS`` rows are recomputed
+    across the process pool instead of rebuilding the aggregates row by
+    row in the request thread.
+    """
+    state = stored_state(session, job_id)
+    if state is None:
+        if summary_shards.job_row_count(session, job_id) >= summary_shards.SHARD_MIN_ROWS:
+            return summary_shards.summary_from_rows(session, job_id, user_id)
+        state = load_state(session, job_id)
+        session.commit()
+    return state.summary(str(job_id), user_id)
 
 
 @app.get("/summary/{job_id}")
@@ -442,19 +566,148 @@ def get_summary(job_id: int, _: None = Depends(auth_dependency)):
     return json.loads(json_path.read_text())
 
 
+def _transaction_query(
+    bind: Any, job_id: int, type: str | None, description: str | None, after_id: int | None
+):
+    """Select ``(id, *Transaction.data_columns())`` for a job's matching transactions."""
+    query = select(Transaction.id, *Transaction.data_columns()).where(
+        Transaction.job_id == job_id
+    )
+    if type:
+        query = query.where(Transaction.classification_type == type)
+    if description is not None:
+        query = query.where(description_filter(bind, description))
+    if after_id is not None:
+        query = query.where(cast(Any, Transaction.id) > after_id)
+    return query.order_by(cast(Any, Transaction.id))
+
+
+def _stream_transactions(
+    engine: Any,
+    job_id: int,
+    type: str | None,
+    description: str | None,
+    after_id: int | None,
+    limit: int | None,
+) -> Iterator[bytes]:
+    """Yield NDJSON chunks, fetching one keyset page of rows at a time."""
+    dumps = default_dumps()
+    remaining = limit
+    with Session(engine) as session:
+        while remaining is None or remaining > 0:
+            size = STREAM_BATCH_SIZE if remaining is None else min(remaining, STREAM_BATCH_SIZE)
+            rows = session.exec(
+                _transaction_query(engine, job_id, type, description, after_id).limit(size)
+            ).all()
+            if not rows:
+                break
+            yield b"".join(dumps(Transaction.data_from_row(row[1:])) + b"\n" for row in rows)
+            after_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                break
+
+
 @app.get("/transactions/{job_id}")
 def list_transactions(
     job_id: int,
+    response: Response,
     type: str | None = Query(None),
     description: str | None = Query(None),
+    after_id: int | None = Query(None, ge=0),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     session: Session = Depends(get_session),
     _: None = Depends(auth_dependency),
 ):
-    query = select(Transaction).where(Transaction.job_id == job_id)
-    if type:
-        query = query.where(Transaction.classification_type == type)
-    if description is not None:
-        desc_column = cast(Any, Transaction.description)
-        query = query.where(desc_column.contains(description))
-    entries = session.exec(query).all()
-    return [t.data for t in entries]
+    """List a job's transactions in id order.
+
+    ``after_id``/``limit`` page through the results by id; when a page is
+    full the id to pass as the next ``after_id`` is returned in the
+    ``X-Next-After-Id`` header.  ``format=ndjson`` streams one transaction
+    per line instead of building a JSON array.
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_transactions(
+                session.get_bind(), job_id, type, description, after_id, limit
+            ),
+            media_type="application/x-ndjson",
+        )
+    query = _transaction_query(session.get_bind(), job_id, type, description, after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = session.exec(query).all()
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-After-Id"] = str(rows[-1][0])
+    return [Transaction.data_from_row(row[1:]) for row in rows]
+
+
+@app.get("/export/{job_id}")
+def export_transactions(
+    job_id: int,
+    format: str = Query("arrow", pattern="^(arrow|parquet)$"),
+    session: Session = Depends(get_session),
+    _: None = Depends(auth_dependency),
+):
+    """Stream a job's transactions as an Arrow IPC stream or a Parquet file."""
+    if session.get(ProcessingJob, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        export.arrow_schema()
+    except export.ExportUnavailable as exc:
+        raise HTTPException(status_code=501, detail=str(exc)) from exc
+    engine = session.get_bind()
+
+    def body() -> Iterator[bytes]:
+        with Session(engine) as export_session:
+            yield from export.iter_export(export_session, job_id, format)
+
+    filename = f"{job_id}_transactions{export.EXTENSIONS[format]}"
+    return StreamingResponse(
+        body(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.patch("/transactions/{job_id}/{transaction_id}")
+def relabel_transaction(
+    job_id: int,
+    transaction_id: int,
+    req: RelabelRequest,
+    session: Session = Depends(get_session),
+    _: None = Depends(auth_dependency),
+):
+    """Manually relabel a transaction and update the job's summary state."""
+    if req.label not in CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown category: {req.label}")
+    transaction = session.get(Transaction, transaction_id)
+    if transaction is None or transaction.job_id != job_id:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    state = load_state(session, job_id)
+    old = transaction.data
+    new = {**old, "label": req.label, "category": req.label, "classification_type": "user"}
+    state.replace(old, new)
+    transaction.set_data(new)
+    session.add(transaction)
+    save_state(session, job_id, state)
+    relabel_history(session, transaction, new)
+    session.commit()
+    return new
+
+
+@app.get("/users/{user_id}/summary")
+def get_user_summary(
+    user_id: int,
+    start: str | None = Query(None),
+    end: str | None = Query(None),
+    session: Session = Depends(get_session),
+    _: None = Depends(auth_dependency),
+):
+    """Summarise a user's deduplicated history across all of their jobs."""
+    summary = user_summary(session, user_id, start=start, end=end)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No history for user")
+    return summary
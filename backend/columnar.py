@@ -0,0 +1,227 @@
+"""Columnar representation of transactions for vectorised analytics.
+
+Transaction dicts are converted once into NumPy arrays (signed amounts,
+day numbers, month codes, category codes and merchant signature codes) so
+every aggregate in :mod:`backend.analytics` can be computed with grouped
+reductions instead of repeated passes over the dicts.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CREDIT = 1
+DEBIT = -1
+OTHER = 0
+
+
+@dataclass(frozen=True)
+class TransactionColumns:
+    """Column arrays for a batch of transactions.
+
+    Code arrays index into the matching ``*_labels`` list.  Labels are
+    sorted, so codes order the same way as the strings they stand for.
+    Missing categories are coded ``-1``.
+    """
+
+    amounts: np.ndarray  # float64, signed by ``type``
+    types: np.ndarray  # int8: CREDIT, DEBIT or OTHER
+    days: np.ndarray  # int64 days since 1970-01-01
+    dates: np.ndarray  # original date strings (object)
+    months: np.ndarray  # int64 codes into ``month_labels``
+    month_labels: List[str]
+    categories: np.ndarray  # int64 codes into ``category_labels`` or -1
+    category_labels: List[str]
+    signatures: np.ndarray  # int64 codes into ``signature_labels``
+    signature_labels: List[str]
+
+    def __len__(self) -> int:
+        return int(self.amounts.shape[0])
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Dict[str, Any]]) -> "TransactionColumns":
+        txs = transactions if isinstance(transactions, list) else list(transactions)
+        return cls.from_fields(
+            [tx["amount"] for tx in txs],
+            [tx.get("type") for tx in txs],
+            [tx["date"] for tx in txs],
+            [tx.get("category") or "" for tx in txs],
+            [tx["merchant_signature"] for tx in txs],
+        )
+
+    @classmethod
+    def from_fields(
+        cls,
+        raw_amounts: Sequence[Any],
+        raw_types: Sequence[Optional[str]],
+        dates: Sequence[str],
+        cats: Sequence[str],
+        sigs: Sequence[str],
+    ) -> "TransactionColumns":
+        """Build columns from parallel field lists (``""`` for no category)."""
+        amounts = np.asarray(raw_amounts, dtype=np.float64).reshape(-1)
+        types = np.fromiter(
+            (CREDIT if t == "credit" else DEBIT if t == "debit" else OTHER for t in raw_types),
+            dtype=np.int8,
+            count=len(raw_types),
+        )
+        signed = np.where(
+            types == CREDIT,
+            np.abs(amounts),
+            np.where(types == DEBIT, -np.abs(amounts), amounts),
+        )
+
+        # histories repeat the same dates heavily; parse each one once
+        date_codes, unique_dates = _encode(dates)
+        unique_days = np.asarray(unique_dates, dtype="datetime64[s]").astype("datetime64[D]")
+        days = unique_days.astype(np.int64)[date_codes]
+        month_codes, month_labels = _encode(
+            np.datetime_as_string(unique_days.astype("datetime64[M]"), unit="M").tolist()
+        )
+        months = month_codes[date_codes]
+
+        cat_codes, cat_labels = _encode(cats)
+        if cat_labels and cat_labels[0] == "":
+            # "" sorts first; shift so missing categories become -1
+            cat_codes = cat_codes - 1
+            cat_labels = cat_labels[1:]
+        sig_codes, sig_labels = _encode(sigs)
+
+        return cls(
+            amounts=signed,
+            types=types,
+            days=days,
+            dates=np.asarray(dates, dtype=object),
+            months=months,
+            month_labels=month_labels,
+            categories=cat_codes,
+            category_labels=cat_labels,
+            signatures=sig_codes,
+            signature_labels=sig_labels,
+        )
+
+
+def _encode(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encode ``values`` into codes over their sorted labels."""
+    seen: Dict[str, int] = {}
+    codes = np.fromiter(
+        (seen.setdefault(v, len(seen)) for v in values), dtype=np.int64, count=len(values)
+    )
+    labels = sorted(seen)
+    remap = np.empty(len(labels), dtype=np.int64)
+    for rank, label in enumerate(labels):
+        remap[seen[label]] = rank
+    return remap[codes], labels
+
+
+def as_columns(
+    transactions: "Iterable[Dict[str, Any]] | TransactionColumns",
+) -> TransactionColumns:
+    """Return ``transactions`` in columnar form, converting if needed."""
+    if isinstance(transactions, TransactionColumns):
+        return transactions
+    return TransactionColumns.from_transactions(transactions)
+
+
+def group_keys(*codes: np.ndarray, sizes: Sequence[int]) -> np.ndarray:
+    """Combine several code arrays into a single dense group key."""
+    key = np.zeros(codes[0].shape, dtype=np.int64)
+    for code, size in zip(codes, sizes):
+        key = key * max(size, 1) + code
+    return key
+
+
+def group_sum(keys: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Sum ``values`` per key.
+
+    ``np.bincount`` accumulates in input order, so results match a plain
+    Python loop adding the same values.
+    """
+    return np.bincount(keys, weights=values, minlength=size)
+
+
+# pence sums are held in float64, which is exact for integers below 2**53
+_EXACT_LIMIT = float(2**53)
+
+
+def pence(values: np.ndarray) -> Optional[np.ndarray]:
+    """``values`` as whole pence, or ``None`` unless every value is a whole penny."""
+    scaled = np.rint(values * 100)
+    if not np.array_equal(scaled / 100, values) or np.abs(scaled).sum() >= _EXACT_LIMIT:
+        return None
+    return scaled
+
+
+def pence_sum(keys: np.ndarray, values: np.ndarray, size: int) -> Optional[np.ndarray]:
+    """Exact per-key sums of ``values`` in pence (see :func:`pence`)."""
+    scaled = pence(values)
+    if scaled is None:
+        return None
+    return np.bincount(keys, weights=scaled, minlength=size)
+
+
+def exact_group_sum(keys: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Per-key sums that do not depend on row order.
+
+    Money amounts are summed as whole pence and rounded once, so partial
+    sums over any split of the rows combine to the same result.  Values
+    with fractions of a penny fall back to :func:`group_sum`.
+    """
+    sums = pence_sum(keys, values, size)
+    if sums is None:
+        return group_sum(keys, values, size)
+    return sums / 100
+
+
+def pence_moments(
+    keys: np.ndarray, values: np.ndarray, size: int
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Exact per-key sums of ``values`` and of their squares, in pence.
+
+    Returns ``None`` unless every value is a whole penny and both sums
+    stay exact in float64.
+    """
+    scaled = pence(values)
+    if scaled is None:
+        return None
+    squares = scaled * scaled
+    if squares.sum() >= _EXACT_LIMIT:
+        return None
+    return (
+        np.bincount(keys, weights=scaled, minlength=size),
+        np.bincount(keys, weights=squares, minlength=size),
+    )
+
+
+def first_index(keys: np.ndarray, size: int) -> np.ndarray:
+    """Position of the first row for each key (``len(keys)`` if absent)."""
+    first = np.full(size, keys.shape[0], dtype=np.int64)
+    np.minimum.at(first, keys, np.arange(keys.shape[0], dtype=np.int64))
+    return first
+
+
+def segment_starts(sorted_keys: np.ndarray) -> np.ndarray:
+    """Start offsets of runs of equal values in ``sorted_keys``."""
+    if sorted_keys.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    change = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    return np.concatenate(([0], change)).astype(np.int64)
+
+
+__all__ = [
+    "CREDIT",
+    "DEBIT",
+    "OTHER",
+    "TransactionColumns",
+    "as_columns",
+    "exact_group_sum",
+    "first_index",
+    "group_keys",
+    "group_sum",
+    "pence",
+    "pence_moments",
+    "pence_sum",
+    "segment_starts",
+]
@@ -2,12 +2,16 @@ from collections.abc import Generator
 
 from sqlmodel import SQLModel, create_engine, Session
 
+from . import migrations, search
+
 sqlite_url = "sqlite:///backend.db"
 engine = create_engine(sqlite_url, echo=False)
 
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    migrations.upgrade(engine)
+    search.install(engine)
 
 
 def get_session() -> Generator[Session, None, None]:
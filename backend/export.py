@@ -0,0 +1,246 @@
+"""Columnar export of classified transactions.
+
+Transactions are read from the database in keyset-ordered batches and
+converted batch by batch into Arrow record batches, which are written as
+an Arrow IPC stream or a Parquet file.  Only one batch is held in memory.
+Columns are typed (``date32`` dates, ``decimal128`` amounts) and the
+repetitive text columns are dictionary encoded.
+
+``pyarrow`` is an optional dependency imported on first use; callers get
+:class:`ExportUnavailable` when it is missing.
+"""
+from __future__ import annotations
+
+import io
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, cast
+
+from sqlmodel import select
+
+from .models import Transaction
+
+EXPORT_BATCH_SIZE = 10_000
+FORMATS = ("arrow", "parquet")
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"arrow": ".arrows", "parquet": ".parquet"}
+# amounts are exported in pounds and pence
+AMOUNT_SCALE = 2
+_QUANTUM = Decimal(1).scaleb(-AMOUNT_SCALE)
+
+DICTIONARY_COLUMNS = ("type", "merchant_signature", "category", "label", "classification_type")
+
+
+class ExportUnavailable(RuntimeError):
+    """Raised when the optional ``pyarrow`` dependency is not installed."""
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow  # type: ignore[import-untyped]
+    except ImportError as exc:
+        raise ExportUnavailable("Columnar export requires pyarrow") from exc
+    return pyarrow
+
+
+def _date(value: Any) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10]) if value else None
+    except ValueError:
+        return None
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    """Return ``value`` in pounds and pence, or ``None`` if it is not exact.
+
+    Sub-penny amounts are written as null rather than silently rounded.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        exact = Decimal(str(value))
+        amount = exact.quantize(_QUANTUM)
+    except InvalidOperation:
+        return None
+    return amount if amount == exact else None
+
+
+def rows_to_columns(rows: Sequence[Sequence[Any]]) -> Dict[str, List[Any]]:
+    """Turn ``(id, *Transaction.data_columns())`` rows into typed Python columns."""
+    columns: Dict[str, List[Any]] = {
+        "id": [],
+        "date": [],
+        "description": [],
+        "amount": [],
+        "balance": [],
+        "type": [],
+        "merchant_signature": [],
+        "category": [],
+        "label": [],
+        "classification_type": [],
+    }
+    for (
+        tx_id,
+        tx_date,
+        description,
+        amount_pence,
+        tx_type,
+        signature,
+        category,
+        label,
+        classification_type,
+        extras,
+    ) in rows:
+        extras = extras or {}
+        columns["id"].append(tx_id)
+        columns["date"].append(tx_date if tx_date is not None else _date(extras.get("date")))
+        columns["description"].append(description)
+        columns["amount"].append(
+            Decimal(amount_pence).scaleb(-2).quantize(_QUANTUM)
+            if amount_pence is not None
+            else _decimal(extras.get("amount"))
+        )
+        columns["balance"].append(_decimal(extras.get("balance")))
+        columns["type"].append(tx_type)
+        columns["merchant_signature"].append(signature)
+        columns["category"].append(category)
+        columns["label"].append(label)
+        columns["classification_type"].append(classification_type)
+    return columns
+
+
+def arrow_schema() -> Any:
+    """Arrow schema of exported transactions."""
+    pa = _pyarrow()
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("date", pa.date32()),
+            pa.field("description", pa.string()),
+            pa.field("amount", pa.decimal128(18, AMOUNT_SCALE)),
+            pa.field("balance", pa.decimal128(18, AMOUNT_SCALE)),
+            *(pa.field(name, text) for name in DICTIONARY_COLUMNS),
+        ]
+    )
+
+
+def iter_record_batches(
+    session: Any, job_id: int, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[Any]:
+    """Yield Arrow record batches of a job's transactions in id order."""
+    pa = _pyarrow()
+    schema = arrow_schema()
+    after_id = 0
+    while True:
+        rows = session.execute(
+            select(Transaction.id, *Transaction.data_columns())
+            .where(Transaction.job_id == job_id)
+            .where(Transaction.id > after_id)  # type: ignore[operator]
+            .order_by(Transaction.id)  # type: ignore[arg-type]
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        columns = rows_to_columns(rows)
+        arrays = []
+        for field in schema:
+            if field.name in DICTIONARY_COLUMNS:
+                arrays.append(pa.array(columns[field.name], pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(columns[field.name], field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+
+def _write_batches(
+    session: Any, job_id: int, sink: IO[bytes], fmt: str, batch_size: int
+) -> Iterator[int]:
+    """Write batches to ``sink``, yielding each batch's row count once written.
+
+    The writer is closed (footer included) before the generator finishes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    pa = _pyarrow()
+    schema = arrow_schema()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq  # type: ignore[import-untyped]
+
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in iter_record_batches(session, job_id, batch_size):
+            writer.write_batch(batch)
+            yield batch.num_rows
+
+
+def write_export(
+    session: Any,
+    job_id: int,
+    sink: IO[bytes],
+    fmt: str = "arrow",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> int:
+    """Write a job's transactions to ``sink``; returns the number of rows."""
+    return sum(_write_batches(session, job_id, sink, fmt, batch_size))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting bytes until they are drained."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_export(
+    session: Any, job_id: int, fmt: str = "arrow", batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Yield the encoded export chunk by chunk, one database batch at a time."""
+    sink = _ChunkSink()
+    for _ in _write_batches(session, job_id, cast(IO[bytes], sink), fmt, batch_size):
+        data = sink.drain()
+        if data:
+            yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+__all__ = [
+    "EXPORT_BATCH_SIZE",
+    "EXTENSIONS",
+    "ExportUnavailable",
+    "FORMATS",
+    "MEDIA_TYPES",
+    "arrow_schema",
+    "iter_export",
+    "iter_record_batches",
+    "rows_to_columns",
+    "write_export",
+]
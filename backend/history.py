@@ -0,0 +1,162 @@
+"""Per-user transaction history merged across jobs.
+
+Every classified job is folded into the user's :class:`UserTransaction`
+history.  Transactions already seen in an earlier, overlapping statement
+are recognised by fingerprint and skipped, so the history holds each
+real-world transaction once.  Rows are indexed by ``(user_id, date)`` for
+time-range queries, and a :class:`SummaryAggregate` over the whole
+history is updated as each job lands, so recurring and overspending
+detection see every statement without rescanning them.  The aggregate
+keeps bounded per-merchant statistics, so merging a job costs the job's
+size and the number of merchants, not the length of the history.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+
+from sqlmodel import Session, col, select
+
+from bankcleanr.fingerprint import fingerprints, transaction_fingerprint
+
+from .models import Transaction, UserSummaryState, UserTransaction
+from .summary_state import SummaryAggregate
+
+# fingerprints looked up per query, below SQLite's bound-parameter limit
+FINGERPRINT_BATCH_SIZE = 500
+
+
+def load_user_state(
+    session: Session, user_id: int
+) -> Tuple[UserSummaryState, SummaryAggregate]:
+    """Return the user's aggregate row and state, rebuilding from history if absent."""
+    row = session.get(UserSummaryState, user_id)
+    if row is not None:
+        try:
+            return row, SummaryAggregate.from_dict(row.state)
+        except (KeyError, TypeError, ValueError):
+            pass  # stale or corrupt state: rebuild below
+    history = session.exec(
+        select(UserTransaction)
+        .where(UserTransaction.user_id == user_id)
+        .order_by(UserTransaction.id)  # type: ignore[arg-type]
+    )
+    state = SummaryAggregate()
+    last_job_id = None
+    for entry in history:
+        state.add(entry.data)
+        last_job_id = entry.job_id
+    if row is None:
+        row = UserSummaryState(user_id=user_id, last_job_id=last_job_id)
+    row.state = state.to_dict()
+    session.add(row)
+    return row, state
+
+
+def _known_fingerprints(session: Session, user_id: int, prints: Sequence[str]) -> Set[str]:
+    """Which of ``prints`` the user's history already holds.
+
+    Each lookup is a probe of the ``(user_id, fingerprint)`` unique index,
+    so the cost follows the job's size, not the history's.
+    """
+    known: Set[str] = set()
+    for start in range(0, len(prints), FINGERPRINT_BATCH_SIZE):
+        batch = prints[start : start + FINGERPRINT_BATCH_SIZE]
+        known.update(
+            session.exec(
+                select(UserTransaction.fingerprint)
+                .where(UserTransaction.user_id == user_id)
+                .where(col(UserTransaction.fingerprint).in_(batch))
+            )
+        )
+    return known
+
+
+def merge_job(
+    session: Session, user_id: int, job_id: int, transactions: Sequence[Transaction]
+) -> int:
+    """Add a job's dated transactions to the user's history.
+
+    Returns the number of new history entries; the caller commits.
+    """
+    dated = [t for t in transactions if (t.data or {}).get("date")]
+    row, state = load_user_state(session, user_id)
+    added = 0
+    if dated:
+        prints = fingerprints([t.data for t in dated])
+        existing = _known_fingerprints(session, user_id, prints)
+        for tx, fingerprint in zip(dated, prints):
+            if fingerprint in existing:
+                continue
+            existing.add(fingerprint)
+            session.add(
+                UserTransaction(
+                    user_id=user_id,
+                    date=tx.data["date"],
+                    fingerprint=fingerprint,
+                    job_id=job_id,
+                    transaction_id=tx.id,
+                    data=tx.data,
+                )
+            )
+            state.add(tx.data)
+            added += 1
+    if added:
+        row.state = state.to_dict()
+    row.last_job_id = job_id
+    row.updated_at = datetime.utcnow()
+    session.add(row)
+    return added
+
+
+def relabel_history(session: Session, transaction: Transaction, new: Dict[str, Any]) -> None:
+    """Propagate a relabelled job transaction into its user's history."""
+    entry = session.exec(
+        select(UserTransaction).where(UserTransaction.transaction_id == transaction.id)
+    ).first()
+    if entry is None:
+        return
+    row, state = load_user_state(session, entry.user_id)
+    state.replace(entry.data, new)
+    entry.data = new
+    row.state = state.to_dict()
+    row.updated_at = datetime.utcnow()
+    session.add(entry)
+    session.add(row)
+
+
+def user_summary(
+    session: Session,
+    user_id: int,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Summarise a user's combined history, optionally within ``[start, end]``.
+
+    Without a range the maintained aggregate is used directly; a range is
+    answered from the ``(user_id, date)`` index.  Returns ``None`` when the
+    user has no history.
+    """
+    row, state = load_user_state(session, user_id)
+    if row.last_job_id is None:
+        return None
+    if start is not None or end is not None:
+        query = select(UserTransaction).where(UserTransaction.user_id == user_id)
+        if start is not None:
+            query = query.where(UserTransaction.date >= start)
+        if end is not None:
+            query = query.where(UserTransaction.date <= end)
+        entries = session.exec(
+            query.order_by(UserTransaction.id)  # type: ignore[arg-type]
+        )
+        state = SummaryAggregate.from_transactions(e.data for e in entries)
+    return state.summary(str(row.last_job_id), str(user_id))
+
+
+__all__ = [
+    "load_user_state",
+    "merge_job",
+    "relabel_history",
+    "transaction_fingerprint",
+    "user_summary",
+]
@@ -1,65 +1,172 @@
-"""LLM adapter with cost tracking and retry logic."""
+"""LLM adapter with cost tracking, retry logic and provider guards."""
 
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import math
 import os
+import re
+import threading
 import time
+import weakref
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from datetime import date
-from typing import Callable, Dict, Iterable, List, Tuple
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Tuple, TypedDict
 
 from .database import get_session
+from .llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    get_guard,
+    is_rate_limited,
+    retry_after,
+)
 from .models import LLMCost
 
 
 logger = logging.getLogger(__name__)
 
 
+class _LedgerEntry(TypedDict):
+    """A buffered :class:`LLMCost` row."""
+
+    job_id: int
+    tokens_in: int
+    tokens_out: int
+    estimated_cost_gbp: float
+
+
 class DailyCostTracker:
-    """Track per-job and per-day LLM costs."""
+    """Track per-job and per-day LLM costs.
 
-    def __init__(self, limit: float, job_limit: float = float(os.getenv("MAX_JOB_COST_GBP", "5.0"))) -> None:
+    Budget checks and running totals are guarded by a lock so concurrent jobs
+    (and the report thread pool) see a consistent view.  Ledger rows are kept
+    in an in-memory buffer and written to the database in bulk, either when
+    :meth:`flush` is called at the end of a job or by a background timer, so
+    the LLM hot path never waits on a commit.
+    """
+
+    def __init__(
+        self,
+        limit: float,
+        job_limit: float = float(os.getenv("MAX_JOB_COST_GBP", "5.0")),
+        flush_interval: float = float(os.getenv("COST_FLUSH_INTERVAL_S", "5.0")),
+    ) -> None:
         self.limit = limit
         self.job_limit = job_limit
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[_LedgerEntry] = []
+        self._timer: threading.Timer | None = None
         self.reset()
+        _trackers.add(self)
 
     def reset(self) -> None:
-        self.day = date.today()
-        self.daily_total = 0.0
-        self.job_costs: Dict[int, float] = defaultdict(float)
+        with self._lock:
+            self.day = date.today()
+            self.daily_total = 0.0
+            self.job_costs: Dict[int, float] = defaultdict(float)
 
-    def add(self, job_id: int, tokens_in: int, tokens_out: int, cost_gbp: float) -> None:
+    def _roll_day(self) -> None:
+        # caller must hold ``self._lock``
         today = date.today()
         if today != self.day:
-            self.reset()
-        if self.daily_total + cost_gbp > self.limit:
-            raise RuntimeError("Daily cost limit exceeded")
-        if self.job_costs[job_id] + cost_gbp > self.job_limit:
-            raise RuntimeError("Job cost limit exceeded")
-        self.daily_total += cost_gbp
-        self.job_costs[job_id] += cost_gbp
-        for session in get_session():
-            session.add(
-                LLMCost(
-                    job_id=job_id,
-                    tokens_in=tokens_in,
-                    tokens_out=tokens_out,
-                    estimated_cost_gbp=cost_gbp,
-                )
+            self.day = today
+            self.daily_total = 0.0
+            self.job_costs = defaultdict(float)
+
+    def reserve(self, job_id: int, cost_gbp: float) -> None:
+        """Atomically check the limits and reserve ``cost_gbp`` of budget."""
+        with self._lock:
+            self._roll_day()
+            if self.daily_total + cost_gbp > self.limit:
+                raise RuntimeError("Daily cost limit exceeded")
+            if self.job_costs[job_id] + cost_gbp > self.job_limit:
+                raise RuntimeError("Job cost limit exceeded")
+            self.daily_total += cost_gbp
+            self.job_costs[job_id] += cost_gbp
+
+    def reserve_prefix(self, job_id: int, costs: List[float]) -> Tuple[int, float]:
+        """Reserve budget for the longest prefix of ``costs`` that fits.
+
+        Returns the number of items reserved and the total amount held.
+        Nothing is reserved when not even the first item fits.
+        """
+        with self._lock:
+            self._roll_day()
+            available = min(
+                self.limit - self.daily_total,
+                self.job_limit - self.job_costs[job_id],
+            )
+            count = 0
+            reserved = 0.0
+            for cost in costs:
+                if reserved + cost > available:
+                    break
+                reserved += cost
+                count += 1
+            self.daily_total += reserved
+            self.job_costs[job_id] += reserved
+            return count, reserved
+
+    def release(self, job_id: int, reserved_gbp: float) -> None:
+        """Return an unused reservation to the budget."""
+        with self._lock:
+            self.daily_total = max(0.0, self.daily_total - reserved_gbp)
+            self.job_costs[job_id] = max(0.0, self.job_costs[job_id] - reserved_gbp)
+
+    def settle(
+        self,
+        job_id: int,
+        reserved_gbp: float,
+        tokens_in: int,
+        tokens_out: int,
+        cost_gbp: float,
+    ) -> None:
+        """Replace a reservation with the actual cost and record it.
+
+        The call has already been paid for, so the actual cost is booked even
+        if it overshoots the estimate; later reservations see the overshoot.
+        """
+        with self._lock:
+            self.daily_total += cost_gbp - reserved_gbp
+            self.job_costs[job_id] += cost_gbp - reserved_gbp
+        self.record(job_id, tokens_in, tokens_out, cost_gbp)
+
+    def record(self, job_id: int, tokens_in: int, tokens_out: int, cost_gbp: float) -> None:
+        """Queue a ledger entry for the next bulk flush."""
+        with self._lock:
+            self._pending.append(
+                {
+                    "job_id": job_id,
+                    "tokens_in": tokens_in,
+                    "tokens_out": tokens_out,
+                    "estimated_cost_gbp": cost_gbp,
+                }
             )
-            session.commit()
+            job_total = self.job_costs[job_id]
+            daily_total = self.daily_total
+            self._schedule_flush()
         logger.info(
             "job %s cost %.4f GBP (job total %.4f, daily total %.4f)",
             job_id,
             cost_gbp,
-            self.job_costs[job_id],
-            self.daily_total,
+            job_total,
+            daily_total,
         )
 
+    def add(self, job_id: int, tokens_in: int, tokens_out: int, cost_gbp: float) -> None:
+        self.reserve(job_id, cost_gbp)
+        self.record(job_id, tokens_in, tokens_out, cost_gbp)
+
     def add_raw_cost(self, job_id: int, cost_gbp: float) -> None:
         """Record a non-token-based cost."""
         self.add(job_id, 0, 0, cost_gbp)
@@ -78,16 +185,93 @@ class DailyCostTracker:
         finally:
             self.add(job_id, tokens_in, tokens_out, cost)
 
+    @property
+    def pending(self) -> int:
+        """Number of ledger entries waiting to be written."""
+        with self._lock:
+            return len(self._pending)
+
+    def _schedule_flush(self) -> None:
+        # caller must hold ``self._lock``
+        if self._timer is not None or self.flush_interval <= 0:
+            return
+        timer = threading.Timer(self.flush_interval, self._timed_flush)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:  # pragma: no cover - retried on next flush
+            logger.exception("Failed to flush LLM cost ledger")
+
+    def flush(self) -> int:
+        """Write all buffered ledger entries in a single transaction.
+
+        Entries are put back in the buffer if the write fails so they are
+        retried by the next flush rather than lost.
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+            if not entries:
+                return 0
+            try:
+                for session in get_session():
+                    session.add_all([LLMCost(**entry) for entry in entries])
+                    session.commit()
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = entries
+                    self._schedule_flush()
+                raise
+            return len(entries)
+
+    def close(self) -> None:
+        """Cancel the background timer and write any remaining entries."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+
+_trackers: "weakref.WeakSet[DailyCostTracker]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_trackers() -> None:
+    for tracker in list(_trackers):
+        try:
+            tracker.close()
+        except Exception:  # pragma: no cover - best effort at shutdown
+            logger.exception("Failed to flush LLM cost ledger on shutdown")
+
 
 _DAILY_LIMIT = float(os.getenv("MAX_DAILY_COST_GBP", "1.0"))
 _JOB_LIMIT = float(os.getenv("MAX_JOB_COST_GBP", "5.0"))
 cost_tracker = DailyCostTracker(_DAILY_LIMIT, _JOB_LIMIT)
 
 
-def _chunks(items: Iterable[str], size: int) -> Iterable[List[str]]:
-    items = list(items)
-    for i in range(0, len(items), size):
-        yield items[i : i + size]
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in ``text`` without a tokenizer.
+
+    BPE tokenizers average roughly four characters per token for English
+    text, but short merchant strings are dominated by whole words, digits
+    and punctuation which each cost at least one token.  The larger of the
+    two estimates is used so budgets err on the side of caution.
+    """
+    if not text:
+        return 0
+    by_chars = len(text) / 4
+    by_pieces = len(_WORD_RE.findall(text)) * 1.1
+    return max(1, math.ceil(max(by_chars, by_pieces)))
 
 
 class AbstractAdapter(ABC):
@@ -97,35 +281,154 @@ class AbstractAdapter(ABC):
         os.getenv("PRICE_PER_1K_TOKENS_GBP", "0.002")
     )
 
+    # key for the shared rate limiter/circuit breaker; defaults to class name
+    provider: str = ""
+    # False for placeholder adapters whose ``_send`` cannot reach a provider
+    implemented: bool = True
+    # True when ``_send`` makes one provider request per prompt; it then calls
+    # ``_throttle`` before each request so the rate limit counts every one
+    request_per_prompt: bool = False
+    backoff_base: float = float(os.getenv("LLM_BACKOFF_BASE_S", "1.0"))
+    backoff_cap: float = float(os.getenv("LLM_BACKOFF_CAP_S", "30.0"))
+
+    # per-prompt tokens added by the provider wrapper (system prompt, roles)
+    prompt_overhead_tokens: int = 32
+    # expected completion size for a ``{"label": ..., "confidence": ...}`` reply
+    expected_output_tokens: int = 16
+
     def __init__(self, model: str, batch_size: int = 20, max_retries: int = 3):
         self.model = model
         self.batch_size = batch_size
         self.max_retries = max_retries
 
+    @classmethod
+    def configured(cls) -> bool:
+        """Whether the environment holds what this adapter needs to run."""
+        return True
+
     @abstractmethod
     def _send(self, prompts: List[str]) -> Dict:
         """Send a batch of prompts to the underlying model."""
 
+    def estimate_cost(self, prompt: str) -> float:
+        """Return the estimated GBP cost of classifying a single prompt."""
+        tokens = (
+            estimate_tokens(prompt)
+            + self.prompt_overhead_tokens
+            + self.expected_output_tokens
+        )
+        return tokens / 1000 * self.price_per_1k_tokens_gbp
+
+    def estimate_and_reserve(self, prompts: List[str], job_id: int) -> Tuple[int, float]:
+        """Reserve budget for as many of ``prompts`` as the limits allow.
+
+        Returns the number of leading prompts that may be sent and the amount
+        reserved for them, which must later be settled or released.
+        """
+        return cost_tracker.reserve_prefix(
+            job_id, [self.estimate_cost(p) for p in prompts]
+        )
+
+    @property
+    def provider_key(self) -> str:
+        """Name under which rate limits and the circuit breaker are shared."""
+        return self.provider or type(self).__name__.lower()
+
+    def _guarded_send(self, prompts: List[str]) -> Dict:
+        """Make a single provider call under the shared provider guard."""
+        with get_guard(self.provider_key).slot(rate_limit=not self.request_per_prompt):
+            return self._send(prompts)
+
+    def _throttle(self) -> None:
+        """Wait for a rate-limit token before one provider request."""
+        get_guard(self.provider_key).bucket.acquire()
+
+    def _send_with_retries(self, prompts: List[str]) -> Dict:
+        """Send ``prompts``, retrying transient failures with jittered backoff.
+
+        ``Retry-After`` hints from 429 responses take precedence over the
+        computed backoff.  An open circuit is raised immediately.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                return self._guarded_send(prompts)
+            except CircuitOpenError:
+                raise
+            except Exception as exc:  # pragma: no cover - transient
+                if attempt == self.max_retries - 1:
+                    breaker = get_guard(self.provider_key).breaker
+                    if breaker.state != CircuitBreaker.CLOSED:
+                        raise CircuitOpenError("Provider circuit is open") from exc
+                    raise
+                delay = retry_after(exc) if is_rate_limited(exc) else None
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                time.sleep(delay)
+        raise ValueError("max_retries must be at least 1")
+
+    def _usage_cost(self, data: Dict) -> Tuple[int, int, float]:
+        """Return input tokens, output tokens and GBP cost for a response."""
+        usage = data.get("usage", {})
+        tokens_in = usage.get("prompt_tokens", usage.get("total_tokens", 0))
+        tokens_out = usage.get("completion_tokens", 0)
+        cost_gbp = data.get(
+            "cost_gbp",
+            (tokens_in + tokens_out) / 1000 * self.price_per_1k_tokens_gbp,
+        )
+        return tokens_in, tokens_out, cost_gbp
+
+    @staticmethod
+    def _unclassified(count: int) -> List[Dict[str, Any]]:
+        """Placeholder responses for prompts skipped without a provider call."""
+        return [
+            {"label": "unknown", "confidence": 0.0, "tokens": 0, "cost": 0.0, "skipped": True}
+            for _ in range(count)
+        ]
+
     def classify(self, prompts: List[str], job_id: int) -> List[Dict[str, float]]:
-        responses: List[Dict[str, float]] = []
-        for batch in _chunks(prompts, self.batch_size):
-            def call() -> Dict:
-                return self._send(batch)
+        try:
+            return self._classify(prompts, job_id)
+        finally:
+            # one bulk ledger write per job instead of a commit per batch
+            try:
+                cost_tracker.flush()
+            except Exception:  # pragma: no cover - entries stay buffered
+                logger.exception("Failed to flush LLM cost ledger")
 
-            for attempt in range(self.max_retries):
-                try:
-                    data = call()
-                    break
-                except Exception:  # pragma: no cover - transient
-                    if attempt == self.max_retries - 1:
-                        raise
-                    time.sleep(2 ** attempt)
-            usage = data.get("usage", {})
-            tokens_in = usage.get("prompt_tokens", usage.get("total_tokens", 0))
-            tokens_out = usage.get("completion_tokens", 0)
+    def _classify(self, prompts: List[str], job_id: int) -> List[Dict[str, float]]:
+        responses: List[Dict[str, float]] = []
+        remaining = list(prompts)
+        while remaining:
+            count, reserved = self.estimate_and_reserve(
+                remaining[: self.batch_size], job_id
+            )
+            if count == 0:
+                logger.warning(
+                    "job %s cost budget exhausted; leaving %d prompts unclassified",
+                    job_id,
+                    len(remaining),
+                )
+                responses.extend(self._unclassified(len(remaining)))
+                break
+            batch, remaining = remaining[:count], remaining[count:]
+            try:
+                data = self._send_with_retries(batch)
+            except CircuitOpenError:
+                cost_tracker.release(job_id, reserved)
+                skipped = len(batch) + len(remaining)
+                logger.warning(
+                    "%s circuit open; leaving %d prompts unclassified",
+                    self.provider_key,
+                    skipped,
+                )
+                responses.extend(self._unclassified(skipped))
+                break
+            except Exception:
+                cost_tracker.release(job_id, reserved)
+                raise
+            tokens_in, tokens_out, cost_gbp = self._usage_cost(data)
             tokens = tokens_in + tokens_out
-            cost_gbp = tokens / 1000 * self.price_per_1k_tokens_gbp
-            cost_tracker.add(job_id, tokens_in, tokens_out, cost_gbp)
+            cost_tracker.settle(job_id, reserved, tokens_in, tokens_out, cost_gbp)
             for label, confidence in data.get("labels", []):
                 responses.append(
                     {
@@ -141,6 +444,20 @@ class AbstractAdapter(ABC):
 class OpenAIAdapter(AbstractAdapter):
     """Adapter using the OpenAI client."""
 
+    provider = "openai"
+    request_per_prompt = True
+
+    SYSTEM_PROMPT = (
+        'Respond ONLY with JSON of the form '
+        '{"label": "<label>", "confidence": <number>}.'
+    )
+    # system prompt plus chat message framing
+    prompt_overhead_tokens = estimate_tokens(SYSTEM_PROMPT) + 8
+
+    @classmethod
+    def configured(cls) -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
     def __init__(self, model: str = "gpt-4o-mini", **kwargs):
         import openai
 
@@ -156,16 +473,11 @@ class OpenAIAdapter(AbstractAdapter):
         labels: List[Tuple[str, float]] = []
         total_tokens = 0
         for prompt in prompts:
+            self._throttle()
             resp = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            'Respond ONLY with JSON of the form '
-                            '{"label": "<label>", "confidence": <number>}.'
-                        ),
-                    },
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": prompt},
                 ],
                 response_format={"type": "json_object"},
@@ -190,6 +502,9 @@ class OpenAIAdapter(AbstractAdapter):
 class AnthropicAdapter(AbstractAdapter):
     """Adapter for Anthropic models."""
 
+    provider = "anthropic"
+    implemented = False
+
     def __init__(self, model: str = "claude-3-haiku", **kwargs):
         super().__init__(model, **kwargs)
 
@@ -200,6 +515,9 @@ class AnthropicAdapter(AbstractAdapter):
 class AzureAdapter(AbstractAdapter):
     """Adapter for Azure-hosted models."""
 
+    provider = "azure"
+    implemented = False
+
     def __init__(self, model: str = "gpt-4o-mini", **kwargs):
         super().__init__(model, **kwargs)
 
@@ -207,6 +525,285 @@ class AzureAdapter(AbstractAdapter):
         raise NotImplementedError("Azure adapter requires external API access")
 
 
+class ProviderStats:
+    """Rolling latency window and cumulative usage for one provider."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.tokens = 0
+        self.cost_gbp = 0.0
+
+    def record(self, latency: float, tokens: int, cost_gbp: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self.calls += 1
+            self.tokens += tokens
+            self.cost_gbp += cost_gbp
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+
+    def percentile(self, pct: float, min_samples: int = 1) -> float | None:
+        """Latency at ``pct`` (0-100) or ``None`` with too few samples."""
+        with self._lock:
+            data = sorted(self._latencies)
+        if not data or len(data) < min_samples:
+            return None
+        index = min(len(data) - 1, math.ceil(pct / 100 * len(data)) - 1)
+        return data[max(0, index)]
+
+    def snapshot(self) -> Dict[str, float | None]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "tokens": self.tokens,
+            "cost_gbp": self.cost_gbp,
+            "p50_s": self.percentile(50),
+            "p95_s": self.percentile(95),
+        }
+
+
+class CompositeAdapter(AbstractAdapter):
+    """Route batches across several adapters with hedging and failover.
+
+    Each batch goes to the first adapter.  If it has not answered within
+    the primary's p95 latency the batch is also sent to the next adapter
+    and whichever answers first wins.  Errors (including an open circuit)
+    fail over to the next adapter straight away; the last adapter has
+    nothing to fail over to and keeps its own retry policy.  A hedge is only sent if
+    budget for the duplicate call can be reserved first; calls that lose a
+    hedge are settled against that reservation once they complete.
+    """
+
+    provider = "failover"
+
+    def __init__(
+        self,
+        adapters: List[AbstractAdapter],
+        hedge_percentile: float = 95.0,
+        default_hedge_delay: float = float(os.getenv("LLM_HEDGE_DELAY_S", "2.0")),
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 20,
+    ) -> None:
+        if not adapters:
+            raise ValueError("CompositeAdapter needs at least one adapter")
+        super().__init__(
+            "+".join(a.model for a in adapters),
+            batch_size=min(a.batch_size for a in adapters),
+            max_retries=1,
+        )
+        self.adapters = adapters
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.price_per_1k_tokens_gbp = adapters[0].price_per_1k_tokens_gbp
+        self.stats: Dict[str, ProviderStats] = {
+            a.provider_key: ProviderStats() for a in adapters
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * len(adapters), thread_name_prefix="llm-hedge"
+        )
+        self._local = threading.local()
+
+    def estimate_cost(self, prompt: str) -> float:
+        return max(a.estimate_cost(prompt) for a in self.adapters)
+
+    def hedge_delay(self, adapter: AbstractAdapter) -> float:
+        """Seconds to wait on ``adapter`` before hedging to the next one."""
+        p = self.stats[adapter.provider_key].percentile(
+            self.hedge_percentile, self.min_samples
+        )
+        if p is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, p)
+
+    def provider_stats(self) -> Dict[str, Dict[str, float | None]]:
+        return {key: stats.snapshot() for key, stats in self.stats.items()}
+
+    def classify(self, prompts: List[str], job_id: int) -> List[Dict[str, float]]:
+        # hedged calls that finish after the batch returns need the job id
+        self._local.job_id = job_id
+        try:
+            return super().classify(prompts, job_id)
+        finally:
+            self._local.job_id = None
+
+    def _guarded_send(self, prompts: List[str]) -> Dict:
+        # each child call is already guarded by its own provider breaker
+        return self._send(prompts)
+
+    def _timed_call(self, adapter: AbstractAdapter, prompts: List[str]) -> Dict:
+        stats = self.stats[adapter.provider_key]
+        # earlier adapters fail over instead of retrying
+        last = adapter is self.adapters[-1]
+        start = time.monotonic()
+        try:
+            data = adapter._send_with_retries(prompts) if last else adapter._guarded_send(prompts)
+        except Exception:
+            stats.record_error()
+            raise
+        tokens_in, tokens_out, cost_gbp = adapter._usage_cost(data)
+        stats.record(time.monotonic() - start, tokens_in + tokens_out, cost_gbp)
+        return {**data, "cost_gbp": cost_gbp, "provider": adapter.provider_key}
+
+    def _reserve_hedge(
+        self, job_id: int | None, adapter: AbstractAdapter, prompts: List[str]
+    ) -> float | None:
+        """Reserve budget for a duplicate call, or ``None`` if it does not fit."""
+        if job_id is None:
+            return 0.0
+        costs = [adapter.estimate_cost(p) for p in prompts]
+        count, reserved = cost_tracker.reserve_prefix(job_id, costs)
+        if count < len(costs):
+            cost_tracker.release(job_id, reserved)
+            return None
+        return reserved
+
+    def _book_loser(self, job_id: int | None, reserved: float, future: Future) -> None:
+        if job_id is None:
+            return
+        if future.cancelled() or future.exception() is not None:
+            cost_tracker.release(job_id, reserved)
+            return
+        tokens_in, tokens_out, cost_gbp = self._usage_cost(future.result())
+        cost_tracker.settle(job_id, reserved, tokens_in, tokens_out, cost_gbp)
+
+    def _send(self, prompts: List[str]) -> Dict:
+        job_id = getattr(self._local, "job_id", None)
+        candidates = iter(self.adapters)
+        pending: Dict[Future, AbstractAdapter] = {}
+        # budget held for hedges; the call not listed here runs on the
+        # batch reservation made by ``_classify``
+        held: Dict[Future, float] = {}
+        errors: List[BaseException] = []
+        last = self.adapters[0]
+        can_hedge = True
+
+        def launch(hedge: bool = False) -> bool:
+            nonlocal last
+            adapter = next(candidates, None)
+            if adapter is None:
+                return False
+            reserved = 0.0
+            if hedge:
+                budget = self._reserve_hedge(job_id, adapter, prompts)
+                if budget is None:
+                    logger.info("not hedging to %s: cost budget exhausted", adapter.provider_key)
+                    return False
+                reserved = budget
+            future = self._executor.submit(self._timed_call, adapter, prompts)
+            pending[future] = adapter
+            if hedge:
+                held[future] = reserved
+            last = adapter
+            return True
+
+        launch()
+        result: Dict | None = None
+        while pending and result is None:
+            if last is self.adapters[-1] or not can_hedge:
+                timeout = None
+            else:
+                timeout = self.hedge_delay(last)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info("hedging batch after %.2fs on %s", timeout, last.provider_key)
+                can_hedge = launch(hedge=True)
+                continue
+            for future in done:
+                adapter = pending.pop(future)
+                exc = future.exception()
+                if exc is None:
+                    if result is None:
+                        result = future.result()
+                        self._reassign_hedge_budget(job_id, future, pending, held)
+                    else:
+                        self._book_loser(job_id, held.pop(future, 0.0), future)
+                    continue
+                logger.warning("%s failed: %s", adapter.provider_key, exc)
+                errors.append(exc)
+                if job_id is not None and future in held:
+                    cost_tracker.release(job_id, held.pop(future))
+                if result is None and not pending:
+                    # nothing else is running, so the batch reservation is free
+                    launch()
+
+        for future in pending:
+            future.add_done_callback(
+                partial(self._book_loser, job_id, held.pop(future, 0.0))
+            )
+        if result is not None:
+            return result
+        if errors and all(isinstance(e, CircuitOpenError) for e in errors):
+            raise CircuitOpenError("All providers unavailable")
+        raise errors[-1]
+
+    @staticmethod
+    def _reassign_hedge_budget(
+        job_id: int | None,
+        winner: Future,
+        pending: Dict[Future, AbstractAdapter],
+        held: Dict[Future, float],
+    ) -> None:
+        """Move a winning hedge's reservation to the call it overtook.
+
+        ``_classify`` settles the batch reservation against the winner, so
+        the hedge's own reservation now backs the unreserved loser, or is
+        returned if that call has already failed.
+        """
+        if winner not in held:
+            return
+        reserved = held.pop(winner)
+        loser = next((f for f in pending if f not in held), None)
+        if loser is not None:
+            held[loser] = reserved
+        elif job_id is not None:
+            cost_tracker.release(job_id, reserved)
+
+
+def _provider_available(factory: Callable[[], AbstractAdapter]) -> bool:
+    if not getattr(factory, "implemented", True):
+        return False
+    configured = getattr(factory, "configured", None)
+    return configured() if callable(configured) else True
+
+
+def _failover_from_env() -> AbstractAdapter:
+    """Build the failover chain from ``LLM_FAILOVER_PROVIDERS``.
+
+    Without the variable the chain is every registered provider that is
+    implemented and configured, in registration order.
+    """
+    configured = os.getenv("LLM_FAILOVER_PROVIDERS")
+    if configured:
+        names = [
+            n.strip().lower()
+            for n in configured.split(",")
+            if n.strip() and n.strip().lower() != "failover"
+        ]
+        for name in names:
+            factory = _providers.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown LLM provider {name}")
+            if not getattr(factory, "implemented", True):
+                raise ValueError(f"LLM provider {name} is not implemented")
+    else:
+        names = [
+            name
+            for name, factory in _providers.items()
+            if name != "failover" and _provider_available(factory)
+        ]
+    if not names:
+        raise RuntimeError("No configured LLM providers available for failover")
+    return CompositeAdapter([get_adapter(n) for n in names])
+
+
 _providers: Dict[str, Callable[[], AbstractAdapter]] = {}
 _adapter_instances: Dict[str, AbstractAdapter] = {}
 
@@ -247,6 +844,7 @@ def get_adapter(provider_name: str | None = None) -> AbstractAdapter:
 register_provider("openai", OpenAIAdapter)
 register_provider("anthropic", AnthropicAdapter)
 register_provider("azure", AzureAdapter)
+register_provider("failover", _failover_from_env)
 
 
 __all__ = [
@@ -254,9 +852,12 @@ __all__ = [
     "OpenAIAdapter",
     "AnthropicAdapter",
     "AzureAdapter",
+    "CompositeAdapter",
+    "ProviderStats",
     "get_adapter",
     "register_provider",
     "cost_tracker",
     "DailyCostTracker",
+    "estimate_tokens",
 ]
 
@@ -0,0 +1,313 @@
+"""Rate limiting and circuit breaking shared by LLM adapters.
+
+Every provider gets a single :class:`ProviderGuard` per process, so all jobs
+talking to the same provider share one token bucket, one adaptive
+concurrency limit and one circuit breaker.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitError(RuntimeError):
+    """Raised by adapters when the provider answers with HTTP 429."""
+
+    def __init__(self, message: str = "Rate limited", retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit breaker is rejecting calls."""
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Return ``True`` if ``exc`` represents a 429 from the provider."""
+    if isinstance(exc, RateLimitError):
+        return True
+    return getattr(exc, "status_code", None) == 429
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Extract a ``Retry-After`` delay in seconds from ``exc`` if present."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket limiting the request rate to a provider."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def defer(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (e.g. after ``Retry-After``)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    The limit grows by roughly one slot per window of successful calls and
+    is cut by ``decrease`` whenever the provider throttles us.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 16,
+        decrease: float = 0.5,
+    ) -> None:
+        self._limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.decrease = decrease
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self.minimum), int(self._limit))
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self._limit = max(self.minimum, self._limit * self.decrease)
+
+
+class CircuitBreaker:
+    """Classic closed/open/half-open circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if (
+                self._state == self.OPEN
+                and self._clock() - self._opened_at >= self.reset_timeout
+            ):
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return ``True`` if a call may be attempted now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            # half-open: let a single probe through
+            if self._probe_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("circuit opened after %d failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class ProviderGuard:
+    """Bundle of rate limiter, concurrency limiter and breaker for a provider."""
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        limiter: AIMDLimiter,
+        breaker: CircuitBreaker,
+    ) -> None:
+        self.bucket = bucket
+        self.limiter = limiter
+        self.breaker = breaker
+
+    @contextmanager
+    def slot(self, rate_limit: bool = True) -> Iterator[None]:
+        """Wait for permission to call the provider and report the outcome.
+
+        Callers that make several provider requests in one slot pass
+        ``rate_limit=False`` and take a bucket token per request instead.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Provider circuit is open")
+        if rate_limit:
+            self.bucket.acquire()
+        self.limiter.acquire()
+        try:
+            yield
+        except Exception as exc:
+            if is_rate_limited(exc):
+                self.limiter.on_throttle()
+                delay = retry_after(exc)
+                if delay:
+                    self.bucket.defer(delay)
+                # throttling means the provider is alive; free a half-open probe
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            raise
+        else:
+            self.limiter.on_success()
+            self.breaker.record_success()
+        finally:
+            self.limiter.release()
+
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def _default_guard() -> ProviderGuard:
+    return ProviderGuard(
+        TokenBucket(
+            rate=float(os.getenv("LLM_RATE_PER_SEC", "5")),
+            capacity=float(os.getenv("LLM_RATE_BURST", "10")),
+        ),
+        AIMDLimiter(
+            initial=float(os.getenv("LLM_INITIAL_CONCURRENCY", "4")),
+            maximum=float(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        ),
+        CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_S", "30")),
+        ),
+    )
+
+
+def get_guard(provider: str) -> ProviderGuard:
+    """Return the process-wide guard for ``provider``, creating it on first use."""
+    key = provider.lower()
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = _default_guard()
+            _guards[key] = guard
+        return guard
+
+
+def reset_guards() -> None:
+    """Forget all provider state (used by tests)."""
+    with _guards_lock:
+        _guards.clear()
+
+
+__all__ = [
+    "AIMDLimiter",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ProviderGuard",
+    "RateLimitError",
+    "TokenBucket",
+    "backoff_delay",
+    "get_guard",
+    "is_rate_limited",
+    "reset_guards",
+    "retry_after",
+]
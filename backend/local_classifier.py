@@ -0,0 +1,270 @@
+"""Zero-cost local classifier tier in front of the LLM adapter.
+
+A character n-gram multinomial naive Bayes model is trained offline from
+transactions that were already labelled (by rules or the LLM) and from
+learned user rules.  At classification time it runs on CPU for every
+signature the rules engine could not label; only predictions below the
+confidence threshold are escalated to the paid LLM.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Protocol, Set, Tuple
+
+from sqlmodel import Session, select
+
+from rules.engine import CATEGORIES
+
+from .models import Transaction, UserRule
+
+ARTIFACT_VERSION = 1
+
+
+class LocalClassifier(Protocol):
+    """Interface for classifiers usable as the local tier."""
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely category and its confidence in ``[0, 1]``."""
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (2, 4)) -> Counter:
+    """Return character n-gram counts for ``text`` padded with spaces."""
+    padded = f" {text.lower()} "
+    low, high = ngram_range
+    grams: Counter = Counter()
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            grams[padded[i : i + n]] += 1
+    return grams
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over character n-grams."""
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (2, 4),
+        alpha: float = 1.0,
+    ) -> None:
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+        self.class_docs: Dict[str, int] = {}
+        self.feature_counts: Dict[str, Dict[str, int]] = {}
+        self._totals: Dict[str, int] = {}
+        self._vocab: Set[str] = set()
+        self._vocab_size = 0
+        self._digest: Optional[str] = None
+
+    def fit(self, samples: Iterable[Tuple[str, str]], min_count: int = 1) -> "NaiveBayesClassifier":
+        """Train on ``(text, label)`` pairs.
+
+        N-grams seen fewer than ``min_count`` times across all classes are
+        dropped to keep the artifact compact.
+        """
+        docs: Counter = Counter()
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, label in samples:
+            if not text or not label:
+                continue
+            docs[label] += 1
+            counts[label].update(char_ngrams(text, self.ngram_range))
+        if min_count > 1:
+            totals: Counter = Counter()
+            for c in counts.values():
+                totals.update(c)
+            keep = {g for g, n in totals.items() if n >= min_count}
+            for label, c in counts.items():
+                counts[label] = Counter({g: n for g, n in c.items() if g in keep})
+        self.class_docs = dict(docs)
+        self.feature_counts = {label: dict(c) for label, c in counts.items()}
+        self._index()
+        return self
+
+    def _index(self) -> None:
+        vocab: Set[str] = set()
+        for grams in self.feature_counts.values():
+            vocab.update(grams)
+        self._vocab = vocab
+        self._vocab_size = len(vocab)
+        self._totals = {
+            label: sum(grams.values()) for label, grams in self.feature_counts.items()
+        }
+        self._digest = None
+
+    def digest(self) -> str:
+        """SHA-256 of the serialised model; changes whenever it is retrained."""
+        if self._digest is None:
+            payload = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+            self._digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return self._digest
+
+    @property
+    def labels(self) -> List[str]:
+        return sorted(self.class_docs)
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Return the posterior probability of each label for ``text``."""
+        if not self.class_docs:
+            return {}
+        grams = char_ngrams(text, self.ngram_range)
+        n_docs = sum(self.class_docs.values())
+        vocab = self._vocab_size + 1
+        scores: Dict[str, float] = {}
+        for label, docs in self.class_docs.items():
+            counts = self.feature_counts.get(label, {})
+            denom = math.log(self._totals.get(label, 0) + self.alpha * vocab)
+            score = math.log(docs / n_docs)
+            for gram, n in grams.items():
+                score += n * (math.log(counts.get(gram, 0) + self.alpha) - denom)
+            scores[label] = score
+        best = max(scores.values())
+        exp = {label: math.exp(s - best) for label, s in scores.items()}
+        total = sum(exp.values())
+        return {label: v / total for label, v in exp.items()}
+
+    def coverage(self, text: str) -> float:
+        """Fraction of the n-grams in ``text`` that were seen in training."""
+        grams = char_ngrams(text, self.ngram_range)
+        total = sum(grams.values())
+        if not total:
+            return 0.0
+        seen = sum(n for gram, n in grams.items() if gram in self._vocab)
+        return seen / total
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the best label and a confidence score.
+
+        Naive Bayes posteriors are badly overconfident on text unlike
+        anything in the training set, so the posterior is scaled by the
+        n-gram coverage of ``text``.
+        """
+        proba = self.predict_proba(text)
+        if not proba:
+            return "", 0.0
+        label = max(proba, key=lambda k: proba[k])
+        return label, proba[label] * self.coverage(text)
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": ARTIFACT_VERSION,
+            "type": "char_ngram_nb",
+            "ngram_range": list(self.ngram_range),
+            "alpha": self.alpha,
+            "class_docs": self.class_docs,
+            "feature_counts": self.feature_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NaiveBayesClassifier":
+        if data.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported classifier artifact version {data.get('version')}")
+        low, high = data["ngram_range"]
+        model = cls(ngram_range=(low, high), alpha=data["alpha"])
+        model.class_docs = data["class_docs"]
+        model.feature_counts = data["feature_counts"]
+        model._index()
+        return model
+
+    def save(self, path: str | Path) -> Path:
+        """Write the model as gzip-compressed JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(gzip.compress(payload))
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NaiveBayesClassifier":
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def training_samples(session: Session) -> List[Tuple[str, str]]:
+    """Collect ``(merchant_signature, category)`` pairs to train on.
+
+    Uses transactions labelled by rules or the LLM together with every
+    user rule that targets a sanctioned category.
+    """
+    samples: List[Tuple[str, str]] = []
+    rows = session.exec(
+        select(Transaction).where(
+            Transaction.classification_type.in_(["rule", "llm"])  # type: ignore[union-attr]
+        )
+    )
+    for tx in rows:
+        if tx.merchant_signature and tx.category in CATEGORIES:
+            samples.append((tx.merchant_signature, tx.category))
+    for rule in session.exec(select(UserRule)):
+        if rule.label in CATEGORIES:
+            samples.append((rule.pattern, rule.label))
+    return samples
+
+
+def train_from_session(session: Session, min_count: int = 1) -> NaiveBayesClassifier:
+    """Train a classifier from the labelled history in the database."""
+    return NaiveBayesClassifier().fit(training_samples(session), min_count=min_count)
+
+
+def model_path() -> Path:
+    """Location of the trained artifact (``LOCAL_MODEL_PATH``)."""
+    default = Path(os.environ.get("STORAGE_DIR", "./storage")) / "local_classifier.json.gz"
+    return Path(os.environ.get("LOCAL_MODEL_PATH", str(default)))
+
+
+def confidence_threshold() -> float:
+    """Predictions below this confidence are escalated to the LLM."""
+    return float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+
+
+def model_version(model: LocalClassifier) -> str:
+    """Identify ``model`` so results it produced are not reused after a retrain."""
+    digest = getattr(model, "digest", None)
+    return digest() if callable(digest) else type(model).__name__
+
+
+_cache: Dict[str, Tuple[float, NaiveBayesClassifier]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    """Return the trained model, reloading it when the artifact changes.
+
+    Returns ``None`` when no artifact exists so classification falls
+    straight through to the LLM.
+    """
+    path = model_path()
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        model = NaiveBayesClassifier.load(path)
+        _cache[key] = (mtime, model)
+        return model
+
+
+__all__ = [
+    "LocalClassifier",
+    "NaiveBayesClassifier",
+    "char_ngrams",
+    "confidence_threshold",
+    "get_local_classifier",
+    "model_path",
+    "model_version",
+    "train_from_session",
+    "training_samples",
+]
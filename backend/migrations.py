@@ -0,0 +1,119 @@
+"""In-place upgrades for databases created by earlier versions.
+
+``SQLModel.metadata.create_all`` only creates missing tables, so changes to
+existing tables are applied here by :func:`upgrade`, which
+:func:`backend.database.init_db` runs on startup.  Every step checks the
+live schema first and is a no-op once applied.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, cast
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from .models import ProcessingJob, Transaction, Upload
+from .uploads import compress, content_hash, normalise
+
+BACKFILL_BATCH_SIZE = 5000
+# ALTER TABLE ... DROP COLUMN arrived in SQLite 3.35
+DROP_COLUMN_MIN_VERSION = (3, 35, 0)
+
+
+def _add_missing_columns(conn: Connection, model: Any) -> set[str]:
+    """Add the model's missing columns and indexes; returns the columns added."""
+    table = model.__table__
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    added = set()
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {column.name} {column_type}'))
+            added.add(column.name)
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    return added
+
+
+def _typed_transaction_columns(conn: Connection) -> None:
+    """Move ``transaction.data`` JSON into typed columns plus ``extras``.
+
+    The emptied column is dropped where the database supports it; older
+    SQLite keeps it, all ``NULL``, and skips it on later runs.
+    """
+    columns = {c["name"] for c in inspect(conn).get_columns("transaction")}
+    if "data" not in columns:
+        return
+    table = cast(Any, Transaction).__table__
+    _add_missing_columns(conn, Transaction)
+
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                'SELECT id, data FROM "transaction" '
+                "WHERE data IS NOT NULL AND id > :after ORDER BY id LIMIT :n"
+            ),
+            {"after": after_id, "n": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        for tx_id, raw in rows:
+            data = json.loads(raw) if isinstance(raw, str) else raw
+            typed = Transaction.from_data(0, data or {})
+            values = {
+                column.name: getattr(typed, column.name)
+                for column in table.columns
+                if column.name not in ("id", "job_id")
+            }
+            conn.execute(update(table).where(table.c.id == tx_id).values(**values))
+        after_id = rows[-1][0]
+    if conn.dialect.name != "sqlite" or sqlite3.sqlite_version_info >= DROP_COLUMN_MIN_VERSION:
+        conn.execute(text('ALTER TABLE "transaction" DROP COLUMN data'))
+    else:
+        conn.execute(text('UPDATE "transaction" SET data = NULL WHERE data IS NOT NULL'))
+
+
+def _compressed_uploads(conn: Connection) -> None:
+    """Hash and gzip uploads stored as plain text, then drop the text."""
+    _add_missing_columns(conn, Upload)
+    table = cast(Any, Upload).__table__
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, content, content_hash FROM upload "
+                "WHERE body IS NULL AND id > :after ORDER BY id LIMIT :n"
+            ),
+            {"after": after_id, "n": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        for upload_id, content, digest in rows:
+            normalised = normalise(content or "")
+            conn.execute(
+                update(table)
+                .where(table.c.id == upload_id)
+                .values(
+                    content="",
+                    body=compress(normalised),
+                    content_hash=digest or content_hash(normalised),
+                )
+            )
+        after_id = rows[-1][0]
+
+
+def upgrade(engine: Engine) -> None:
+    """Bring an existing database up to the current models."""
+    with engine.begin() as conn:
+        if inspect(conn).has_table("transaction"):
+            _typed_transaction_columns(conn)
+        if inspect(conn).has_table("upload"):
+            _compressed_uploads(conn)
+        if inspect(conn).has_table("processingjob"):
+            _add_missing_columns(conn, ProcessingJob)
+
+
+__all__ = ["upgrade"]
@@ -1,20 +1,43 @@
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import date as Date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Dict, Any, Callable, Sequence, Tuple
 
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, LargeBinary, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
 class Upload(SQLModel, table=True):
+    """Uploaded NDJSON, stored once per distinct ``content_hash``.
+
+    ``body`` holds the gzip-compressed text.  ``content`` is only set for
+    uploads stored before compression and is empty otherwise.
+    """
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    content: str
+    content: str = ""
+    body: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+    content_hash: Optional[str] = Field(default=None, index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ProcessingJob(SQLModel, table=True):
+    """One classification run of an upload.
+
+    ``user_id``, ``rules_version`` and ``classifier_version`` (the LLM
+    provider and model and the local classifier artifact) record who
+    classified it with what, so a later job for the same upload can reuse
+    the results.  ``degraded`` jobs left some signatures unclassified
+    because the budget ran out or the provider circuit was open; they are
+    never reused so those signatures are retried.
+    """
+
     id: Optional[int] = Field(default=None, primary_key=True)
     upload_id: int = Field(foreign_key="upload.id")
     status: str = Field(default="pending")
+    user_id: Optional[int] = None
+    rules_version: Optional[str] = None
+    classifier_version: Optional[str] = None
+    degraded: Optional[bool] = None
 
 
 class UserRule(SQLModel, table=True):
@@ -38,13 +61,164 @@ class ClassificationResult(SQLModel, table=True):
     status: str = Field(default="queued")
 
 
+def amount_to_pence(value: Any) -> Optional[int]:
+    """Return ``value`` in whole pence, or ``None`` unless it is an exact amount."""
+    if isinstance(value, bool):
+        return None
+    try:
+        pence = Decimal(str(value)) * 100
+    except InvalidOperation:
+        return None
+    if not pence.is_finite() or pence != pence.to_integral_value():
+        return None
+    return int(pence)
+
+
+def format_pence(pence: int) -> str:
+    """Format whole pence as a decimal amount string such as ``-12.05``."""
+    whole, frac = divmod(abs(pence), 100)
+    return f"{'-' if pence < 0 else ''}{whole}.{frac:02d}"
+
+
+def _parse_date(value: Any) -> Optional[Date]:
+    try:
+        return Date.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+def _text(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+
+def _same(value: Any) -> Any:
+    return value
+
+
+# transaction dict key, column, parse from the dict, format back into the dict
+_TYPED_FIELDS: Tuple[Tuple[str, str, Callable[[Any], Any], Callable[[Any], Any]], ...] = (
+    ("date", "date", _parse_date, Date.isoformat),
+    ("description", "description", _text, _same),
+    ("amount", "amount_pence", amount_to_pence, format_pence),
+    ("type", "type", _text, _same),
+    ("merchant_signature", "merchant_signature", _text, _same),
+    ("category", "category", _text, _same),
+    ("label", "label", _text, _same),
+    ("classification_type", "classification_type", _text, _same),
+)
+_TYPED_KEYS = frozenset(key for key, *_ in _TYPED_FIELDS)
+# parsed only when exact to the penny, so "+12.50" or 12.5 lose nothing as pence
+_NUMERIC_KEYS = frozenset({"amount"})
+
+
 class Transaction(SQLModel, table=True):
+    """A classified transaction stored as typed columns.
+
+    ``classification_type`` records the source of the label (rule, local,
+    llm, user).  Keys without a column, and values that would not survive
+    the round trip through their column unchanged (non-ISO dates, amounts
+    with fractions of a penny), are kept in ``extras``.  Amounts are
+    compared to the penny, so :attr:`data` returns the original dict with
+    ``"+12.50"`` or ``12.5`` written as ``"12.50"``.
+    """
+
+    __table_args__ = (
+        Index("ix_transaction_job_type", "job_id", "classification_type"),
+        Index("ix_transaction_job_label", "job_id", "label"),
+        Index("ix_transaction_job_date", "job_id", "date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     job_id: int = Field(foreign_key="processingjob.id")
+    date: Optional[Date] = None
     description: Optional[str] = None
-    data: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    amount_pence: Optional[int] = None
+    type: Optional[str] = None
+    merchant_signature: Optional[str] = None
+    category: Optional[str] = None
     label: Optional[str] = None
     classification_type: Optional[str] = None
+    extras: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+
+    @classmethod
+    def from_data(cls, job_id: int, data: Dict[str, Any]) -> "Transaction":
+        transaction = cls(job_id=job_id)
+        transaction.set_data(data)
+        return transaction
+
+    def set_data(self, data: Dict[str, Any]) -> None:
+        """Replace the typed columns and extras with the contents of ``data``."""
+        extras = {k: v for k, v in data.items() if k not in _TYPED_KEYS}
+        for key, attr, parse, fmt in _TYPED_FIELDS:
+            raw = data.get(key)
+            value = parse(raw) if raw is not None else None
+            setattr(self, attr, value)
+            if key in data and (
+                value is None or (key not in _NUMERIC_KEYS and fmt(value) != raw)
+            ):
+                extras[key] = raw
+        self.extras = extras or None
+
+    @staticmethod
+    def data_columns() -> Tuple[Any, ...]:
+        """Columns to select for :meth:`data_from_row`."""
+        return tuple(getattr(Transaction, attr) for _, attr, _, _ in _TYPED_FIELDS) + (
+            Transaction.extras,
+        )
+
+    @staticmethod
+    def data_from_row(row: Sequence[Any]) -> Dict[str, Any]:
+        """Rebuild the transaction dict from values of :meth:`data_columns`."""
+        data = {
+            key: fmt(value)
+            for (key, _, _, fmt), value in zip(_TYPED_FIELDS, row)
+            if value is not None
+        }
+        extras = row[len(_TYPED_FIELDS)]
+        if extras:
+            data.update(extras)
+        return data
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The transaction as a dict, as it was classified."""
+        return self.data_from_row(
+            [getattr(self, attr) for _, attr, _, _ in _TYPED_FIELDS] + [self.extras]
+        )
+
+
+class JobSummaryState(SQLModel, table=True):
+    """Incrementally maintained summary aggregates for a job."""
+
+    job_id: int = Field(foreign_key="processingjob.id", primary_key=True)
+    state: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UserTransaction(SQLModel, table=True):
+    """A user's deduplicated transaction history across all jobs."""
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "fingerprint"),
+        Index("ix_usertransaction_user_date", "user_id", "date"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(nullable=False)
+    date: str = Field(nullable=False)
+    fingerprint: str = Field(nullable=False)
+    job_id: int = Field(foreign_key="processingjob.id")
+    transaction_id: Optional[int] = Field(default=None, foreign_key="transaction.id", index=True)
+    data: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+class UserSummaryState(SQLModel, table=True):
+    """Incrementally maintained summary aggregates over a user's history."""
+
+    user_id: int = Field(primary_key=True)
+    last_job_id: Optional[int] = None
+    state: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class LLMCost(SQLModel, table=True):
@@ -63,3 +237,7 @@ class ClassifyRequest(SQLModel):
 class SummaryRequest(SQLModel):
     job_id: int
     user_id: int = 0
+
+
+class RelabelRequest(SQLModel):
+    label: str
@@ -1,18 +1,48 @@
-"""Report generation using LLM and WeasyPrint."""
+"""Report generation from a Jinja template and WeasyPrint.
+
+The tables and the category chart are rendered deterministically from the
+summary by ``templates/report.html.j2``.  An LLM is only asked for a short
+narrative overview, which is optional (``REPORT_NARRATIVE=0`` or an unset
+``OPENAI_API_KEY`` leaves it out) and cached by summary content, so most reports cost a PDF render.
+
+Reports are cached by content: the key hashes the summary (without its
+``job_id`` and ``generated_at``, which differ between otherwise identical
+summaries) together with the template and prompt version and, when a
+narrative is included, the report model.  Generated HTML and PDF are kept
+under ``STORAGE_DIR/report_cache``, so an identical summary reuses them
+without another LLM call or PDF render.
+
+``GET /report/{job_id}`` answers from the cache or starts generation in a
+background thread and returns ``202``; clients poll
+``GET /report/{job_id}/status`` until the report is ready.  Concurrent
+requests for the same key share one generation, and each job gets a copy
+of its PDF.  A job keeps its latest generation until the result is cached,
+so a report served without its narrative stays ready on later polls and
+is only regenerated by the next ``GET /report/{job_id}``.
+"""
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
 import os
+import shutil
+import threading
+from functools import partial
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
-from typing import Callable, Tuple, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, List, Optional, Tuple, Dict
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+from .analytics import atomic_write
 from .auth import auth_dependency
 from .signing import generate_signed_url
 from backend.llm_adapter import cost_tracker
 
-# LLM callable returning generated HTML and usage statistics
+# LLM callable returning generated text and usage statistics
 LLMFunc = Callable[[str], Tuple[str, Dict[str, int]]]
 
 # Accessible A4 stylesheet used by WeasyPrint
@@ -21,16 +51,55 @@ A4_CSS = """
 body { font-family: Arial, sans-serif; }
 """
 
+# bump when the prompt or template changes so cached reports are not reused
+REPORT_PROMPT_VERSION = "2"
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+LLM_TIMEOUT_SECONDS = 30
+# summary fields that vary between otherwise identical summaries
+_VOLATILE_FIELDS = ("job_id", "generated_at")
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+NARRATIVE_PROMPT = (
+    "You are writing the overview of a personal spending report. In at most "
+    "120 words of plain text (no HTML or markdown), summarise the most useful "
+    "points of this analysis for the account holder: overall balance, the "
+    "largest spending categories, recurring payments and anything unusual.\n\n"
+)
+
 router = APIRouter()
+logger = logging.getLogger(__name__)
+_templates = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html", "j2"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+_inflight: Dict[str, "Future[Path]"] = {}
+# latest generation per job report path whose result is not in the cache yet:
+# still running, failed, or served without its narrative
+_jobs: Dict[Path, Tuple[str, "Future[Path]"]] = {}
+_inflight_lock = threading.Lock()
+
+
+def narrative_enabled() -> bool:
+    """Narratives need ``REPORT_NARRATIVE`` not set to 0 and an OpenAI key."""
+    return os.getenv("REPORT_NARRATIVE", "1") != "0" and bool(os.getenv("OPENAI_API_KEY"))
 
 
-def get_llm() -> LLMFunc:
-    """Return a callable that sends a prompt to an LLM and returns HTML and usage."""
+def get_llm() -> Optional[LLMFunc]:
+    """Return a callable that sends a prompt to an LLM and returns text and usage.
+
+    Returns ``None`` when narratives are disabled or no ``OPENAI_API_KEY``
+    is set, so the report is rendered without an overview.
+    """
+    if not narrative_enabled():
+        return None
     import openai
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=api_key)
-    model = os.getenv("REPORT_MODEL", "gpt-4o-mini")
+    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    model = report_model()
 
     def _call(prompt: str) -> Tuple[str, Dict[str, int]]:
         resp = client.chat.completions.create(
@@ -46,29 +115,87 @@ def get_llm() -> LLMFunc:
     return _call
 
 
+def report_model() -> str:
+    return os.getenv("REPORT_MODEL", "gpt-4o-mini")
+
+
+def _storage_dir() -> Path:
+    return Path(os.environ.get("STORAGE_DIR", "./storage"))
+
+
 def _summary_path(job_id: int) -> Path:
-    storage_dir = Path(os.environ.get("STORAGE_DIR", "./storage"))
-    return storage_dir / f"{job_id}_summary_v1.json"
+    return _storage_dir() / f"{job_id}_summary_v1.json"
 
 
 def _report_path(job_id: int) -> Path:
-    storage_dir = Path(os.environ.get("STORAGE_DIR", "./storage"))
+    storage_dir = _storage_dir()
     storage_dir.mkdir(parents=True, exist_ok=True)
     return storage_dir / f"{job_id}_report.pdf"
 
 
-def generate_report(job_id: int, llm: LLMFunc) -> Path:
-    """Generate a PDF report for the given job using the provided LLM."""
-    try:  # noqa: PLC0415 - imported inside for optional dependency
-        from weasyprint import HTML, CSS  # type: ignore[import-untyped]
-    except ImportError as exc:  # pragma: no cover - optional dependency
-        raise RuntimeError(
-            "WeasyPrint is required to generate PDF reports"
-        ) from exc
+def _cache_dir() -> Path:
+    cache_dir = _storage_dir() / "report_cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def _load_summary(job_id: int) -> Dict[str, Any]:
     summary_file = _summary_path(job_id)
     if not summary_file.exists():
         raise FileNotFoundError("Summary not found")
-    prompt = summary_file.read_text(encoding="utf-8")
+    return json.loads(summary_file.read_text(encoding="utf-8"))
+
+
+def report_prompt(summary: Dict[str, Any]) -> str:
+    """The summary as sent to the LLM, without the per-run fields."""
+    stable = {k: v for k, v in summary.items() if k not in _VOLATILE_FIELDS}
+    return json.dumps(stable, indent=2, sort_keys=True)
+
+
+def report_key(summary: Dict[str, Any], narrative: bool = True) -> str:
+    """Cache key of the report for ``summary`` under the current template and model."""
+    model = report_model() if narrative else ""
+    material = "\x1f".join([model, REPORT_PROMPT_VERSION, report_prompt(summary)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _money(value: Any) -> str:
+    return f"{float(value):,.2f}"
+
+
+_templates.filters["money"] = _money
+
+
+def _spending_chart(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Category spend as bar widths relative to the largest category."""
+    spend = [
+        (c["name"], -float(c["total"])) for c in summary.get("categories", []) if c["total"] < 0
+    ]
+    spend.sort(key=lambda item: item[1], reverse=True)
+    largest = spend[0][1] if spend else 0.0
+    return [
+        {"name": name, "amount": amount, "width": round(100 * amount / largest, 1)}
+        for name, amount in spend
+    ]
+
+
+def render_report_html(summary: Dict[str, Any], narrative: Optional[str] = None) -> str:
+    """Render the report HTML for ``summary`` with an optional narrative."""
+    return _templates.get_template("report.html.j2").render(
+        summary=summary, narrative=narrative, spending=_spending_chart(summary)
+    )
+
+
+def _narrative(job_id: int, summary: Dict[str, Any], llm: LLMFunc) -> Optional[str]:
+    """The LLM overview of ``summary``, cached by summary content and model.
+
+    Returns ``None`` if the LLM fails or times out; the report is then
+    rendered without it.
+    """
+    path = _cache_dir() / f"{report_key(summary)}.narrative.txt"
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    prompt = NARRATIVE_PROMPT + report_prompt(summary)
 
     def _call() -> Tuple[str, Dict[str, int]]:
         return llm(prompt)
@@ -76,9 +203,13 @@ def generate_report(job_id: int, llm: LLMFunc) -> Path:
     try:
         with ThreadPoolExecutor(max_workers=1) as ex:
             future = ex.submit(_call)
-            content, usage = future.result(timeout=30)
-    except FutureTimeout as exc:  # pragma: no cover - timeout scenario
-        raise RuntimeError("Report generation timed out") from exc
+            content, usage = future.result(timeout=LLM_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        logger.warning("Report narrative for job %s timed out", job_id)
+        return None
+    except Exception:
+        logger.exception("Report narrative for job %s failed", job_id)
+        return None
 
     tokens_in = usage.get("prompt_tokens", usage.get("total_tokens", 0))
     tokens_out = usage.get("completion_tokens", 0)
@@ -87,7 +218,45 @@ def generate_report(job_id: int, llm: LLMFunc) -> Path:
     cost = tokens / 1000 * price_per_1k
     cost_tracker.add(job_id, tokens_in, tokens_out, cost)
 
-    html_str = content if isinstance(content, str) else str(content)
+    text = (content if isinstance(content, str) else str(content)).strip()
+    atomic_write(path, text.encode("utf-8"))
+    return text
+
+
+def _cached_report(job_id: int, key: str) -> Path | None:
+    """Copy the cached PDF for ``key`` to the job's report path, if there is one."""
+    cached = _cache_dir() / f"{key}.pdf"
+    if not cached.exists():
+        return None
+    pdf_path = _report_path(job_id)
+    tmp = pdf_path.with_name(f".{pdf_path.name}.{threading.get_ident()}.tmp")
+    shutil.copyfile(cached, tmp)
+    os.replace(tmp, pdf_path)
+    return pdf_path
+
+
+def generate_report(job_id: int, llm: Optional[LLMFunc]) -> Path:
+    """Generate a PDF report for the given job.
+
+    ``llm`` only writes the narrative overview; without it the report is
+    the templated tables alone.  A report already cached for an identical
+    summary is reused without calling the LLM or WeasyPrint.
+    """
+    summary = _load_summary(job_id)
+    key = report_key(summary, llm is not None)
+    cached = _cached_report(job_id, key)
+    if cached is not None:
+        return cached
+
+    try:  # noqa: PLC0415 - imported inside for optional dependency
+        from weasyprint import HTML, CSS  # type: ignore[import-untyped]
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError(
+            "WeasyPrint is required to generate PDF reports"
+        ) from exc
+
+    narrative = _narrative(job_id, summary, llm) if llm is not None else None
+    html_str = render_report_html(summary, narrative)
     css = CSS(string=A4_CSS)
     pdf_cost = float(os.getenv("WEASYPRINT_COST_GBP", "0.01"))
     with cost_tracker.track(job_id, pdf_cost):
@@ -96,25 +265,135 @@ def generate_report(job_id: int, llm: LLMFunc) -> Path:
     if len(pdf_bytes) > 5 * 1024 * 1024:
         raise RuntimeError("Generated PDF too large")
 
+    # a report missing its narrative is served but not cached, so it is retried
+    if llm is None or narrative is not None:
+        cache_dir = _cache_dir()
+        atomic_write(cache_dir / f"{key}.html", html_str.encode("utf-8"))
+        atomic_write(cache_dir / f"{key}.pdf", pdf_bytes)
     pdf_path = _report_path(job_id)
-    pdf_path.write_bytes(pdf_bytes)
+    atomic_write(pdf_path, pdf_bytes)
+    cost_tracker.flush()
     return pdf_path
 
 
+def start_report(job_id: int, llm: Optional[LLMFunc]) -> Tuple[str, "Future[Path]"]:
+    """Queue generation of the job's report; returns its key and future.
+
+    A generation already running for the same key is shared.
+    """
+    key = report_key(_load_summary(job_id), llm is not None)
+    with _inflight_lock:
+        running = _inflight.get(key)
+        started = running is None or running.done()
+        if running is None or started:
+            future = _executor.submit(generate_report, job_id, llm)
+            _inflight[key] = future
+        else:
+            future = running
+        _jobs[_report_path(job_id)] = (key, future)
+    if started:
+        future.add_done_callback(partial(_finished, key))
+    return key, future
+
+
+def _finished(key: str, future: "Future[Path]") -> None:
+    """Forget a finished generation; a cached result is served from the cache."""
+    cached = (_cache_dir() / f"{key}.pdf").exists()
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+        if cached:
+            for path in [p for p, (_, f) in _jobs.items() if f is future]:
+                del _jobs[path]
+
+
+def _resolved(path: Path) -> "Future[Path]":
+    future: "Future[Path]" = Future()
+    future.set_result(path)
+    return future
+
+
+def report_status(job_id: int) -> Dict[str, Any]:
+    """``ready`` (with a signed URL), ``pending``, ``failed`` or ``missing``."""
+    key = report_key(_load_summary(job_id), narrative_enabled())
+    pdf_path = _report_path(job_id)
+    with _inflight_lock:
+        entry = _jobs.get(pdf_path)
+    ready = {"status": "ready", "url": generate_signed_url(f"/download/{job_id}/report")}
+    if entry is None or entry[0] != key:
+        return ready if _cached_report(job_id, key) is not None else {"status": "missing"}
+    future = entry[1]
+    if not future.done():
+        return {"status": "pending"}
+    if future.exception() is not None:
+        return {"status": "failed", "detail": str(future.exception())}
+    generated = future.result()
+    if generated != pdf_path:
+        # a generation shared with another job wrote that job's report
+        tmp = pdf_path.with_name(f".{pdf_path.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(generated, tmp)
+        os.replace(tmp, pdf_path)
+        with _inflight_lock:
+            if _jobs.get(pdf_path) is entry:
+                _jobs[pdf_path] = (key, _resolved(pdf_path))
+    return ready
+
+
+def _needs_generation(job_id: int, status: Dict[str, Any]) -> bool:
+    """Whether ``GET /report`` should (re)start generation for the job.
+
+    Reports served without their narrative are retried on the next request.
+    """
+    if status["status"] != "ready":
+        return True
+    with _inflight_lock:
+        return _report_path(job_id) in _jobs
+
+
 @router.get("/report/{job_id}")
-def get_report(job_id: int, llm: LLMFunc = Depends(get_llm), _: None = Depends(auth_dependency)):
-    """Generate a report PDF and return a signed download URL."""
-    path = _report_path(job_id)
-    if not path.exists():
-        try:
-            path = generate_report(job_id, llm)
-        except FileNotFoundError:
-            raise HTTPException(status_code=404, detail="Summary not found")
-        except RuntimeError as exc:  # pragma: no cover - error cases
-            raise HTTPException(status_code=500, detail=str(exc))
-
-    url = generate_signed_url(f"/download/{job_id}/report")
-    return {"url": url}
-
-
-__all__ = ["router", "get_llm", "generate_report"]
+def get_report(
+    job_id: int,
+    llm: Optional[LLMFunc] = Depends(get_llm),
+    _: None = Depends(auth_dependency),
+):
+    """Return a signed URL for the job's report, starting generation if needed.
+
+    Responds ``202`` while the report is generated in the background.
+    """
+    try:
+        status = report_status(job_id)
+        if not _needs_generation(job_id, status):
+            return status
+        start_report(job_id, llm)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return JSONResponse(
+        status_code=202,
+        content={"status": "pending", "status_url": f"/report/{job_id}/status"},
+    )
+
+
+@router.get("/report/{job_id}/status")
+def get_report_status(job_id: int, _: None = Depends(auth_dependency)):
+    """Poll a report started by ``GET /report/{job_id}``."""
+    try:
+        status = report_status(job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    if status["status"] == "missing":
+        raise HTTPException(status_code=404, detail="Report not requested")
+    return status
+
+
+__all__ = [
+    "REPORT_PROMPT_VERSION",
+    "generate_report",
+    "get_llm",
+    "narrative_enabled",
+    "report_key",
+    "report_prompt",
+    "render_report_html",
+    "report_status",
+    "router",
+    "start_report",
+]
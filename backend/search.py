@@ -0,0 +1,106 @@
+"""Indexes and full-text search for transaction filtering.
+
+Listing filters lead with ``job_id`` and are served by the composite
+``(job_id, classification_type)`` and ``(job_id, label)`` indexes declared
+on :class:`~backend.models.Transaction`.  Description search uses a
+trigram index so ``contains`` does not scan every job's rows:
+
+* SQLite: an external-content FTS5 table with the ``trigram`` tokenizer,
+  kept in sync by triggers.  FTS5 answers ``LIKE '%…%'`` from the index
+  with the same (ASCII case-insensitive) semantics as the plain column.
+  The tokenizer needs SQLite 3.34; older libraries keep the plain ``LIKE``.
+* PostgreSQL: a ``pg_trgm`` GIN index, which the planner uses for the
+  unchanged ``LIKE`` filter.
+
+:func:`install` is idempotent and is run by :func:`backend.database.init_db`.
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import weakref
+from typing import Any, cast
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import ColumnElement
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "transaction_fts"
+# first SQLite release with the FTS5 trigram tokenizer
+TRIGRAM_MIN_VERSION = (3, 34, 0)
+# trigram indexes can only narrow searches of at least three characters
+MIN_FTS_LENGTH = 3
+
+_fts = table(FTS_TABLE, column("rowid"), column("description"))
+_fts_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+_SQLITE_FTS = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        description, content='transaction', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "transaction" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description ON "transaction"
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+_POSTGRES_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    'CREATE INDEX IF NOT EXISTS ix_transaction_description_trgm '
+    'ON "transaction" USING gin (description gin_trgm_ops)',
+]
+
+
+def install(engine: Engine) -> None:
+    """Create missing indexes and the description search index for ``engine``."""
+    with engine.begin() as conn:
+        # create_all only adds indexes together with new tables
+        for index in cast(Any, Transaction).__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+        if engine.dialect.name == "sqlite":
+            if sqlite3.sqlite_version_info < TRIGRAM_MIN_VERSION:
+                logger.info(
+                    "SQLite %s has no trigram tokenizer; description search uses LIKE",
+                    sqlite3.sqlite_version,
+                )
+                return
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            if exists is None:
+                for statement in _SQLITE_FTS:
+                    conn.execute(text(statement))
+            _fts_engines.add(engine)
+        elif engine.dialect.name == "postgresql":
+            for statement in _POSTGRES_TRGM:
+                conn.execute(text(statement))
+
+
+def description_filter(bind: Any, description: str) -> ColumnElement[bool]:
+    """Condition matching transactions whose description contains ``description``.
+
+    ``bind`` is the engine the query will run on (``session.get_bind()``).
+    """
+    desc_column = cast(Any, Transaction.description)
+    if bind in _fts_engines and len(description) >= MIN_FTS_LENGTH:
+        matches = select(_fts.c.rowid).where(_fts.c.description.like(f"%{description}%"))
+        return cast(Any, Transaction.id).in_(matches)
+    return desc_column.contains(description)
+
+
+__all__ = ["FTS_TABLE", "description_filter", "install"]
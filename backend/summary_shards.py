@@ -0,0 +1,315 @@
+"""Sharded summary generation for very large jobs.
+
+Transactions are partitioned by a stable hash of their merchant signature,
+so every merchant's history lands in exactly one shard.  Each shard is
+summarised in a worker process into plain partial aggregates: pence sums
+per type, category and category-month, per-merchant monthly totals and the
+shard's recurring series.  The parent merges the partials in first-seen
+order and runs the same heuristics as :func:`backend.analytics.generate_summary`,
+so the document is identical to the serial one.
+
+Cross-merchant sums are only order independent when every amount is a
+whole number of pence (see :func:`backend.columnar.exact_group_sum`);
+anything else, and jobs below :data:`SHARD_MIN_ROWS`, use the serial path.
+
+``POST /summary`` uses :func:`summary_from_rows` for large jobs that can
+neither be summarised in SQL nor from stored aggregates.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel import Session, func, select
+
+from bankcleanr import registry
+
+from .analytics import (
+    CATEGORIES_PATH,
+    build_summary_document,
+    detect_recurring,
+    generate_summary,
+    overspending_from_totals,
+    write_summary,
+)
+from .anomalies import detect_anomalies
+from .columnar import CREDIT, DEBIT, TransactionColumns, first_index, pence, pence_sum
+from .models import Transaction
+
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", str(os.cpu_count() or 1)))
+SHARD_MIN_ROWS = int(os.getenv("SUMMARY_SHARD_MIN_ROWS", "50000"))
+
+Fields = Tuple[List[Any], List[Optional[str]], List[str], List[str], List[str]]
+
+
+def shard_of(signature: str, shards: int) -> int:
+    """Stable shard number for ``signature`` (independent of ``PYTHONHASHSEED``)."""
+    return zlib.crc32(signature.encode("utf-8")) % shards
+
+
+def _partition(
+    transactions: Sequence[Dict[str, Any]], shards: int
+) -> List[Tuple[Fields, List[int]]]:
+    """Split into per-shard field lists plus each row's original position."""
+    parts: List[Tuple[Fields, List[int]]] = [(([], [], [], [], []), []) for _ in range(shards)]
+    shard_cache: Dict[str, int] = {}
+    for pos, tx in enumerate(transactions):
+        sig = tx["merchant_signature"]
+        k = shard_cache.get(sig)
+        if k is None:
+            k = shard_cache[sig] = shard_of(sig, shards)
+        (amounts, types, dates, cats, sigs), positions = parts[k]
+        amounts.append(tx["amount"])
+        types.append(tx.get("type"))
+        dates.append(tx["date"])
+        cats.append(tx.get("category") or "")
+        sigs.append(sig)
+        positions.append(pos)
+    return [part for part in parts if part[1]]
+
+
+def _pence_sum(keys: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """:func:`pence_sum` for shards, whose amounts must all be whole pence."""
+    sums = pence_sum(keys, values, size)
+    if sums is None:
+        raise ValueError("Sharded summaries need amounts in whole pence")
+    return sums
+
+
+def _month_totals(
+    outer: np.ndarray, cols: TransactionColumns, rows: np.ndarray, first: np.ndarray
+) -> Dict[int, Tuple[int, Dict[str, float]]]:
+    """Pence totals per (outer code, month) with each outer code's first position.
+
+    Months are kept in the order they were first seen.
+    """
+    n_months = max(len(cols.month_labels), 1)
+    keys = outer[rows] * n_months + cols.months[rows]
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = _pence_sum(inverse, np.abs(cols.amounts[rows]), pairs.shape[0])
+    pair_first = first_index(inverse, pairs.shape[0])
+    out: Dict[int, Tuple[int, Dict[str, float]]] = {}
+    for p in np.argsort(pair_first, kind="stable").tolist():
+        code, month = divmod(int(pairs[p]), n_months)
+        if code not in out:
+            out[code] = (int(first[code]), {})
+        out[code][1][cols.month_labels[month]] = float(sums[p])
+    return out
+
+
+def _shard_partial(fields: Fields, positions: List[int]) -> Dict[str, Any]:
+    """Summarise one shard; runs in a worker process."""
+    cols = TransactionColumns.from_fields(*fields)
+    pos = np.asarray(positions, dtype=np.int64)
+    by_type = _pence_sum(cols.types.astype(np.int64) + 1, cols.amounts, 3)
+    n_cats = len(cols.category_labels)
+    n_sigs = len(cols.signature_labels)
+    known = np.flatnonzero(cols.categories >= 0)
+    cat_codes = cols.categories[known]
+    cat_sums = _pence_sum(cat_codes, cols.amounts[known], n_cats)
+    cat_counts = np.bincount(cat_codes, minlength=n_cats)
+    # labels only exist for codes that occur, so every first index is valid
+    cat_first = pos[known][first_index(cat_codes, n_cats)]
+    sig_first = pos[first_index(cols.signatures, n_sigs)]
+
+    pairs = np.unique(cat_codes * max(n_sigs, 1) + cols.signatures[known])
+    merchants: Dict[str, List[str]] = {}
+    for pair in pairs.tolist():
+        cat, sig = divmod(pair, max(n_sigs, 1))
+        names = merchants.setdefault(cols.category_labels[cat], [])
+        if len(names) < 3:
+            names.append(cols.signature_labels[sig])
+
+    categories = {
+        cols.category_labels[c]: (float(cat_sums[c]), int(cat_counts[c]), int(cat_first[c]))
+        for c in np.flatnonzero(cat_counts).tolist()
+    }
+    category_months = {
+        cols.category_labels[c]: value
+        for c, value in _month_totals(cols.categories, cols, known, cat_first).items()
+    }
+    merchant_months = {
+        cols.signature_labels[s]: value
+        for s, value in _month_totals(
+            cols.signatures, cols, np.arange(len(cols)), sig_first
+        ).items()
+    }
+    sig_codes = {name: code for code, name in enumerate(cols.signature_labels)}
+    recurring = [
+        (int(sig_first[sig_codes[rec["merchant"]]]), rec) for rec in detect_recurring(cols)
+    ]
+    return {
+        "credit": float(by_type[CREDIT + 1]),
+        "debit": float(by_type[DEBIT + 1]),
+        "categories": categories,
+        "merchants": merchants,
+        "category_months": category_months,
+        "merchant_months": merchant_months,
+        "recurring": recurring,
+    }
+
+
+def _in_order(items: Dict[str, Tuple[int, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Order ``name -> (first position, months)`` by first position, in pounds."""
+    ordered = sorted(items.items(), key=lambda item: item[1][0])
+    return {
+        name: {month: total / 100 for month, total in months.items()}
+        for name, (_, months) in ordered
+    }
+
+
+def merge_partials(
+    partials: Sequence[Dict[str, Any]], categories: Sequence[str]
+) -> Tuple[Dict[str, float], List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+    """Combine shard partials into totals, categories, recurring and overspending.
+
+    ``categories`` is the taxonomy, which fixes the order of the breakdown.
+    """
+    income = sum(p["credit"] for p in partials) / 100
+    expenses = sum(p["debit"] for p in partials) / 100
+    totals = {"income": income, "expenses": expenses, "net": income + expenses}
+
+    cat_totals: Dict[str, List[Any]] = {}
+    merchants: Dict[str, List[str]] = {}
+    category_months: Dict[str, Tuple[int, Dict[str, float]]] = {}
+    merchant_months: Dict[str, Tuple[int, Dict[str, float]]] = {}
+    recurring: List[Tuple[int, Dict[str, Any]]] = []
+    for part in partials:
+        for name, (total, count, first) in part["categories"].items():
+            entry = cat_totals.setdefault(name, [0.0, 0, first])
+            entry[0] += total
+            entry[1] += count
+            entry[2] = min(entry[2], first)
+        for name, names in part["merchants"].items():
+            merchants.setdefault(name, []).extend(names)
+        for name, (first, months) in part["category_months"].items():
+            prev_first, merged = category_months.setdefault(name, (first, {}))
+            for month, total in months.items():
+                merged[month] = merged.get(month, 0.0) + total
+            category_months[name] = (min(prev_first, first), merged)
+        # merchants never span shards
+        merchant_months.update(part["merchant_months"])
+        recurring.extend(part["recurring"])
+
+    categories_out = [
+        {
+            "name": name,
+            "total": cat_totals[name][0] / 100,
+            "count": cat_totals[name][1],
+            "sample_merchants": sorted(merchants[name])[:3],
+        }
+        for name in categories
+        if name in cat_totals
+    ]
+    recurring_out = [rec for _, rec in sorted(recurring, key=lambda item: item[0])]
+    overspending = overspending_from_totals(
+        _in_order(category_months), _in_order(merchant_months), recurring_out
+    )
+    return totals, categories_out, recurring_out, overspending
+
+
+def generate_summary_sharded(
+    transactions: Sequence[Dict[str, Any]],
+    job_id: str,
+    user_id: str,
+    period: Dict[str, str],
+    currency: str = "GBP",
+    output_dir: Path | None = None,
+    prefix: str = "",
+    write: bool = True,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """:func:`~backend.analytics.generate_summary` spread over a process pool.
+
+    Falls back to the serial path for small jobs, a single worker or
+    amounts with fractions of a penny.
+    """
+    txs = transactions if isinstance(transactions, list) else list(transactions)
+    workers = SUMMARY_WORKERS if workers is None else workers
+    if (
+        workers < 2
+        or len(txs) < SHARD_MIN_ROWS
+        or pence(np.asarray([tx["amount"] for tx in txs], dtype=np.float64)) is None
+    ):
+        return generate_summary(
+            txs, job_id, user_id, period, currency, output_dir, prefix, write
+        )
+
+    parts = _partition(txs, workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(parts))) as pool:
+        futures = [pool.submit(_shard_partial, fields, positions) for fields, positions in parts]
+        # anomaly detection is a single ordered pass; run it while shards work
+        anomalies = detect_anomalies(txs)
+        partials = [future.result() for future in futures]
+
+    totals, categories_out, recurring, overspending = merge_partials(
+        partials, registry.load_json(CATEGORIES_PATH)
+    )
+    summary = build_summary_document(
+        job_id,
+        user_id,
+        period,
+        currency,
+        totals,
+        categories_out,
+        recurring,
+        overspending,
+        anomalies,
+    )
+    if write:
+        write_summary(summary, output_dir or Path.cwd(), prefix)
+    return summary
+
+
+def job_row_count(session: Session, job_id: int) -> int:
+    """Number of transaction rows stored for ``job_id``."""
+    return session.exec(
+        select(func.count()).select_from(Transaction).where(Transaction.job_id == job_id)
+    ).one()
+
+
+def summary_from_rows(
+    session: Session,
+    job_id: int,
+    user_id: str,
+    currency: str = "GBP",
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Summarise a stored job's dated transactions with :func:`generate_summary_sharded`.
+
+    Matches :meth:`~backend.summary_state.SummaryAggregate.summary` for the
+    same rows.  Nothing is written to disk.
+    """
+    dated = [
+        tx
+        for tx in (
+            Transaction.data_from_row(row)
+            for row in session.exec(
+                select(*Transaction.data_columns())
+                .where(Transaction.job_id == job_id)
+                .order_by(Transaction.id)  # type: ignore[arg-type]
+            )
+        )
+        if tx.get("date")
+    ]
+    dates = [tx["date"] for tx in dated]
+    period = {"start": min(dates), "end": max(dates)} if dates else {"start": "", "end": ""}
+    return generate_summary_sharded(
+        dated, str(job_id), user_id, period, currency, write=False, workers=workers
+    )
+
+
+__all__ = [
+    "SHARD_MIN_ROWS",
+    "SUMMARY_WORKERS",
+    "generate_summary_sharded",
+    "job_row_count",
+    "merge_partials",
+    "shard_of",
+    "summary_from_rows",
+]
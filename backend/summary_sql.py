@@ -0,0 +1,229 @@
+"""Job summaries computed by the database.
+
+Totals, category breakdowns and per-category and per-merchant monthly
+sums are ``GROUP BY`` queries over the typed :class:`Transaction`
+columns, summed in whole pence so the results equal the exact sums kept
+by :class:`~backend.summary_state.SummaryAggregate`.  Only the date and
+amount series of merchants with enough charges to recur are pulled into
+Python for :func:`~backend.analytics.detect_recurring`.  Anomalies come
+from the job's persisted detector state.
+
+Transactions whose date, amount, signature or category only survive in
+``extras`` cannot be grouped in SQL; :func:`summary_from_db`
+returns ``None`` for such jobs and callers fall back to the aggregate.
+"""
+from __future__ import annotations
+
+from datetime import date as Date
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from sqlalchemy import String, and_, case, func, or_
+from sqlalchemy import cast as sql_cast
+from sqlmodel import Session, select
+
+from bankcleanr import registry
+
+from .analytics import build_summary_document, detect_recurring, overspending_from_totals
+from .anomalies import AnomalyDetector
+from .models import JobSummaryState, Transaction, format_pence
+
+# keys whose values the SQL path reads from typed columns
+_GROUPED_KEYS = ("date", "amount", "merchant_signature", "category")
+
+T = cast(Any, Transaction)
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+
+def _signed() -> Any:
+    pence = T.amount_pence
+    return case(
+        (T.type == "credit", func.abs(pence)),
+        (T.type == "debit", -func.abs(pence)),
+        else_=pence,
+    )
+
+
+def _month() -> Any:
+    return func.substr(sql_cast(T.date, String), 1, 7)
+
+
+def _pounds(pence: Any) -> float:
+    return int(pence) / 100
+
+
+def _needs_fallback(session: Session, job_id: int) -> bool:
+    """True if a dated transaction has a grouped value its columns do not hold.
+
+    ``extras`` also keeps values that merely format differently (``"10.5"``
+    next to 1050 pence); only those the columns lost count.
+    """
+    text_extras = sql_cast(T.extras, String)
+    suspects = session.exec(
+        select(T.date, T.amount_pence, T.extras)
+        .where(T.job_id == job_id)
+        .where(or_(*(text_extras.like(f'%"{key}"%') for key in _GROUPED_KEYS)))
+    )
+    for tx_date, pence, extras in suspects:
+        extras = extras or {}
+        if tx_date is None and not extras.get("date"):
+            continue  # undated rows are not summarised
+        if (
+            extras.get("date")
+            or ("amount" in extras and pence is None)
+            or extras.get("merchant_signature") is not None
+            or extras.get("category")
+        ):
+            return True
+    return False
+
+
+def _month_totals(session: Session, where: Any, outer: Any) -> Dict[str, Dict[str, float]]:
+    """``outer -> month -> absolute pounds``, both levels in first-seen order."""
+    month = _month()
+    rows = session.exec(
+        select(outer, month, func.sum(func.abs(T.amount_pence)), func.min(T.id))
+        .where(where)
+        .group_by(outer, month)
+    ).all()
+    first_seen: Dict[str, int] = {}
+    for key, _, _, first in rows:
+        first_seen[key] = min(first_seen.get(key, first), first)
+    out: Dict[str, Dict[str, float]] = {
+        key: {} for key in sorted(first_seen, key=first_seen.__getitem__)
+    }
+    for key, month_label, total, _ in sorted(rows, key=lambda row: row[3]):
+        out[key][month_label] = _pounds(total)
+    return out
+
+
+def _recurring_candidates(session: Session, dated: Any) -> List[Dict[str, Any]]:
+    """Date-ordered series of every merchant with at least three charges."""
+    repeated = (
+        select(T.merchant_signature)
+        .where(dated)
+        .group_by(T.merchant_signature)
+        .having(func.count() >= 3)
+    )
+    series: Dict[str, List[Tuple[Date, int]]] = {}
+    for sig, tx_date, magnitude in session.exec(
+        select(T.merchant_signature, T.date, func.abs(T.amount_pence))
+        .where(dated, T.merchant_signature.in_(repeated))
+        .order_by(T.id)
+    ):
+        series.setdefault(sig, []).append((tx_date, magnitude))
+    return [
+        {
+            "date": tx_date.isoformat(),
+            "amount": format_pence(magnitude),
+            "merchant_signature": sig,
+            "type": "debit",
+        }
+        for sig, entries in series.items()
+        for tx_date, magnitude in sorted(entries, key=lambda entry: entry[0])
+    ]
+
+
+def _anomalies(session: Session, job_id: int, dated: Any) -> List[str]:
+    """Anomalies from the persisted detector, or a replay of the job's spends."""
+    row = session.get(JobSummaryState, job_id)
+    if row is not None:
+        try:
+            return AnomalyDetector.from_dict(row.state["anomalies"]).anomalies
+        except (KeyError, TypeError, ValueError):
+            pass  # stale or corrupt state: replay below
+    detector = AnomalyDetector()
+    spend = _signed()
+    for tx_date, pence, sig, cat in session.exec(
+        select(T.date, spend, T.merchant_signature, T.category)
+        .where(dated, spend < 0)
+        .order_by(T.id)
+    ):
+        day = tx_date.toordinal() - EPOCH_ORDINAL
+        detector.observe_spend(tx_date.isoformat(), day, -pence / 100, sig, cat or None)
+    return detector.anomalies
+
+
+def summary_from_db(
+    session: Session,
+    job_id: int,
+    user_id: str,
+    period: Optional[Dict[str, str]] = None,
+    currency: str = "GBP",
+) -> Optional[Dict[str, Any]]:
+    """Build the job's summary_v1 document with SQL aggregation.
+
+    Returns ``None`` when the job cannot be summarised exactly in SQL.
+    """
+    if _needs_fallback(session, job_id):
+        return None
+    dated = and_(T.job_id == job_id, T.date.is_not(None))
+
+    first, last = session.exec(select(func.min(T.date), func.max(T.date)).where(dated)).one()
+    if period is None:
+        period = {
+            "start": first.isoformat() if first else "",
+            "end": last.isoformat() if last else "",
+        }
+
+    by_type = dict(
+        session.exec(
+            select(T.type, func.sum(_signed()))
+            .where(dated, T.type.in_(["credit", "debit"]))
+            .group_by(T.type)
+        ).all()
+    )
+    income = _pounds(by_type.get("credit") or 0)
+    expenses = _pounds(by_type.get("debit") or 0)
+    totals = {"income": income, "expenses": expenses, "net": income + expenses}
+
+    has_category = and_(dated, T.category.is_not(None), T.category != "")
+    sums: Dict[str, Tuple[Any, int]] = {
+        cat: (total, count)
+        for cat, total, count in session.exec(
+            select(T.category, func.sum(_signed()), func.count())
+            .where(has_category)
+            .group_by(T.category)
+        )
+    }
+    merchants: Dict[str, List[str]] = {}
+    for cat, sig in session.exec(
+        select(T.category, T.merchant_signature)
+        .where(has_category)
+        .distinct()
+        .order_by(T.category, T.merchant_signature)
+    ):
+        names = merchants.setdefault(cat, [])
+        if len(names) < 3:
+            names.append(sig)
+    categories_out = [
+        {
+            "name": name,
+            "total": _pounds(sums[name][0]),
+            "count": sums[name][1],
+            "sample_merchants": merchants[name],
+        }
+        for name in registry.load_json(registry.TAXONOMY_PATH)
+        if name in sums
+    ]
+
+    candidates = _recurring_candidates(session, dated)
+    recurring = detect_recurring(candidates) if candidates else []
+    overspending = overspending_from_totals(
+        _month_totals(session, has_category, T.category),
+        _month_totals(session, dated, T.merchant_signature),
+        recurring,
+    )
+    return build_summary_document(
+        str(job_id),
+        user_id,
+        period,
+        currency,
+        totals,
+        categories_out,
+        recurring,
+        overspending,
+        _anomalies(session, job_id, dated),
+    )
+
+
+__all__ = ["summary_from_db"]
@@ -0,0 +1,402 @@
+"""Incrementally maintained per-job summary aggregates.
+
+:class:`SummaryAggregate` keeps exactly the state needed to produce a
+summary_v1 document (totals, per-category and per-month sums and a
+bounded :class:`MerchantSeries` per merchant for recurring detection), so
+its size follows the number of merchants, categories and months rather
+than the number of transactions.  Transactions are
+folded in with :meth:`SummaryAggregate.add` and taken out again with
+:meth:`SummaryAggregate.remove`, so relabelling a transaction or adding
+new ones never requires reloading the whole job.  Sums are kept as exact
+decimals so any sequence of adds and removes gives the same totals.
+Anomalies come from an :class:`~backend.anomalies.AnomalyDetector` fed by
+:meth:`SummaryAggregate.add`; they are observations of the transaction
+stream, so removing or relabelling a transaction does not retract them.
+
+The state is persisted as JSON in :class:`~backend.models.JobSummaryState`.
+"""
+from __future__ import annotations
+
+import bisect
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+from bankcleanr import registry
+
+from .analytics import (
+    RECURRING_WINDOW,
+    build_summary_document,
+    overspending_from_totals,
+    recurring_from_windows,
+)
+from .anomalies import AnomalyDetector
+from .models import JobSummaryState, Transaction
+
+STATE_VERSION = 3
+ZERO = Decimal(0)
+
+
+def _decimal(value: Any) -> Decimal:
+    return Decimal(str(value))
+
+
+def _signed(tx: Dict[str, Any]) -> Decimal:
+    amt = _decimal(tx["amount"])
+    t = tx.get("type")
+    if t == "credit":
+        return abs(amt)
+    if t == "debit":
+        return -abs(amt)
+    return amt
+
+
+def _bump(counts: Dict[str, Any], key: str, amount: Decimal, sign: int) -> None:
+    """Add ``amount`` to a ``[sum, count]`` bucket, dropping it when empty."""
+    total, count = counts.get(key, (ZERO, 0))
+    count += sign
+    if count:
+        counts[key] = (total + sign * amount, count)
+    else:
+        counts.pop(key, None)
+
+
+def _month_floats(groups: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    return {
+        key: {month: float(total) for month, (total, _) in months.items()}
+        for key, months in groups.items()
+    }
+
+
+class MerchantSeries:
+    """Recurring-detection state for one merchant.
+
+    Count, first date and amount sums are exact over every charge; only
+    the latest :data:`~backend.analytics.RECURRING_WINDOW` charges are kept
+    for the interval and amount median/MAD checks.  Removing a charge
+    shrinks the window instead of refilling it from older charges, and
+    removing the last charge on the first date moves ``first`` to the
+    earliest date still known.
+    """
+
+    __slots__ = ("count", "first", "first_count", "total", "total_sq", "window")
+
+    def __init__(
+        self,
+        count: int = 0,
+        first: str = "",
+        first_count: int = 0,
+        total: Decimal = ZERO,
+        total_sq: Decimal = ZERO,
+        window: Optional[List[List[Any]]] = None,
+    ) -> None:
+        self.count = count
+        self.first = first
+        self.first_count = first_count
+        self.total = total
+        self.total_sq = total_sq
+        # [date, absolute amount] sorted by date, stable
+        self.window: List[List[Any]] = window if window is not None else []
+
+    def add(self, tx_date: str, amount: Decimal) -> None:
+        self.count += 1
+        self.total += amount
+        self.total_sq += amount * amount
+        if not self.first or tx_date < self.first:
+            self.first, self.first_count = tx_date, 1
+        elif tx_date == self.first:
+            self.first_count += 1
+        pos = bisect.bisect_right(self.window, tx_date, key=lambda e: e[0])
+        self.window.insert(pos, [tx_date, amount])
+        if len(self.window) > RECURRING_WINDOW:
+            del self.window[0]
+
+    def index(self, tx_date: str, amount: Decimal) -> Optional[int]:
+        """Window position of the charge, ``-1`` if older than the window, or ``None``."""
+        for i, (entry_date, entry_amount) in enumerate(self.window):
+            if entry_date == tx_date and entry_amount == amount:
+                return i
+        if self.count > len(self.window) and self.window and tx_date <= self.window[0][0]:
+            return -1
+        return None
+
+    def remove(self, position: int, tx_date: str, amount: Decimal) -> None:
+        """Take out a charge located with :meth:`index`."""
+        self.count -= 1
+        self.total -= amount
+        self.total_sq -= amount * amount
+        if position >= 0:
+            del self.window[position]
+        if tx_date == self.first:
+            self.first_count -= 1
+            if not self.first_count and self.window:
+                self.first = self.window[0][0]
+                self.first_count = sum(1 for d, _ in self.window if d == self.first)
+
+    def to_list(self) -> List[Any]:
+        return [
+            self.count,
+            self.first,
+            self.first_count,
+            str(self.total),
+            str(self.total_sq),
+            [[d, str(a)] for d, a in self.window],
+        ]
+
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "MerchantSeries":
+        count, first, first_count, total, total_sq, window = data
+        return cls(
+            int(count),
+            first,
+            int(first_count),
+            Decimal(total),
+            Decimal(total_sq),
+            [[d, Decimal(a)] for d, a in window],
+        )
+
+
+class SummaryAggregate:
+    """Summary state for one job.
+
+    Only dated transactions contribute, matching ``/summary``.  Mappings
+    keep first-seen order so highlights come out in the same order as a
+    full recomputation over the transactions in insertion order.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.dates: Dict[str, int] = {}
+        self.by_type: Dict[str, Decimal] = {"credit": ZERO, "debit": ZERO}
+        # category -> (signed total, count) and merchant -> count
+        self.categories: Dict[str, Any] = {}
+        self.category_merchants: Dict[str, Dict[str, int]] = {}
+        # category/merchant -> month -> (absolute total, count)
+        self.category_months: Dict[str, Dict[str, Any]] = {}
+        self.merchant_months: Dict[str, Dict[str, Any]] = {}
+        self.merchant_series: Dict[str, MerchantSeries] = {}
+        self.detector = AnomalyDetector()
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Dict[str, Any]]) -> "SummaryAggregate":
+        state = cls()
+        for tx in transactions:
+            state.add(tx)
+        return state
+
+    def add(self, tx: Dict[str, Any]) -> None:
+        self._apply(tx, 1)
+        if tx.get("date"):
+            self.detector.observe(tx)
+
+    def remove(self, tx: Dict[str, Any]) -> None:
+        """Undo a previous :meth:`add` of an identical transaction."""
+        self._apply(tx, -1)
+
+    def replace(self, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        """Swap ``old`` for ``new``, e.g. after relabelling a transaction.
+
+        A relabel keeps the date, merchant and amount, so the merchant's
+        series is left exactly as it is.
+        """
+        same_charge = (
+            old.get("date") == new.get("date")
+            and old.get("merchant_signature") == new.get("merchant_signature")
+            and (not old.get("date") or abs(_signed(old)) == abs(_signed(new)))
+        )
+        self._apply(old, -1, series=not same_charge)
+        self._apply(new, 1, series=not same_charge)
+
+    def _apply(self, tx: Dict[str, Any], sign: int, series: bool = True) -> None:
+        tx_date = tx.get("date")
+        if not tx_date:
+            return
+        signed = _signed(tx)
+        magnitude = abs(signed)
+        month = tx_date[:7]
+        sig = tx["merchant_signature"]
+        if series:
+            merchant = self.merchant_series.get(sig)
+            if sign > 0:
+                if merchant is None:
+                    merchant = self.merchant_series[sig] = MerchantSeries()
+                merchant.add(tx_date, magnitude)
+            else:
+                position = merchant.index(tx_date, magnitude) if merchant else None
+                if merchant is None or position is None:
+                    raise ValueError(f"Transaction not in summary state: {sig} {tx_date}")
+                merchant.remove(position, tx_date, magnitude)
+                if not merchant.count:
+                    del self.merchant_series[sig]
+
+        self.count += sign
+        self.dates[tx_date] = self.dates.get(tx_date, 0) + sign
+        if not self.dates[tx_date]:
+            del self.dates[tx_date]
+        if tx.get("type") in self.by_type:
+            self.by_type[tx["type"]] += sign * signed
+
+        cat = tx.get("category")
+        if cat:
+            _bump(self.categories, cat, signed, sign)
+            merchants = self.category_merchants.setdefault(cat, {})
+            merchants[sig] = merchants.get(sig, 0) + sign
+            if not merchants[sig]:
+                del merchants[sig]
+            if not merchants:
+                del self.category_merchants[cat]
+            months = self.category_months.setdefault(cat, {})
+            _bump(months, month, magnitude, sign)
+            if not months:
+                del self.category_months[cat]
+
+        months = self.merchant_months.setdefault(sig, {})
+        _bump(months, month, magnitude, sign)
+        if not months:
+            del self.merchant_months[sig]
+
+    @property
+    def period(self) -> Dict[str, str]:
+        if not self.dates:
+            return {"start": "", "end": ""}
+        return {"start": min(self.dates), "end": max(self.dates)}
+
+    def _recurring(self) -> List[Dict[str, Any]]:
+        series = [(sig, s) for sig, s in self.merchant_series.items() if s.count >= 3]
+        if not series:
+            return []
+        window = [entry for _, s in series for entry in s.window]
+        dates = [d for d, _ in window]
+        return recurring_from_windows(
+            [sig for sig, _ in series],
+            np.array([s.count for _, s in series], dtype=np.int64),
+            [s.first for _, s in series],
+            [s.total for _, s in series],
+            [s.total_sq for _, s in series],
+            np.repeat(np.arange(len(series)), [len(s.window) for _, s in series]),
+            np.asarray(dates, dtype="datetime64[D]").astype(np.int64),
+            np.array([float(a) for _, a in window], dtype=np.float64),
+            dates,
+        )
+
+    def summary(
+        self,
+        job_id: str,
+        user_id: str,
+        period: Optional[Dict[str, str]] = None,
+        currency: str = "GBP",
+    ) -> Dict[str, Any]:
+        """Build the summary_v1 document without touching any transactions."""
+        income = float(self.by_type["credit"])
+        expenses = float(self.by_type["debit"])
+        totals = {"income": income, "expenses": expenses, "net": income + expenses}
+
+        categories_out = []
+        for name in registry.load_json(registry.TAXONOMY_PATH):
+            if name not in self.categories:
+                continue
+            total, count = self.categories[name]
+            categories_out.append(
+                {
+                    "name": name,
+                    "total": float(total),
+                    "count": count,
+                    "sample_merchants": sorted(self.category_merchants[name])[:3],
+                }
+            )
+
+        recurring = self._recurring()
+        overspending = overspending_from_totals(
+            _month_floats(self.category_months),
+            _month_floats(self.merchant_months),
+            recurring,
+        )
+        return build_summary_document(
+            job_id,
+            user_id,
+            period or self.period,
+            currency,
+            totals,
+            categories_out,
+            recurring,
+            overspending,
+            list(self.detector.anomalies),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        def buckets(counts: Dict[str, Any]) -> Dict[str, Any]:
+            return {k: [str(t), n] for k, (t, n) in counts.items()}
+
+        return {
+            "version": STATE_VERSION,
+            "count": self.count,
+            "dates": self.dates,
+            "by_type": {k: str(v) for k, v in self.by_type.items()},
+            "categories": buckets(self.categories),
+            "category_merchants": self.category_merchants,
+            "category_months": {c: buckets(m) for c, m in self.category_months.items()},
+            "merchant_months": {s: buckets(m) for s, m in self.merchant_months.items()},
+            "merchant_series": {s: m.to_list() for s, m in self.merchant_series.items()},
+            "anomalies": self.detector.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SummaryAggregate":
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported summary state version {data.get('version')}")
+
+        def buckets(raw: Dict[str, Any]) -> Dict[str, Any]:
+            return {k: (Decimal(t), n) for k, (t, n) in raw.items()}
+
+        state = cls()
+        state.count = data["count"]
+        state.dates = dict(data["dates"])
+        state.by_type = {k: Decimal(v) for k, v in data["by_type"].items()}
+        state.categories = buckets(data["categories"])
+        state.category_merchants = {c: dict(m) for c, m in data["category_merchants"].items()}
+        state.category_months = {c: buckets(m) for c, m in data["category_months"].items()}
+        state.merchant_months = {s: buckets(m) for s, m in data["merchant_months"].items()}
+        state.merchant_series = {
+            s: MerchantSeries.from_list(m) for s, m in data["merchant_series"].items()
+        }
+        state.detector = AnomalyDetector.from_dict(data["anomalies"])
+        return state
+
+
+def stored_state(session: Session, job_id: int) -> Optional[SummaryAggregate]:
+    """The job's persisted summary state, or ``None`` if absent or stale."""
+    row = session.get(JobSummaryState, job_id)
+    if row is None:
+        return None
+    try:
+        return SummaryAggregate.from_dict(row.state)
+    except (KeyError, TypeError, ValueError):
+        return None  # stale or corrupt state
+
+
+def load_state(session: Session, job_id: int) -> SummaryAggregate:
+    """Return the job's summary state, rebuilding it from rows if absent."""
+    state = stored_state(session, job_id)
+    if state is not None:
+        return state
+    rows = session.exec(
+        select(Transaction).where(Transaction.job_id == job_id).order_by(Transaction.id)  # type: ignore[arg-type]
+    )
+    state = SummaryAggregate.from_transactions(t.data for t in rows)
+    save_state(session, job_id, state)
+    return state
+
+
+def save_state(session: Session, job_id: int, state: SummaryAggregate) -> None:
+    """Stage ``state`` for ``job_id``; the caller commits."""
+    row = session.get(JobSummaryState, job_id)
+    if row is None:
+        row = JobSummaryState(job_id=job_id, state=state.to_dict())
+    else:
+        row.state = state.to_dict()
+    session.add(row)
+
+
+__all__ = ["MerchantSeries", "SummaryAggregate", "load_state", "save_state", "stored_state"]
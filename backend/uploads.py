@@ -0,0 +1,143 @@
+"""Content-addressed, compressed storage of uploaded NDJSON.
+
+Uploads are normalised (lines stripped, blank lines dropped) and hashed
+with SHA-256.  Each distinct content is stored once: re-uploading the
+same export creates a new job pointing at the existing :class:`Upload`.
+A completed job of the same upload, classified for the same user under
+the same rules and classifiers and not degraded, can then stand in for a
+fresh classification.
+
+The text is kept gzip-compressed in ``Upload.body``.  A gzip request body
+is stored as sent; it is only streamed through once to hash it.  Lines
+are decompressed lazily by :func:`upload_lines` when a job reads them.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+from typing import IO, Any, Iterable, Iterator, Optional, Tuple, cast
+
+from sqlmodel import Session, select
+
+from .models import ProcessingJob, Upload
+
+COMPRESS_LEVEL = 6
+
+
+def _normalised(lines: Iterable[str]) -> Iterator[str]:
+    for raw in lines:
+        line = raw.strip()
+        if line:
+            yield line
+
+
+def _text_lines(text: str) -> IO[str]:
+    # universal newlines, like reading a file, so gzip and plain bodies agree
+    return io.StringIO(text, newline=None)
+
+
+def _gzip_lines(body: bytes) -> Iterator[str]:
+    with gzip.GzipFile(fileobj=io.BytesIO(body)) as raw:
+        yield from io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def _digest(lines: Iterable[str]) -> str:
+    sha = hashlib.sha256()
+    for i, line in enumerate(lines):
+        if i:
+            sha.update(b"\n")
+        sha.update(line.encode("utf-8"))
+    return sha.hexdigest()
+
+
+def normalise(text: str) -> str:
+    """Strip every line and drop blank ones; classification ignores both."""
+    return "\n".join(_normalised(_text_lines(text)))
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the normalised ``text``."""
+    return _digest(_normalised(_text_lines(text)))
+
+
+def compress(text: str) -> bytes:
+    """Gzip ``text`` for ``Upload.body``."""
+    return gzip.compress(text.encode("utf-8"), compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def store_upload(session: Session, data: bytes, gzipped: bool = False) -> Tuple[int, bool]:
+    """Return the id of the upload holding ``data`` and whether it is new.
+
+    ``gzipped`` bodies are stored unchanged.  Raises ``UnicodeDecodeError``
+    for text that is not UTF-8 and ``OSError``/``EOFError`` for corrupt
+    gzip data.  The caller commits.
+    """
+    if gzipped:
+        digest = _digest(_normalised(_gzip_lines(data)))
+    else:
+        content = normalise(data.decode("utf-8"))
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    existing = session.exec(
+        select(Upload.id)
+        .where(Upload.content_hash == digest)
+        .order_by(cast(Any, Upload.id))
+        .limit(1)
+    ).first()
+    if existing is not None:
+        return existing, False
+    upload = Upload(body=data if gzipped else compress(content), content_hash=digest)
+    session.add(upload)
+    session.flush()
+    return cast(int, upload.id), True
+
+
+def upload_lines(session: Session, upload_id: int) -> Optional[Iterator[str]]:
+    """Lazily decompressed, normalised lines of an upload; ``None`` if missing."""
+    row = session.exec(
+        select(Upload.body, Upload.content).where(Upload.id == upload_id)
+    ).first()
+    if row is None:
+        return None
+    body, content = row
+    # uploads stored before compression keep their plain text
+    lines = _gzip_lines(body) if body is not None else _text_lines(content or "")
+    return _normalised(lines)
+
+
+def reusable_job(
+    session: Session,
+    job: ProcessingJob,
+    user_id: int,
+    rules_version: str,
+    classifier_version: str,
+) -> Optional[ProcessingJob]:
+    """Latest complete, non-degraded job with the same content, user and versions."""
+    digest = session.exec(select(Upload.content_hash).where(Upload.id == job.upload_id)).first()
+    same_content: Any = ProcessingJob.upload_id == job.upload_id
+    if digest:
+        same_content = cast(Any, ProcessingJob.upload_id).in_(
+            select(Upload.id).where(Upload.content_hash == digest)
+        )
+    return session.exec(
+        select(ProcessingJob)
+        .where(same_content)
+        .where(ProcessingJob.id != job.id)
+        .where(ProcessingJob.status == "completed")
+        .where(ProcessingJob.user_id == user_id)
+        .where(ProcessingJob.rules_version == rules_version)
+        .where(ProcessingJob.classifier_version == classifier_version)
+        .where(cast(Any, ProcessingJob.degraded).is_(False))
+        .order_by(cast(Any, ProcessingJob.id).desc())
+        .limit(1)
+    ).first()
+
+
+__all__ = [
+    "compress",
+    "content_hash",
+    "normalise",
+    "reusable_job",
+    "store_upload",
+    "upload_lines",
+]
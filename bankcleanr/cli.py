@@ -1,16 +1,17 @@
 """Command line interface for bankcleanr."""
 from __future__ import annotations
 
-import json
 import platform
 import subprocess
 import sys
+from enum import Enum
 from pathlib import Path
 
-import jsonschema
 import typer
 
+from bankcleanr import registry
 from bankcleanr.extractor import extract_transactions
+from bankcleanr.jsonl import JSONLWriter
 from bankcleanr.pii import mask_pii
 
 
@@ -23,14 +24,30 @@ def _load_schema() -> dict:
     development and when packaged with PyInstaller.
     """
 
-    if getattr(sys, "frozen", False):
-        path = Path(sys._MEIPASS) / "schemas" / "transaction_v1.json"  # type: ignore[attr-defined]
-    else:
-        path = Path(__file__).resolve().parent / "schemas" / "transaction_v1.json"
-    return json.loads(Path(path).read_text(encoding="utf-8"))
+    return registry.load_json(registry.transaction_schema_path())
 
 
 SCHEMA = _load_schema()
+# compiled once so each record only pays for the instance check
+CHECK = registry.get_checker(registry.transaction_schema_path())
+
+# ``--validate=sample`` checks the first SAMPLE_HEAD records, then one in SAMPLE_EVERY
+SAMPLE_HEAD = 100
+SAMPLE_EVERY = 100
+
+
+class ValidationMode(str, Enum):
+    full = "full"
+    sample = "sample"
+    off = "off"
+
+
+def _should_validate(mode: ValidationMode, index: int) -> bool:
+    if mode is ValidationMode.full:
+        return True
+    if mode is ValidationMode.off:
+        return False
+    return index < SAMPLE_HEAD or index % SAMPLE_EVERY == 0
 
 app = typer.Typer()
 
@@ -41,7 +58,9 @@ def extract(
         ..., exists=True, file_okay=True, dir_okay=True, readable=True,
         help="Path to a PDF file or directory of PDFs",
     ),
-    output_jsonl: Path = typer.Argument(..., help="Output JSONL file"),
+    output_jsonl: Path = typer.Argument(
+        ..., help="Output JSONL file (gzip-compressed when it ends in .gz)"
+    ),
     bank: str | None = typer.Option(
         None,  # type: ignore[arg-type]
         "--bank",
@@ -50,24 +69,33 @@ def extract(
         ),
     ),
     mask_names: str = typer.Option("", "--mask-names", help="Comma-separated names to mask"),
+    validate: ValidationMode = typer.Option(
+        ValidationMode.full,
+        "--validate",
+        help="Schema-check every record (full), a sample (sample) or none (off).",
+    ),
+    dedupe: bool = typer.Option(
+        False,
+        "--dedupe",
+        help="Skip transactions repeated by overlapping statements in a directory.",
+    ),
 ) -> None:
     """Extract transactions from PDFs and write JSONL."""
     if not mask_names and sys.stdin.isatty():
         mask_names = typer.prompt("Enter comma-separated names to mask", default="")
     names = [n.strip() for n in mask_names.split(",") if n.strip()]
-    count = 0
-    with output_jsonl.open("w", encoding="utf-8") as fh:
-        for item in extract_transactions(str(input_pdf), bank=bank):
+    with JSONLWriter(output_jsonl) as writer:
+        for item in extract_transactions(str(input_pdf), bank=bank, dedupe=dedupe):
             desc = item.get("description") or ""
             item["description"] = mask_pii(desc, names)
             amt_raw = item.get("amount")
             amt = float(amt_raw) if amt_raw is not None else 0.0
             if "type" not in item:
                 item["type"] = "credit" if amt > 0 else "debit"
-            jsonschema.validate(item, SCHEMA)
-            fh.write(json.dumps(item) + "\n")
-            count += 1
-    if count == 0:
+            if _should_validate(validate, writer.count):
+                CHECK(item)
+            writer.write(item)
+    if writer.count == 0:
         typer.secho("No transactions extracted", err=True)
         raise typer.Exit(code=1)
 
@@ -5,13 +5,18 @@ from pathlib import Path
 from decimal import Decimal
 from typing import Dict, Iterator
 
+from .fingerprint import FingerprintIndex
 from .parsers import PARSER_REGISTRY, detect_bank
 
 
 def extract_transactions(
-    pdf_path: str, bank: str | None = None
+    pdf_path: str, bank: str | None = None, dedupe: bool = False
 ) -> Iterator[Dict[str, str | None]]:
-    """Yield transactions from a PDF or directory of PDFs using the configured parser."""
+    """Yield transactions from a PDF or directory of PDFs using the configured parser.
+
+    With ``dedupe`` a transaction already yielded from an earlier PDF of the
+    directory (an overlapping or duplicate statement) is skipped.
+    """
 
     path = Path(pdf_path)
 
@@ -20,6 +25,7 @@ def extract_transactions(
             pdf_files = sorted(path.glob("*.pdf"))
             if not pdf_files:
                 raise ValueError(f"No PDFs found in directory: {path}")
+            index = FingerprintIndex() if dedupe else None
             for pdf_file in pdf_files:
                 chosen = bank
                 if not chosen or chosen == "auto":
@@ -32,7 +38,11 @@ def extract_transactions(
                     )
                 parser = parser_cls()
                 for record in parser.parse(str(pdf_file)):
-                    yield _ensure_type(record)
+                    record = _ensure_type(record)
+                    if index is None or not index.seen(record):
+                        yield record
+                if index is not None:
+                    index.next_source()
         else:
             chosen = bank
             if not chosen or chosen == "auto":
@@ -0,0 +1,91 @@
+"""Fingerprints that recognise the same transaction across statements.
+
+Consecutive statements often overlap by a few days, and a directory of
+PDFs may hold the same statement twice.  A fingerprint hashes the date,
+amount, type, balance and merchant signature of a transaction together
+with its *occurrence*: the n-th identical row within one source.  Two
+genuinely repeated purchases in one statement therefore stay distinct,
+while the copies of a row in an overlapping statement match.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Set
+
+from .signature import normalise_signature
+
+
+def _amount_key(value: Any) -> str:
+    try:
+        return format(Decimal(str(value)).normalize(), "f")
+    except InvalidOperation:
+        return str(value)
+
+
+def _signature(tx: Dict[str, Any]) -> str:
+    sig = tx.get("merchant_signature")
+    if sig is None:
+        sig = normalise_signature(tx.get("description") or "")
+    return sig
+
+
+def transaction_fingerprint(tx: Dict[str, Any], occurrence: int = 0) -> str:
+    """Identify a transaction independently of the statement it came from.
+
+    ``occurrence`` distinguishes genuinely repeated transactions (two
+    identical coffees on the same day) within one statement.  Records
+    without a ``merchant_signature`` use the normalised description.
+    """
+    balance = tx.get("balance")
+    parts = [
+        tx.get("date") or "",
+        _amount_key(tx.get("amount")),
+        tx.get("type") or "",
+        "" if balance is None else _amount_key(balance),
+        _signature(tx),
+        str(occurrence),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def fingerprints(transactions: Iterable[Dict[str, Any]]) -> List[str]:
+    """Fingerprint every transaction of one source, numbering repeats."""
+    seen: Counter = Counter()
+    out = []
+    for tx in transactions:
+        base = transaction_fingerprint(tx)
+        out.append(transaction_fingerprint(tx, seen[base]))
+        seen[base] += 1
+    return out
+
+
+class FingerprintIndex:
+    """Streaming duplicate check across the sources of one run.
+
+    Call :meth:`seen` for every record of a source and :meth:`next_source`
+    between sources.  Each check is a set lookup, so the run never rescans
+    earlier records; repeats within the current source are not duplicates.
+    """
+
+    def __init__(self) -> None:
+        self._previous: Set[str] = set()
+        self._current: Set[str] = set()
+        self._occurrences: Counter = Counter()
+
+    def seen(self, tx: Dict[str, Any]) -> bool:
+        """Record ``tx`` and return whether an earlier source already had it."""
+        base = transaction_fingerprint(tx)
+        fingerprint = transaction_fingerprint(tx, self._occurrences[base])
+        self._occurrences[base] += 1
+        self._current.add(fingerprint)
+        return fingerprint in self._previous
+
+    def next_source(self) -> None:
+        self._previous |= self._current
+        self._current = set()
+        self._occurrences.clear()
+
+
+__all__ = ["FingerprintIndex", "fingerprints", "transaction_fingerprint"]
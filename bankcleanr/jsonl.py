@@ -0,0 +1,106 @@
+"""Buffered JSONL writer used by the extractor CLI.
+
+Records are encoded compactly (``orjson`` when installed, otherwise the
+stdlib encoder with compact separators), collected in memory and written
+in large chunks.  Paths ending in ``.gz`` are gzip-compressed on the fly
+so exports can be uploaded with ``Content-Encoding: gzip`` unchanged.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Type, Union
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+GZIP_LEVEL = 6
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _stdlib_dumps(record: Dict[str, Any]) -> bytes:
+    return _json_encoder.encode(record).encode("utf-8")
+
+
+def default_dumps() -> Callable[[Dict[str, Any]], bytes]:
+    """Return the fastest available compact JSON encoder producing bytes."""
+    try:  # noqa: PLC0415 - optional dependency
+        import orjson  # type: ignore[import-not-found]
+    except ImportError:  # pragma: no cover - depends on environment
+        return _stdlib_dumps
+    return orjson.dumps
+
+
+def is_gzip_path(path: str | Path) -> bool:
+    return str(path).endswith(".gz")
+
+
+class JSONLWriter:
+    """Write one JSON document per line with buffered, optionally gzipped output."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        compress: Optional[bool] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        dumps: Optional[Callable[[Dict[str, Any]], bytes]] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.compress = is_gzip_path(path) if compress is None else compress
+        self.chunk_size = chunk_size
+        self._dumps = dumps or default_dumps()
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self.count = 0
+        self._fh: Union[gzip.GzipFile, BinaryIO]
+        if self.compress:
+            self._fh = gzip.open(self.path, "wb", compresslevel=GZIP_LEVEL)
+        else:
+            self._fh = self.path.open("wb")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = self._dumps(record)
+        self._buffer.append(line)
+        self._buffer.append(b"\n")
+        self._buffered += len(line) + 1
+        self.count += 1
+        if self._buffered >= self.chunk_size:
+            self._drain()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.write(record)
+
+    def _drain(self) -> None:
+        if self._buffer:
+            self._fh.write(b"".join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+
+    def flush(self) -> None:
+        """Write buffered records and flush the underlying file."""
+        self._drain()
+        self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        try:
+            self._drain()
+        finally:
+            self._fh.close()
+
+    def __enter__(self) -> "JSONLWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+__all__ = ["DEFAULT_CHUNK_SIZE", "JSONLWriter", "default_dumps", "is_gzip_path"]
@@ -0,0 +1,188 @@
+"""Process-wide cache of JSON schemas and the category taxonomy.
+
+Schemas and the taxonomy are read from disk the first time they are
+requested and kept for the life of the process.  Validators are built
+(and their schemas checked against the metaschema) once per schema, so
+per-record and per-job validation only pays for the instance check.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import jsonschema
+from jsonschema.exceptions import best_match
+from jsonschema.protocols import Validator
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMAS_DIR = ROOT / "schemas"
+TAXONOMY_PATH = ROOT / "data" / "taxonomy" / "categories.json"
+
+
+def transaction_schema_path() -> Path:
+    """Location of ``transaction_v1.json`` in source and PyInstaller builds."""
+    if getattr(sys, "frozen", False):
+        return Path(sys._MEIPASS) / "schemas" / "transaction_v1.json"  # type: ignore[attr-defined]
+    return Path(__file__).resolve().parent / "schemas" / "transaction_v1.json"
+
+
+@lru_cache(maxsize=None)
+def _load(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_json(path: str | Path) -> Any:
+    """Return the parsed JSON document at ``path``, reading it only once.
+
+    The returned object is shared; callers must not mutate it.
+    """
+    return _load(Path(path).resolve())
+
+
+def load_categories(path: str | Path = TAXONOMY_PATH) -> List[str]:
+    """Return a copy of the canonical category list."""
+    return list(load_json(path))
+
+
+@lru_cache(maxsize=None)
+def _category_set(path: Path) -> FrozenSet[str]:
+    return frozenset(load_json(path))
+
+
+def category_set(path: str | Path = TAXONOMY_PATH) -> FrozenSet[str]:
+    """Return the canonical categories as a frozen set for membership checks."""
+    return _category_set(Path(path).resolve())
+
+
+@lru_cache(maxsize=None)
+def _validator(path: Path) -> Validator:
+    schema = _load(path)
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def get_validator(path: str | Path) -> Validator:
+    """Return a compiled validator for the schema at ``path``."""
+    return _validator(Path(path).resolve())
+
+
+def validate(instance: Any, validator: Validator) -> None:
+    """Validate ``instance`` like :func:`jsonschema.validate`, reusing ``validator``.
+
+    Raises the same best-matching :class:`jsonschema.ValidationError`.
+    """
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
+
+_JSON_TYPES: Dict[str, type] = {
+    "string": str,
+    "null": type(None),
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+}
+_ANNOTATIONS = {"$schema", "$id", "title", "description"}
+
+
+def _flat_checker(schema: Any) -> Optional[Callable[[Any], bool]]:
+    """Build a plain-Python predicate for a flat object schema.
+
+    Only handles objects whose properties are constrained by ``type``
+    (non-numeric) or string ``enum`` plus ``required`` and
+    ``additionalProperties: false``.  Returns ``None`` for anything else.
+    """
+    if not isinstance(schema, dict) or schema.get("type") != "object":
+        return None
+    if set(schema) - _ANNOTATIONS - {"type", "properties", "required", "additionalProperties"}:
+        return None
+    extra = schema.get("additionalProperties", True)
+    if extra not in (True, False):
+        return None
+
+    types: Dict[str, Tuple[type, ...]] = {}
+    enums: Dict[str, FrozenSet[str]] = {}
+    for name, sub in schema.get("properties", {}).items():
+        keys = set(sub) - _ANNOTATIONS
+        if keys == {"type"}:
+            names = sub["type"] if isinstance(sub["type"], list) else [sub["type"]]
+            if any(n not in _JSON_TYPES for n in names):
+                return None
+            types[name] = tuple(_JSON_TYPES[n] for n in names)
+        elif keys == {"enum"} and all(isinstance(v, str) for v in sub["enum"]):
+            enums[name] = frozenset(sub["enum"])
+        else:
+            return None
+
+    required = frozenset(schema.get("required", ()))
+    allowed = frozenset(schema.get("properties", {}))
+    closed = extra is False
+
+    def check(item: Any) -> bool:
+        if type(item) is not dict:
+            return False
+        keys = item.keys()
+        if not required <= keys or (closed and not keys <= allowed):
+            return False
+        for key, value in item.items():
+            expected = types.get(key)
+            if expected is not None:
+                if not isinstance(value, expected):
+                    return False
+            elif key in enums and not (isinstance(value, str) and value in enums[key]):
+                return False
+        return True
+
+    return check
+
+
+@lru_cache(maxsize=None)
+def _checker(path: Path) -> Callable[[Any], None]:
+    validator = _validator(path)
+    fast = _flat_checker(_load(path))
+    if fast is None:
+        return lambda instance: validate(instance, validator)
+
+    def check(instance: Any) -> None:
+        if not fast(instance):
+            # let jsonschema produce the detailed error
+            validate(instance, validator)
+
+    return check
+
+
+def get_checker(path: str | Path) -> Callable[[Any], None]:
+    """Return a callable raising ``ValidationError`` for invalid instances.
+
+    Small flat schemas such as ``transaction_v1.json`` are checked with a
+    specialised predicate; the full validator only runs to report errors.
+    Other schemas use the cached validator directly.
+    """
+    return _checker(Path(path).resolve())
+
+
+def clear() -> None:
+    """Drop every cached document and validator (used by tests)."""
+    _load.cache_clear()
+    _category_set.cache_clear()
+    _validator.cache_clear()
+    _checker.cache_clear()
+
+
+__all__ = [
+    "SCHEMAS_DIR",
+    "TAXONOMY_PATH",
+    "category_set",
+    "clear",
+    "get_checker",
+    "get_validator",
+    "load_categories",
+    "load_json",
+    "transaction_schema_path",
+    "validate",
+]
@@ -89,8 +89,17 @@ export default function Results() {
         reportResult.status === 'fulfilled' &&
         reportResult.value.ok
       ) {
-        const data = await reportResult.value.json();
-        setReportUrl(data.url);
+        let data = await reportResult.value.json();
+        // the report is generated in the background; poll until it is ready
+        while (data.status === 'pending') {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          const statusRes = await fetch(`/report/${jobId}/status`);
+          if (!statusRes.ok) break;
+          data = await statusRes.json();
+        }
+        if (data.url) {
+          setReportUrl(data.url);
+        }
       }
 
       if (
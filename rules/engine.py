@@ -1,4 +1,5 @@
 from pathlib import Path
+import hashlib
 import json
 import re
 from datetime import datetime
@@ -7,19 +8,20 @@ from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
 
+from bankcleanr import registry
+
 BASE_DIR = Path(__file__).resolve().parent.parent
-CATEGORIES_PATH = BASE_DIR / "data" / "taxonomy" / "categories.json"
+CATEGORIES_PATH = registry.TAXONOMY_PATH
 
 
 def load_categories(path: Path = CATEGORIES_PATH) -> List[str]:
-    """Load canonical category list from JSON file."""
-    with path.open() as f:
-        return json.load(f)
+    """Load canonical category list from the shared taxonomy cache."""
+    return registry.load_categories(path)
 
 
 # Preload categories at import time to avoid repeated disk access.
 # Stored as a set for efficient membership checks while remaining iterable.
-CATEGORIES: Set[str] = set(load_categories())
+CATEGORIES: Set[str] = set(registry.category_set())
 
 
 class Match(BaseModel):
@@ -57,7 +59,7 @@ def validate_rule_categories(
     rules: Iterable[Rule], categories: Optional[Iterable[str]] = None
 ) -> None:
     """Ensure every rule's category is in the sanctioned taxonomy."""
-    categories_set = set(categories or load_categories())
+    categories_set = set(categories) if categories else registry.category_set()
     unknown = {r.action.category for r in rules if r.action.category not in categories_set}
     if unknown:
         raise ValueError(f"Unknown categories: {sorted(unknown)}")
@@ -99,6 +101,22 @@ def merge_rules(global_rules: Iterable[Rule], user_rules: Iterable[Rule]) -> Lis
     return sorted(combined.values(), key=_precedence_key)
 
 
+def rules_version(rules: Iterable[Rule]) -> str:
+    """Return a digest that changes whenever the effective rule set changes.
+
+    Identifiers and timestamps are left out because user rules are rebuilt
+    with fresh ones on every request.
+    """
+    content = sorted(
+        json.dumps(
+            rule.model_dump(mode="json", exclude={"id", "created_at", "updated_at"}),
+            sort_keys=True,
+        )
+        for rule in rules
+    )
+    return hashlib.sha256("\n".join(content).encode("utf-8")).hexdigest()
+
+
 def norm(s: str) -> str:
     """Normalize a string by stripping non-alphanumeric characters and lowercasing."""
     return re.sub(r"[^A-Za-z0-9]", "", s).lower()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Export a job's classified transactions as Arrow IPC or Parquet.
+
+Reads the job from the backend database (``backend.db`` in the working
+directory, as for the API) in batches and writes typed, dictionary encoded
+columns.  The format follows the output suffix (``.parquet`` for Parquet,
+anything else for an Arrow IPC stream) unless ``--format`` is given.
+Requires the ``export`` extra (``pyarrow``).
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from sqlmodel import Session
+
+from backend import database
+from backend.export import FORMATS, ExportUnavailable, arrow_schema, write_export
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("job_id", type=int, help="Job to export")
+    parser.add_argument("out", type=Path, help="Output file")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Output format")
+    args = parser.parse_args()
+    fmt = args.format or ("parquet" if args.out.suffix == ".parquet" else "arrow")
+
+    try:
+        arrow_schema()
+    except ExportUnavailable as exc:
+        raise SystemExit(f"{exc} (install with `poetry install -E export`)") from exc
+    # bring an older database up to the current schema, as API startup does
+    database.init_db()
+    with Session(database.engine) as session, args.out.open("wb") as sink:
+        count = write_export(session, args.job_id, sink, fmt)
+    print(f"Wrote {count} transactions to {args.out} ({args.out.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
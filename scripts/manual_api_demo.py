@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import json
 import os
+import time
 from pathlib import Path
 
 import requests
@@ -44,7 +45,16 @@ def main() -> None:
 
     report_meta = requests.get(f"{BASE_URL}/report/{job_id}", headers=headers)
     report_meta.raise_for_status()
-    report_url = report_meta.json()["url"]
+    meta = report_meta.json()
+    # reports are generated in the background; poll until one is ready
+    while "url" not in meta:
+        if meta.get("status") == "failed":
+            raise SystemExit(f"Report failed: {meta.get('detail')}")
+        time.sleep(1)
+        status = requests.get(f"{BASE_URL}/report/{job_id}/status", headers=headers)
+        status.raise_for_status()
+        meta = status.json()
+    report_url = meta["url"]
     report = requests.get(f"{BASE_URL}{report_url}")
     report.raise_for_status()
     Path("report.pdf").write_bytes(report.content)
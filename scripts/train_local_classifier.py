@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Train the local classifier tier from the labelled history in the database.
+
+Reads transactions labelled by rules or the LLM plus learned user rules from
+``backend.db`` and writes a compact gzip-compressed model artifact that the
+API loads from ``LOCAL_MODEL_PATH`` (``$STORAGE_DIR/local_classifier.json.gz``
+by default).
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from sqlmodel import Session
+
+from backend.database import engine
+from backend.local_classifier import model_path, train_from_session
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", type=Path, default=None, help="Artifact path")
+    parser.add_argument(
+        "--min-count",
+        type=int,
+        default=2,
+        help="Drop n-grams seen fewer times than this across all classes",
+    )
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        model = train_from_session(session, min_count=args.min_count)
+    if not model.labels:
+        raise SystemExit("No labelled transactions or rules to train on")
+    path = model.save(args.out or model_path())
+    print(f"Wrote {path} ({len(model.labels)} categories, {path.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _reset_provider_guards():
+    """Keep circuit breaker and rate limiter state from leaking between tests."""
+    from backend.llm_resilience import reset_guards
+
+    reset_guards()
+    yield
+    reset_guards()
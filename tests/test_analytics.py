@@ -3,6 +3,7 @@ import json
 import sys
 import jsonschema
 import pytest
+import numpy as np
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
@@ -13,6 +14,7 @@ from backend.analytics import (
     generate_summary,
     SCHEMA_PATH,
 )
+from backend.columnar import TransactionColumns
 
 
 def test_compute_monthly_totals():
@@ -89,3 +91,132 @@ def test_generate_summary_missing_schema(tmp_path: Path):
             )
     finally:
         backup.rename(SCHEMA_PATH)
+
+
+def _history():
+    txs = []
+    for month in range(1, 7):
+        txs.append({"date": f"2024-{month:02d}-01", "amount": "10", "merchant_signature": "netflix", "category": "Subscriptions", "type": "debit"})
+        txs.append({"date": f"2024-{month:02d}-03", "amount": "2000", "merchant_signature": "acme payroll", "category": "Income", "type": "credit"})
+        txs.append({"date": f"2024-{month:02d}-12", "amount": str(300 if month == 6 else 40 + month * 15), "merchant_signature": "tesco", "category": "Groceries", "type": "debit"})
+        txs.append({"date": f"2024-{month:02d}-20", "amount": "5", "merchant_signature": "aldi", "category": "Groceries", "type": "debit"})
+    txs.append({"date": "2024-06-30", "amount": "7", "merchant_signature": "kiosk", "type": "debit"})
+    return txs
+
+
+def test_columns_match_row_input(tmp_path: Path):
+    txs = _history()
+    cols = TransactionColumns.from_transactions(txs)
+    assert len(cols) == len(txs)
+    assert compute_monthly_totals(cols) == compute_monthly_totals(txs)
+    assert detect_recurring(cols) == detect_recurring(txs)
+    assert detect_overspending(cols, detect_recurring(cols)) == detect_overspending(txs, detect_recurring(txs))
+
+    summary = generate_summary(
+        cols,
+        job_id="00000000-0000-0000-0000-000000000000",
+        user_id="user",
+        period={"start": "2024-01-01", "end": "2024-06-30"},
+        output_dir=tmp_path,
+    )
+    assert summary["totals"] == {"income": 12000.0, "expenses": -822.0, "net": 11178.0}
+    groceries = next(c for c in summary["categories"] if c["name"] == "Groceries")
+    assert groceries == {"name": "Groceries", "total": -755.0, "count": 12, "sample_merchants": ["aldi", "tesco"]}
+    assert [r["merchant"] for r in summary["recurring"]] == ["netflix", "acme payroll", "aldi"]
+    assert "Category Groceries up 154% in 2024-06" in summary["highlights"]["overspending"]
+    assert "Merchant tesco spent 115.00 in 2024-05 exceeding 75th percentile" in summary["highlights"]["overspending"]
+
+
+def test_generate_summary_empty(tmp_path: Path):
+    summary = generate_summary(
+        [],
+        job_id="00000000-0000-0000-0000-000000000000",
+        user_id="user",
+        period={"start": "2024-01-01", "end": "2024-01-31"},
+        output_dir=tmp_path,
+    )
+    assert summary["totals"] == {"income": 0.0, "expenses": 0.0, "net": 0.0}
+    assert summary["categories"] == [] and summary["recurring"] == []
+
+
+
+def test_summary_prefix_and_in_memory_output(tmp_path: Path):
+    from backend.analytics import render_summary
+
+    period = {"start": "2024-01-01", "end": "2024-06-30"}
+    summary = generate_summary(
+        _history(), job_id="1", user_id="user", period=period, output_dir=tmp_path, prefix="7_"
+    )
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["7_summary.csv", "7_summary_v1.json"]
+    json_bytes, csv_bytes = render_summary(summary)
+    assert (tmp_path / "7_summary_v1.json").read_bytes() == json_bytes
+    assert (tmp_path / "7_summary.csv").read_bytes() == csv_bytes
+    assert csv_bytes.startswith(b"category,total,count\r\n")
+
+    other = tmp_path / "none"
+    other.mkdir()
+    generate_summary(_history(), job_id="1", user_id="user", period=period, output_dir=other, write=False)
+    assert list(other.iterdir()) == []
+
+def _monthly(dates, amounts=None, sig="gym"):
+    amounts = amounts or ["30"] * len(dates)
+    return [
+        {"date": d, "amount": a, "merchant_signature": sig, "type": "debit"}
+        for d, a in zip(dates, amounts)
+    ]
+
+
+def test_recurring_tolerates_missed_month_and_duplicate_charge():
+    dates = ["2024-01-03", "2024-02-03", "2024-04-03", "2024-05-03", "2024-05-03", "2024-06-03"]
+    recurring = detect_recurring(_monthly(dates))
+    assert len(recurring) == 1
+    assert recurring[0]["cadence"] == "monthly"
+    assert recurring[0]["count"] == 6
+    assert recurring[0]["last_seen"] == "2024-06-03"
+
+
+def test_recurring_tolerates_one_off_price_change():
+    dates = [f"2024-{m:02d}-10" for m in range(1, 6)]
+    recurring = detect_recurring(_monthly(dates, ["10", "10", "10", "10", "13"]))
+    assert recurring[0]["median_amount"] == 10.0
+    assert recurring[0]["last_amount"] == 13.0
+    assert "Recurring gym increased 30%" in detect_overspending(_monthly(dates), recurring)
+
+
+def test_recurring_rejects_one_off_spike():
+    dates = ["2024-01-10", "2024-02-10", "2024-03-10"]
+    spike = _monthly(dates, ["10", "10", "50"])
+    assert detect_recurring(spike) == []
+    assert not any("Recurring" in h for h in detect_overspending(spike, detect_recurring(spike)))
+    # a longer series with the same spike is still rejected
+    assert detect_recurring(_monthly(
+        [f"2024-{m:02d}-10" for m in range(1, 7)], ["10"] * 5 + ["50"]
+    )) == []
+
+
+def test_recurring_rejects_irregular_intervals_and_amounts():
+    irregular = _monthly(["2024-01-01", "2024-01-09", "2024-02-20", "2024-02-24", "2024-05-01"])
+    assert detect_recurring(irregular) == []
+    varying = _monthly(
+        [f"2024-{m:02d}-10" for m in range(1, 6)], ["10", "25", "40", "60", "90"]
+    )
+    assert detect_recurring(varying) == []
+    # three charges on the same day are duplicates, not a cadence
+    assert detect_recurring(_monthly(["2024-01-01"] * 3)) == []
+
+
+def test_recurring_weekly_and_yearly_bands():
+    weekly = _monthly([f"2024-03-{d:02d}" for d in (1, 8, 15, 22, 29)], sig="cleaner")
+    yearly = _monthly(["2021-07-01", "2022-07-01", "2023-07-01"], sig="insurance")
+    recurring = {r["merchant"]: r["cadence"] for r in detect_recurring(weekly + yearly)}
+    assert recurring == {"cleaner": "weekly", "insurance": "yearly"}
+
+
+def test_exact_group_sum_is_order_independent():
+    from backend.columnar import exact_group_sum
+
+    values = np.array([0.1, 0.2, 0.3, 1e6 + 0.07, -0.29])
+    keys = np.zeros(values.shape[0], dtype=np.int64)
+    forward = exact_group_sum(keys, values, 1)
+    backward = exact_group_sum(keys, values[::-1], 1)
+    assert forward[0] == backward[0] == 1000000.38
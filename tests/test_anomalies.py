@@ -0,0 +1,76 @@
+import json
+
+from backend.anomalies import AnomalyDetector, RunningStats, detect_anomalies
+from backend.columnar import TransactionColumns
+
+
+def _tx(day, amount, merchant, category="Groceries", type_="debit"):
+    return {
+        "date": f"2024-01-{day:02d}",
+        "amount": str(amount),
+        "type": type_,
+        "merchant_signature": merchant,
+        "category": category,
+    }
+
+
+def test_running_stats_match_batch():
+    values = [4.0, 7.0, 13.0, 16.0]
+    stats = RunningStats()
+    for x in values:
+        stats.update(x)
+    assert stats.n == 4
+    assert stats.mean == 10.0
+    assert stats.std == (sum((x - 10) ** 2 for x in values) / 4) ** 0.5
+
+
+def test_unusual_merchant_amount():
+    txs = [_tx(d, 40, "tesco") for d in (2, 9, 16)] + [_tx(23, 160, "tesco")]
+    assert detect_anomalies(txs) == [
+        "Unusual amount 160.00 at tesco on 2024-01-23 (usually about 40.00)"
+    ]
+
+
+def test_small_drift_not_flagged():
+    txs = [_tx(d, 40 + d / 10, "tesco") for d in (2, 9, 16, 23)]
+    assert detect_anomalies(txs) == []
+
+
+def test_duplicate_charge():
+    txs = [_tx(5, 9.99, "netflix", "Subscriptions"), _tx(6, 9.99, "netflix", "Subscriptions")]
+    assert detect_anomalies(txs) == ["Possible duplicate charge 9.99 at netflix on 2024-01-06"]
+
+
+def test_large_first_seen_merchant_and_category_spend():
+    txs = [_tx(d, 20, m) for d, m in ((1, "a"), (2, "b"), (3, "c"))]
+    txs.append(_tx(4, 900, "jeweller", "Shopping"))
+    txs.append(_tx(5, 200, "d"))
+    assert detect_anomalies(txs) == [
+        "First payment of 900.00 to new merchant jeweller on 2024-01-04",
+        "Unusually large Groceries spend 200.00 at d on 2024-01-05",
+    ]
+
+
+def test_credits_and_undated_ignored():
+    txs = [_tx(d, 40, "tesco") for d in (2, 9, 16)]
+    txs.append(_tx(20, 5000, "tesco", type_="credit"))
+    txs.append({**_tx(21, 500, "tesco"), "date": ""})
+    assert detect_anomalies(txs) == []
+
+
+def test_columns_match_dicts():
+    txs = [_tx(d % 28 + 1, 10 + (d * 7) % 50, f"m{d % 4}") for d in range(60)]
+    txs.append(_tx(28, 400, "m1"))
+    expected = detect_anomalies(txs)
+    assert expected
+    assert detect_anomalies(TransactionColumns.from_transactions(txs)) == expected
+
+
+def test_resume_from_saved_state():
+    txs = [_tx(d, 40, "tesco") for d in (2, 9, 16)] + [_tx(23, 160, "tesco")]
+    detector = AnomalyDetector()
+    for tx in txs[:3]:
+        detector.observe(tx)
+    resumed = AnomalyDetector.from_dict(json.loads(json.dumps(detector.to_dict())))
+    assert resumed.observe(txs[3]) == detect_anomalies(txs)
+    assert resumed.anomalies == detect_anomalies(txs)
@@ -3,6 +3,7 @@ import os
 import json
 import sys
 import types
+from decimal import Decimal
 from pathlib import Path
 
 import pytest
@@ -83,6 +84,37 @@ def test_upload_gzip(client: TestClient):
     assert "job_id" in resp.json()
 
 
+def test_uploads_are_stored_compressed(client: TestClient):
+    from backend.models import ProcessingJob, Upload
+
+    lines = [
+        json.dumps({"date": "2024-01-02", "description": "mystery shop 123", "amount": "5", "type": "debit"}),
+        json.dumps({"date": "2024-01-03", "description": "other place 456", "amount": "7", "type": "debit"}),
+    ]
+    sent = gzip.compress(("\r\n".join(lines) + "\r\n").encode())
+    gz = client.post(
+        "/upload", content=sent, headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"}
+    ).json()
+    plain = client.post(
+        "/upload", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"}
+    ).json()
+    assert plain["duplicate"] is True
+
+    with Session(client.engine) as session:
+        job = session.get(ProcessingJob, gz["job_id"])
+        upload = session.get(Upload, job.upload_id)
+        # the client's gzip body is kept byte for byte
+        assert upload.body == sent and upload.content == ""
+
+    rows = client.post("/classify", json={"job_id": gz["job_id"]}).json()["transactions"]
+    assert [r["description"] for r in rows] == ["mystery shop 123", "other place 456"]
+
+    bad = client.post(
+        "/upload", content=b"not gzip", headers={"Content-Encoding": "gzip", "Content-Type": "text/plain"}
+    )
+    assert bad.status_code == 400
+
+
 def test_rules(client: TestClient):
     client.post(
         "/rules", json={"user_id": 1, "label": "Groceries", "pattern": "allowed"}
@@ -296,6 +328,41 @@ def test_transactions_endpoint_filters(client: TestClient):
     assert filtered_both[0]["description"] == "coffee"
 
 
+
+def test_transactions_keyset_pages_and_ndjson(client: TestClient, monkeypatch):
+    content = "\n".join(
+        json.dumps({"description": f"shop {i}", "type": "debit"}) for i in range(7)
+    )
+    job_id = client.post(
+        "/upload",
+        data=content,
+        headers={"Content-Type": "application/x-ndjson"},
+    ).json()["job_id"]
+    client.post("/classify", json={"job_id": job_id, "user_id": 1})
+
+    seen, after_id = [], None
+    while True:
+        params = {"limit": 3} if after_id is None else {"limit": 3, "after_id": after_id}
+        resp = client.get(f"/transactions/{job_id}", params=params)
+        seen += [t["description"] for t in resp.json()]
+        after_id = resp.headers.get("X-Next-After-Id")
+        if after_id is None:
+            break
+    assert seen == [f"shop {i}" for i in range(7)]
+
+    from backend import app as app_module
+
+    monkeypatch.setattr(app_module, "STREAM_BATCH_SIZE", 2)
+    resp = client.get(f"/transactions/{job_id}", params={"format": "ndjson"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [t["description"] for t in lines] == seen
+    resp = client.get(
+        f"/transactions/{job_id}", params={"format": "ndjson", "limit": 5, "description": "shop"}
+    )
+    assert len(resp.text.splitlines()) == 5
+    assert client.get(f"/transactions/{job_id}", params={"limit": 0}).status_code == 422
+
 def test_classify_uses_cache(client: TestClient):
     content = "\n".join(
         [
@@ -313,6 +380,116 @@ def test_classify_uses_cache(client: TestClient):
     assert client.adapter.calls == 1
 
 
+def test_reupload_reuses_upload_and_classification(client: TestClient):
+    from backend import app as app_module
+    from backend.models import ProcessingJob
+
+    lines = [
+        json.dumps({"date": "2024-01-02", "description": "mystery shop 123", "amount": "5", "type": "debit"}),
+        json.dumps({"date": "2024-01-03", "description": "other place 456", "amount": "7", "type": "debit"}),
+    ]
+
+    def upload(content):
+        return client.post(
+            "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+        ).json()
+
+    first = upload("\n".join(lines))
+    assert first["duplicate"] is False
+    original = client.post("/classify", json={"job_id": first["job_id"]}).json()
+    assert client.adapter.calls == 1
+
+    app_module.SIGNATURE_CACHE.clear()
+    second = upload("  " + "\r\n\r\n".join(lines) + "\n\n")
+    assert second["duplicate"] is True
+    reused = client.post("/classify", json={"job_id": second["job_id"]}).json()
+    assert client.adapter.calls == 1
+    # stored amounts come back in canonical form ("5.00" for "5")
+    assert [
+        {**tx, "amount": Decimal(tx["amount"])} for tx in reused["transactions"]
+    ] == [{**tx, "amount": Decimal(tx["amount"])} for tx in original["transactions"]]
+    assert client.get(f"/status/{second['job_id']}").json()["status"] == "completed"
+    rows = client.get(f"/transactions/{second['job_id']}").json()
+    assert [r["description"] for r in rows] == ["mystery shop 123", "other place 456"]
+
+    with Session(client.engine) as session:
+        jobs = [session.get(ProcessingJob, j) for j in (first["job_id"], second["job_id"])]
+        assert jobs[0].upload_id == jobs[1].upload_id
+
+    # another user's rules may differ, so their job is classified afresh
+    third = upload("\n".join(lines))
+    client.post("/classify", json={"job_id": third["job_id"], "user_id": 2})
+    assert client.adapter.calls == 2
+
+
+def test_reuse_requires_same_classifiers(client: TestClient):
+    from backend import app as app_module
+
+    content = json.dumps({"description": "mystery shop 123", "type": "debit"})
+
+    def classify():
+        job_id = client.post(
+            "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+        ).json()["job_id"]
+        client.post("/classify", json={"job_id": job_id})
+        app_module.SIGNATURE_CACHE.clear()
+
+    classify()
+    classify()
+    assert client.adapter.calls == 1
+    # a different model may label differently, so nothing is reused
+    client.adapter.model = "other"
+    classify()
+    assert client.adapter.calls == 2
+
+
+def test_degraded_job_is_not_reused(client: TestClient, monkeypatch):
+    from backend.llm_adapter import DailyCostTracker
+    from backend.models import ProcessingJob
+
+    content = json.dumps({"description": "mystery shop 123", "type": "debit"})
+
+    def classify():
+        job_id = client.post(
+            "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+        ).json()["job_id"]
+        client.post("/classify", json={"job_id": job_id})
+        return job_id
+
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", DailyCostTracker(limit=0.0))
+    skipped = classify()
+    assert client.adapter.calls == 0
+    with Session(client.engine) as session:
+        assert session.get(ProcessingJob, skipped).degraded is True
+
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", DailyCostTracker(limit=1.0))
+    retried = classify()
+    assert client.adapter.calls == 1
+    with Session(client.engine) as session:
+        assert session.get(ProcessingJob, retried).degraded is False
+
+
+def test_classify_completes_when_budget_exhausted(client: TestClient, monkeypatch):
+    from backend import app as app_module
+    from backend.llm_adapter import DailyCostTracker
+
+    monkeypatch.setattr(
+        "backend.llm_adapter.cost_tracker", DailyCostTracker(limit=0.0)
+    )
+    content = json.dumps({"description": "mystery shop 123", "type": "debit"})
+    job_id = client.post(
+        "/upload",
+        data=content,
+        headers={"Content-Type": "application/x-ndjson"},
+    ).json()["job_id"]
+    resp = client.post("/classify", json={"job_id": job_id})
+    assert resp.status_code == 200
+    assert resp.json()["transactions"][0]["label"] == "unknown"
+    assert client.adapter.calls == 0
+    assert client.get(f"/status/{job_id}").json()["status"] == "completed"
+    assert app_module.SIGNATURE_CACHE == {}
+
+
 def test_classify_learns_user_rule_and_reuses(client: TestClient):
     class LearningAdapter(AbstractAdapter):
         def __init__(self):
@@ -536,3 +713,110 @@ def test_upload_rejects_large_payload(client: TestClient):
         "/upload", data=data, headers={"Content-Type": "text/plain"}
     )
     assert resp.status_code == 413
+
+
+def test_relabel_updates_summary_state(client: TestClient, tmp_path: Path):
+    os.environ["STORAGE_DIR"] = str(tmp_path)
+    content = "\n".join(
+        [
+            json.dumps({"date": "2024-01-01", "amount": "10", "description": "coffee", "type": "debit"}),
+            json.dumps({"date": "2024-01-02", "amount": "5", "description": "salary", "type": "credit"}),
+        ]
+    )
+    job_id = client.post(
+        "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+    ).json()["job_id"]
+    client.post("/classify", json={"job_id": job_id})
+    from backend.models import Transaction
+
+    with Session(client.engine) as session:
+        salary = session.exec(
+            select(Transaction).where(Transaction.description == "salary")
+        ).one()
+
+    resp = client.patch(f"/transactions/{job_id}/{salary.id}", json={"label": "Nonsense"})
+    assert resp.status_code == 400
+    resp = client.patch(f"/transactions/{job_id + 1}/{salary.id}", json={"label": "Income"})
+    assert resp.status_code == 404
+    resp = client.patch(f"/transactions/{job_id}/{salary.id}", json={"label": "Income"})
+    assert resp.status_code == 200
+    assert resp.json()["classification_type"] == "user"
+
+    summary = client.post("/summary", json={"job_id": job_id}).json()
+    assert {c["name"]: c["count"] for c in summary["categories"]} == {"Income": 1, "Groceries": 1}
+    assert summary["totals"] == {"income": 5.0, "expenses": -10.0, "net": -5.0}
+
+
+def test_user_summary_merges_jobs(client: TestClient, tmp_path: Path):
+    os.environ["STORAGE_DIR"] = str(tmp_path)
+
+    def classify(months):
+        content = "\n".join(
+            json.dumps({"date": f"2024-{m:02d}-05", "amount": "9.99", "description": "netflix", "type": "debit"})
+            for m in months
+        )
+        job_id = client.post(
+            "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+        ).json()["job_id"]
+        client.post("/classify", json={"job_id": job_id, "user_id": 5})
+        return job_id
+
+    assert client.get("/users/5/summary").status_code == 404
+    classify([1, 2])
+    last = classify([2, 3])  # February appears in both statements
+    data = client.get("/users/5/summary").json()
+    assert data["job_id"] == str(last)
+    assert data["period"] == {"start": "2024-01-05", "end": "2024-03-05"}
+    assert data["totals"]["expenses"] == pytest.approx(-29.97)
+    assert [r["merchant"] for r in data["recurring"]] == ["netflix"]
+
+    ranged = client.get("/users/5/summary", params={"start": "2024-02-01"}).json()
+    assert ranged["period"]["start"] == "2024-02-05"
+
+
+def _classified_job(client: TestClient) -> int:
+    content = "\n".join(
+        json.dumps(
+            {
+                "description": f"shop {i}",
+                "date": f"2024-01-{i + 1:02d}",
+                "amount": f"{i}.25",
+                "type": "debit",
+            }
+        )
+        for i in range(5)
+    )
+    job_id = client.post(
+        "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+    ).json()["job_id"]
+    client.post("/classify", json={"job_id": job_id, "user_id": 1})
+    return job_id
+
+
+def test_export_arrow_and_parquet(client: TestClient):
+    pa = pytest.importorskip("pyarrow")
+    import io
+    import pyarrow.parquet as pq
+    from datetime import date
+    from decimal import Decimal
+
+    job_id = _classified_job(client)
+    resp = client.get(f"/export/{job_id}")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(resp.content).read_all()
+    assert table.num_rows == 5
+    assert table.column("date")[0].as_py() == date(2024, 1, 1)
+    assert table.column("amount")[2].as_py() == Decimal("2.25")
+    assert pa.types.is_dictionary(table.schema.field("merchant_signature").type)
+
+    resp = client.get(f"/export/{job_id}", params={"format": "parquet"})
+    parquet = pq.read_table(io.BytesIO(resp.content))
+    assert parquet.column("description").to_pylist() == [f"shop {i}" for i in range(5)]
+    assert client.get("/export/999").status_code == 404
+
+
+def test_export_without_pyarrow(client: TestClient, monkeypatch):
+    job_id = _classified_job(client)
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    assert client.get(f"/export/{job_id}").status_code == 501
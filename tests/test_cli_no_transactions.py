@@ -6,7 +6,7 @@ from bankcleanr import cli
 def test_cli_exits_when_no_transactions(tmp_path, monkeypatch):
     runner = CliRunner()
 
-    def fake_extract(pdf_path: str, bank: str | None = None):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
         return []
 
     monkeypatch.setattr(cli, "extract_transactions", fake_extract)
@@ -24,7 +24,7 @@ def test_cli_allows_missing_bank(tmp_path, monkeypatch):
     runner = CliRunner()
     called: dict[str, str | None] = {}
 
-    def fake_extract(pdf_path: str, bank: str | None = None):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
         called["bank"] = bank
         return []
 
@@ -7,7 +7,7 @@ from bankcleanr import cli
 def test_cli_validates_records(tmp_path, monkeypatch):
     runner = CliRunner()
 
-    def fake_extract(pdf_path: str, bank: str | None = None):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
         return [{"date": "01 Jan 2024", "description": "x", "type": "credit"}]  # missing amount
 
     monkeypatch.setattr(cli, "extract_transactions", fake_extract)
@@ -25,7 +25,7 @@ def test_cli_validates_records(tmp_path, monkeypatch):
 def test_cli_handles_missing_amount(tmp_path, monkeypatch):
     runner = CliRunner()
 
-    def fake_extract(pdf_path: str, bank: str | None = None):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
         return [
             {
                 "date": "01 Jan 2024",
@@ -50,7 +50,7 @@ def test_cli_handles_missing_amount(tmp_path, monkeypatch):
 def test_cli_parse_alias(tmp_path, monkeypatch):
     runner = CliRunner()
 
-    def fake_extract(pdf_path: str, bank: str | None = None):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
         return [
             {
                 "date": "01 Jan 2024",
@@ -72,5 +72,43 @@ def test_cli_parse_alias(tmp_path, monkeypatch):
     assert result.exit_code == 0
     assert (
         out.read_text()
-        == '{"date": "01 Jan 2024", "description": "x", "amount": "1", "merchant_signature": "", "type": "credit"}\n'
+        == '{"date":"01 Jan 2024","description":"x","amount":"1","merchant_signature":"","type":"credit"}\n'
     )
+
+
+def _bulk_extract(bad_index):
+    def fake_extract(pdf_path: str, bank: str | None = None, dedupe: bool = False):
+        for i in range(300):
+            item = {
+                "date": "01 Jan 2024",
+                "description": "x",
+                "amount": "1",
+                "merchant_signature": "",
+                "type": "credit",
+            }
+            if i == bad_index:
+                item["unexpected"] = True
+            yield item
+
+    return fake_extract
+
+
+def test_cli_validate_sample_and_off(tmp_path, monkeypatch):
+    runner = CliRunner()
+    pdf = tmp_path / "in.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    out = tmp_path / "out.jsonl"
+
+    # record 150 is not sampled (first 100, then every 100th)
+    monkeypatch.setattr(cli, "extract_transactions", _bulk_extract(150))
+    result = runner.invoke(cli.app, ["extract", str(pdf), str(out), "--validate", "sample"])
+    assert result.exit_code == 0
+    result = runner.invoke(cli.app, ["extract", str(pdf), str(out), "--validate", "full"])
+    assert isinstance(result.exception, ValidationError)
+
+    monkeypatch.setattr(cli, "extract_transactions", _bulk_extract(200))
+    result = runner.invoke(cli.app, ["extract", str(pdf), str(out), "--validate", "sample"])
+    assert isinstance(result.exception, ValidationError)
+    result = runner.invoke(cli.app, ["extract", str(pdf), str(out), "--validate", "off"])
+    assert result.exit_code == 0
+    assert len(out.read_text().splitlines()) == 300
@@ -0,0 +1,28 @@
+from datetime import date
+from decimal import Decimal
+
+from backend.export import rows_to_columns
+
+
+def test_rows_to_columns_types_values():
+    rows = [
+        (1, date(2024, 3, 5), "Tesco", 1250, "debit", None, "Groceries", "Groceries", "rule", {"balance": 100}),
+        (2, None, None, None, None, "x", None, None, None, {"date": "not a date", "amount": "oops"}),
+    ]
+    columns = rows_to_columns(rows)
+    assert columns["id"] == [1, 2]
+    assert columns["date"] == [date(2024, 3, 5), None]
+    assert columns["amount"] == [Decimal("12.50"), None]
+    assert columns["balance"] == [Decimal("100.00"), None]
+    assert columns["description"] == ["Tesco", None]
+    assert columns["merchant_signature"] == [None, "x"]
+    assert columns["classification_type"] == ["rule", None]
+
+
+def test_sub_penny_amounts_are_not_rounded():
+    rows = [
+        (1, None, None, None, None, None, None, None, None, {"amount": "1.005", "balance": "2.5"}),
+    ]
+    columns = rows_to_columns(rows)
+    assert columns["amount"] == [None]
+    assert columns["balance"] == [Decimal("2.50")]
@@ -0,0 +1,65 @@
+import sys
+from datetime import date
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend import database
+from backend.models import ProcessingJob, Transaction
+from scripts import export_transactions
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        job = ProcessingJob(upload_id=1, status="completed")
+        session.add(job)
+        session.commit()
+        for i in range(3):
+            session.add(
+                Transaction.from_data(
+                    job.id,
+                    {"date": f"2024-01-0{i + 1}", "description": f"shop {i}", "amount": f"-{i + 1}.50"},
+                )
+            )
+        session.commit()
+    monkeypatch.setattr(database, "engine", engine)
+    return engine
+
+
+def _run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["export_transactions.py", *args])
+    export_transactions.main()
+
+
+def test_export_writes_parquet(engine, tmp_path, monkeypatch, capsys):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    out = tmp_path / "out.parquet"
+    _run(monkeypatch, "1", str(out))
+    assert "Wrote 3 transactions" in capsys.readouterr().out
+    table = pq.read_table(out)
+    assert table.column("date").to_pylist()[0] == date(2024, 1, 1)
+    assert table.column("description").to_pylist() == ["shop 0", "shop 1", "shop 2"]
+
+
+def test_export_format_option(engine, tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+
+    out = tmp_path / "out.parquet"
+    _run(monkeypatch, "1", str(out), "--format", "arrow")
+    assert pa.ipc.open_stream(out.read_bytes()).read_all().num_rows == 3
+
+
+def test_export_without_pyarrow(engine, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    out = tmp_path / "out.arrows"
+    with pytest.raises(SystemExit, match="requires pyarrow"):
+        _run(monkeypatch, "1", str(out))
+    assert not out.exists()
@@ -45,3 +45,30 @@ def test_extract_transactions_adds_type(monkeypatch, tmp_path):
         }
     ]
     PARSER_REGISTRY.pop("dummy", None)
+
+
+def test_extract_directory_dedupes_overlapping_statements(monkeypatch, tmp_path):
+    statements = {
+        "a.pdf": [("2024-01-30", "-5.00", "90.00"), ("2024-01-31", "-2.50", "87.50"), ("2024-01-31", "-2.50", "87.50")],
+        "b.pdf": [("2024-01-31", "-2.50", "87.50"), ("2024-02-01", "-2.50", "85.00")],
+        "c.pdf": [("2024-01-30", "-5.00", "90.00"), ("2024-01-31", "-2.50", "87.50"), ("2024-01-31", "-2.50", "87.50")],
+    }
+
+    class DummyParser:
+        def parse(self, pdf_path):
+            for date, amount, balance in statements[pdf_path.rsplit("/", 1)[-1]]:
+                yield {"date": date, "description": "Coffee 12", "amount": amount, "balance": balance}
+
+    monkeypatch.setitem(PARSER_REGISTRY, "dummy", DummyParser)
+    for name in statements:
+        (tmp_path / name).write_bytes(b"%PDF-1.4")
+
+    assert len(list(extract_transactions(str(tmp_path), bank="dummy"))) == 8
+    records = list(extract_transactions(str(tmp_path), bank="dummy", dedupe=True))
+    # repeats within a.pdf are kept; b.pdf's overlap and the copy c.pdf are dropped
+    assert [(r["date"], r["balance"]) for r in records] == [
+        ("2024-01-30", "90.00"),
+        ("2024-01-31", "87.50"),
+        ("2024-01-31", "87.50"),
+        ("2024-02-01", "85.00"),
+    ]
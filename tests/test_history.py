@@ -0,0 +1,97 @@
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from backend.history import merge_job, transaction_fingerprint, user_summary
+from backend.models import Transaction, UserTransaction
+
+
+@pytest.fixture
+def session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _tx(date, amount="9.99", sig="netflix", category="Subscriptions", **extra):
+    return {
+        "date": date,
+        "amount": amount,
+        "type": "debit",
+        "merchant_signature": sig,
+        "category": category,
+        **extra,
+    }
+
+
+def _job(session, job_id, txs):
+    rows = [Transaction.from_data(job_id, tx) for tx in txs]
+    for row in rows:
+        session.add(row)
+    session.commit()
+    added = merge_job(session, 7, job_id, rows)
+    session.commit()
+    return added
+
+
+def test_fingerprint_ignores_amount_formatting_but_not_occurrence():
+    assert transaction_fingerprint(_tx("2024-01-01", "10")) == transaction_fingerprint(
+        _tx("2024-01-01", "10.00")
+    )
+    assert transaction_fingerprint(_tx("2024-01-01"), 0) != transaction_fingerprint(
+        _tx("2024-01-01"), 1
+    )
+
+
+def test_overlapping_statements_are_deduplicated(session):
+    coffee = _tx("2024-02-03", "3.20", sig="cafe", category="Groceries")
+    assert _job(session, 1, [_tx("2024-01-05"), _tx("2024-02-05"), coffee, coffee]) == 4
+    # the second statement repeats February, including both coffees
+    assert _job(session, 2, [_tx("2024-02-05"), coffee, coffee, _tx("2024-03-05")]) == 1
+    assert len(session.exec(select(UserTransaction)).all()) == 5
+
+
+def test_recurring_detected_across_jobs(session):
+    _job(session, 1, [_tx("2024-01-05")])
+    _job(session, 2, [_tx("2024-02-05")])
+    summary = user_summary(session, 7)
+    assert summary["recurring"] == []
+
+    _job(session, 3, [_tx("2024-03-05")])
+    summary = user_summary(session, 7)
+    assert [r["merchant"] for r in summary["recurring"]] == ["netflix"]
+    assert summary["job_id"] == "3"
+    assert summary["period"] == {"start": "2024-01-05", "end": "2024-03-05"}
+
+
+def test_time_range_query(session):
+    _job(session, 1, [_tx(f"2024-{m:02d}-05") for m in range(1, 7)])
+    summary = user_summary(session, 7, start="2024-03-01", end="2024-04-30")
+    assert summary["period"] == {"start": "2024-03-05", "end": "2024-04-05"}
+    assert summary["categories"][0]["count"] == 2
+    assert user_summary(session, 8) is None
+
+
+def test_user_state_does_not_grow_with_history(session):
+    from backend.analytics import RECURRING_WINDOW
+    from backend.models import UserSummaryState
+    from backend.summary_state import SummaryAggregate
+
+    for job_id in range(1, 61):
+        year, month = divmod(job_id - 1, 12)
+        _job(session, job_id, [_tx(f"{2020 + year}-{month + 1:02d}-05")])
+    state = session.get(UserSummaryState, 7).state
+    count, first, _, _, _, window = state["merchant_series"]["netflix"]
+    assert (count, first) == (60, "2020-01-05")
+    assert len(window) == RECURRING_WINDOW
+
+    history = session.exec(select(UserTransaction).order_by(UserTransaction.id)).all()
+    rebuilt = SummaryAggregate.from_transactions(e.data for e in history)
+    summary = user_summary(session, 7)
+    assert summary["recurring"] == rebuilt.summary("60", "7")["recurring"]
+    assert summary["recurring"][0]["count"] == 60
@@ -0,0 +1,50 @@
+import gzip
+import json
+
+import pytest
+
+from bankcleanr import jsonl
+from bankcleanr.jsonl import JSONLWriter
+
+RECORDS = [
+    {"date": "01 Jan 2024", "description": "Café £5", "amount": "5.00", "type": "debit"},
+    {"date": "02 Jan 2024", "description": "x", "amount": "1", "balance": None, "type": "credit"},
+]
+
+
+def test_writes_compact_lines(tmp_path):
+    out = tmp_path / "out.jsonl"
+    with JSONLWriter(out, dumps=jsonl._stdlib_dumps) as writer:
+        writer.write_many(RECORDS)
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == '{"date":"01 Jan 2024","description":"Café £5","amount":"5.00","type":"debit"}'
+    assert [json.loads(line) for line in lines] == RECORDS
+    assert writer.count == 2
+
+
+def test_orjson_output_matches_stdlib():
+    orjson = pytest.importorskip("orjson")
+    for record in RECORDS:
+        assert orjson.dumps(record) == jsonl._stdlib_dumps(record)
+
+
+def test_gzip_output_by_suffix(tmp_path):
+    out = tmp_path / "out.jsonl.gz"
+    with JSONLWriter(out) as writer:
+        writer.write_many(RECORDS * 100)
+    with gzip.open(out, "rt", encoding="utf-8") as fh:
+        assert [json.loads(line) for line in fh] == RECORDS * 100
+
+
+def test_buffers_until_chunk_size(tmp_path):
+    out = tmp_path / "out.jsonl"
+    writer = JSONLWriter(out, chunk_size=1 << 20)
+    writer.write_many(RECORDS)
+    assert len(writer._buffer) == 4
+    writer.close()
+    assert len(out.read_bytes().splitlines()) == 2
+
+    writer = JSONLWriter(out, chunk_size=1)
+    writer.write(RECORDS[0])
+    assert not writer._buffer
+    writer.close()
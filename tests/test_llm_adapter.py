@@ -1,6 +1,8 @@
 import pytest
 import json
 import sys
+import threading
+import time
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -13,6 +15,7 @@ from backend.llm_adapter import (
     AnthropicAdapter,
     AzureAdapter,
     DailyCostTracker,
+    estimate_tokens,
     get_adapter,
     _adapter_instances,
 )
@@ -83,15 +86,63 @@ def test_records_cost(engine, monkeypatch):
 
 
 def test_cost_limit(engine, monkeypatch):
-    tracker = DailyCostTracker(limit=0.0001)
+    tracker = DailyCostTracker(limit=0.00005)
     monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
     adapter = DummyAdapter({"a": {"label": "x", "confidence": 1.0, "tokens": 1000}})
-    with pytest.raises(RuntimeError):
-        adapter.classify(["a"], job_id=1)
+    out = adapter.classify(["a"], job_id=1)
+    assert out == [
+        {"label": "unknown", "confidence": 0.0, "tokens": 0, "cost": 0.0, "skipped": True}
+    ]
+    assert adapter.calls == 0
     with Session(engine) as session:
         assert session.exec(select(LLMCost)).first() is None
 
 
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a") >= 1
+    assert estimate_tokens("tesco stores 2231") >= 3
+    long_text = "x" * 400
+    assert estimate_tokens(long_text) == 100
+
+
+def test_batches_sized_to_remaining_budget(engine, monkeypatch):
+    adapter = DummyAdapter({})
+    adapter.batch_size = 5
+    per_prompt = adapter.estimate_cost("a")
+    tokens = round(per_prompt * 1000 / adapter.price_per_1k_tokens_gbp)
+    adapter.responses = {
+        p: {"label": p, "confidence": 1.0, "tokens": tokens} for p in "abcde"
+    }
+    tracker = DailyCostTracker(limit=per_prompt * 3.5, job_limit=10.0)
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
+    out = adapter.classify(list("abcde"), job_id=1)
+    assert [r["label"] for r in out] == ["a", "b", "c", "unknown", "unknown"]
+    assert adapter.calls == 1
+    assert tracker.daily_total == pytest.approx(per_prompt * 3)
+
+
+def test_reservation_replaced_by_actual_cost(engine, monkeypatch):
+    tracker = DailyCostTracker(limit=1.0)
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
+    adapter = DummyAdapter({"a": {"label": "x", "confidence": 1.0, "tokens": 1}})
+    adapter.classify(["a"], job_id=1)
+    assert tracker.daily_total == pytest.approx(
+        1 / 1000 * adapter.price_per_1k_tokens_gbp
+    )
+
+
+def test_failed_call_releases_reservation(engine, monkeypatch):
+    tracker = DailyCostTracker(limit=1.0)
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
+    monkeypatch.setattr("backend.llm_adapter.time.sleep", lambda s: None)
+    adapter = DummyAdapter({"a": {"label": "x", "confidence": 1.0, "tokens": 1}}, fail_times=5)
+    with pytest.raises(RuntimeError):
+        adapter.classify(["a"], job_id=1)
+    assert tracker.daily_total == 0.0
+    assert tracker.job_costs[1] == 0.0
+
+
 def test_batches_prompts_exceed_batch_size(engine, monkeypatch):
     tracker = DailyCostTracker(limit=1.0)
     monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
@@ -118,8 +169,12 @@ def test_job_cost_cap(engine, monkeypatch):
 
     adapter = CostlyAdapter("m")
     adapter.classify(["a"], job_id=1)
-    with pytest.raises(RuntimeError):
-        adapter.classify(["b"], job_id=1)
+    # the estimate fits the remaining budget, so this call is made and booked
+    adapter.classify(["b"], job_id=1)
+    assert tracker.job_costs[1] == pytest.approx(6.0)
+    out = adapter.classify(["c"], job_id=1)
+    assert out[0]["label"] == "unknown"
+    assert out[0]["skipped"] is True
 
 
 def test_logs_cost(engine, monkeypatch, caplog):
@@ -136,6 +191,7 @@ def test_report_cost_recorded(engine, monkeypatch):
     monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
     with tracker.track(job_id=1, cost=0.2):
         pass
+    tracker.flush()
     with Session(engine) as session:
         entry = session.exec(select(LLMCost)).one()
         assert entry.job_id == 1
@@ -152,11 +208,93 @@ def test_report_cost_limit(engine, monkeypatch):
     with pytest.raises(RuntimeError):
         with tracker.track(job_id=1, cost=0.2):
             pass
+    tracker.flush()
     with Session(engine) as session:
         entries = list(session.exec(select(LLMCost)))
         assert len(entries) == 1
 
 
+def test_cost_entries_buffered_until_flush(engine, monkeypatch):
+    tracker = DailyCostTracker(limit=10.0, job_limit=10.0, flush_interval=0)
+    tracker.add(1, 10, 5, 0.1)
+    tracker.add(1, 20, 5, 0.2)
+    with Session(engine) as session:
+        assert session.exec(select(LLMCost)).first() is None
+    assert tracker.pending == 2
+    assert tracker.flush() == 2
+    assert tracker.pending == 0
+    with Session(engine) as session:
+        entries = list(session.exec(select(LLMCost)))
+        assert [e.tokens_in for e in entries] == [10, 20]
+
+
+def test_classify_flushes_once_per_job(engine, monkeypatch):
+    tracker = DailyCostTracker(limit=1.0, flush_interval=0)
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
+    commits = []
+    original = Session.commit
+
+    def counting_commit(self):
+        commits.append(1)
+        return original(self)
+
+    monkeypatch.setattr(Session, "commit", counting_commit)
+    responses = {p: {"label": p, "confidence": 1.0, "tokens": 1} for p in "abcde"}
+    adapter = DummyAdapter(responses)
+    adapter.classify(list(responses), job_id=1)
+    assert len(commits) == 1
+    with Session(engine) as session:
+        assert len(list(session.exec(select(LLMCost)))) == 3
+
+
+def test_failed_flush_keeps_entries(engine, monkeypatch):
+    tracker = DailyCostTracker(limit=1.0, flush_interval=0)
+    tracker.add(1, 10, 0, 0.01)
+
+    def broken_session():
+        raise RuntimeError("db down")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr("backend.llm_adapter.get_session", broken_session)
+    with pytest.raises(RuntimeError):
+        tracker.flush()
+    assert tracker.pending == 1
+
+
+def test_timer_flushes_buffer(engine):
+    tracker = DailyCostTracker(limit=1.0, flush_interval=0.01)
+    tracker.add(1, 10, 0, 0.01)
+    deadline = time.monotonic() + 2
+    entry = None
+    while entry is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        with Session(engine) as session:
+            entry = session.exec(select(LLMCost)).first()
+    assert entry is not None and entry.tokens_in == 10
+    assert tracker.pending == 0
+
+
+def test_reserve_is_thread_safe(engine):
+    tracker = DailyCostTracker(limit=1.0, job_limit=1.0, flush_interval=0)
+    accepted = []
+
+    def worker():
+        for _ in range(100):
+            try:
+                tracker.reserve(1, 0.0625)
+            except RuntimeError:
+                continue
+            accepted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(accepted) == 16
+    assert tracker.job_costs[1] == 1.0
+
+
 def test_provider_selected_via_env(monkeypatch):
     monkeypatch.setenv("LLM_PROVIDER", "anthropic")
     _adapter_instances.clear()
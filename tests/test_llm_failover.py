@@ -0,0 +1,233 @@
+import json
+import time
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from backend.llm_adapter import (
+    AbstractAdapter,
+    AnthropicAdapter,
+    CompositeAdapter,
+    DailyCostTracker,
+    OpenAIAdapter,
+    _adapter_instances,
+    get_adapter,
+    register_provider,
+)
+from backend.llm_resilience import get_guard
+from backend.models import LLMCost
+
+
+class LocalProvider(AbstractAdapter):
+    """Fake provider with configurable latency, label and failure mode.
+
+    ``fail=True`` fails every call; an int fails only that many first calls.
+    """
+
+    def __init__(
+        self, name, label="Groceries", latency=0.0, fail=False, tokens=10, max_retries=1
+    ):
+        super().__init__(f"{name}-model", batch_size=5, max_retries=max_retries)
+        self.provider = name
+        self.label = label
+        self.latency = latency
+        self.fail = fail
+        self.tokens = tokens
+        self.calls = 0
+
+    def _send(self, prompts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail is True or self.calls <= self.fail:
+            raise ConnectionError(f"{self.provider} down")
+        return {
+            "labels": [(self.label, 0.9)] * len(prompts),
+            "usage": {"prompt_tokens": self.tokens, "completion_tokens": 0},
+        }
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr("backend.llm_adapter.get_session", get_session_override)
+    monkeypatch.setattr(
+        "backend.llm_adapter.cost_tracker",
+        DailyCostTracker(limit=100.0, job_limit=100.0, flush_interval=0),
+    )
+    return engine
+
+
+def test_primary_answers_without_hedging(engine):
+    primary = LocalProvider("primary")
+    secondary = LocalProvider("secondary", label="Transport")
+    adapter = CompositeAdapter([primary, secondary], default_hedge_delay=1.0)
+    out = adapter.classify(["a", "b"], job_id=1)
+    assert [r["label"] for r in out] == ["Groceries", "Groceries"]
+    assert secondary.calls == 0
+    stats = adapter.provider_stats()
+    assert stats["primary"]["calls"] == 1
+    assert stats["primary"]["tokens"] == 10
+    assert stats["secondary"]["calls"] == 0
+
+
+def test_fails_over_on_error(engine):
+    primary = LocalProvider("primary", fail=True)
+    secondary = LocalProvider("secondary", label="Transport")
+    adapter = CompositeAdapter([primary, secondary], default_hedge_delay=1.0)
+    out = adapter.classify(["a"], job_id=1)
+    assert out[0]["label"] == "Transport"
+    assert adapter.provider_stats()["primary"]["errors"] == 1
+
+
+def test_last_provider_keeps_its_retries(engine, monkeypatch):
+    monkeypatch.setattr("backend.llm_adapter.time.sleep", lambda s: None)
+    primary = LocalProvider("primary", fail=1, max_retries=3)
+    secondary = LocalProvider("secondary", label="Transport", fail=1, max_retries=3)
+    out = CompositeAdapter([primary, secondary]).classify(["a"], job_id=1)
+    # the primary fails over at once; the last provider retries its transient error
+    assert out[0]["label"] == "Transport"
+    assert (primary.calls, secondary.calls) == (1, 2)
+
+    single = LocalProvider("single", fail=1, max_retries=3)
+    out = CompositeAdapter([single]).classify(["a"], job_id=2)
+    assert out[0]["label"] == "Groceries"
+    assert single.calls == 2
+
+
+def test_fails_over_when_primary_circuit_open(engine):
+    primary = LocalProvider("primary")
+    secondary = LocalProvider("secondary", label="Transport")
+    breaker = get_guard("primary").breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    adapter = CompositeAdapter([primary, secondary])
+    out = adapter.classify(["a"], job_id=1)
+    assert out[0]["label"] == "Transport"
+    assert primary.calls == 0
+
+
+def test_all_providers_down_leaves_unknown(engine):
+    adapters = [LocalProvider("p1"), LocalProvider("p2")]
+    for name in ("p1", "p2"):
+        breaker = get_guard(name).breaker
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+    out = CompositeAdapter(adapters).classify(["a", "b"], job_id=1)
+    assert [r["label"] for r in out] == ["unknown", "unknown"]
+
+
+def test_hedges_slow_primary_and_books_loser_cost(engine):
+    primary = LocalProvider("primary", latency=0.5, tokens=100)
+    secondary = LocalProvider("secondary", label="Transport", tokens=10)
+    adapter = CompositeAdapter(
+        [primary, secondary], default_hedge_delay=0.05, min_samples=5
+    )
+    start = time.monotonic()
+    out = adapter.classify(["a"], job_id=1)
+    assert time.monotonic() - start < 0.4
+    assert out[0]["label"] == "Transport"
+    assert secondary.calls == 1
+
+    # the slow primary call still costs money once it completes
+    from backend import llm_adapter
+
+    deadline = time.monotonic() + 2
+    tokens = []
+    while len(tokens) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+        llm_adapter.cost_tracker.flush()
+        with Session(engine) as session:
+            tokens = sorted(e.tokens_in for e in session.exec(select(LLMCost)))
+    assert tokens == [10, 100]
+    # both calls are charged in full and no hedge reservation is left over
+    assert llm_adapter.cost_tracker.job_costs[1] == pytest.approx(110 / 1000 * 0.002)
+
+
+def test_does_not_hedge_beyond_budget(engine, monkeypatch):
+    from backend import llm_adapter
+
+    primary = LocalProvider("primary", latency=0.3)
+    secondary = LocalProvider("secondary", label="Transport")
+    adapter = CompositeAdapter(
+        [primary, secondary], default_hedge_delay=0.05, min_samples=5
+    )
+    # room for the batch but not for a duplicate of it
+    tracker = DailyCostTracker(
+        limit=100.0, job_limit=adapter.estimate_cost("a") * 1.5, flush_interval=0
+    )
+    monkeypatch.setattr(llm_adapter, "cost_tracker", tracker)
+    out = adapter.classify(["a"], job_id=1)
+    assert out[0]["label"] == "Groceries"
+    assert secondary.calls == 0
+    assert tracker.job_costs[1] == pytest.approx(10 / 1000 * 0.002)
+
+
+def test_hedge_delay_tracks_primary_p95(engine):
+    primary = LocalProvider("primary")
+    adapter = CompositeAdapter(
+        [primary, LocalProvider("secondary")], default_hedge_delay=3.0, min_samples=20
+    )
+    assert adapter.hedge_delay(primary) == 3.0
+    for i in range(1, 101):
+        adapter.stats["primary"].record(i / 100, 0, 0.0)
+    assert adapter.hedge_delay(primary) == pytest.approx(0.95)
+
+
+def test_failover_provider_from_env(monkeypatch):
+    from backend import llm_adapter
+
+    monkeypatch.setattr(llm_adapter, "_providers", dict(llm_adapter._providers))
+    register_provider("fast-local", lambda: LocalProvider("fast-local"))
+    register_provider("slow-local", lambda: LocalProvider("slow-local"))
+    monkeypatch.setenv("LLM_FAILOVER_PROVIDERS", "fast-local, slow-local")
+    _adapter_instances.clear()
+    try:
+        adapter = get_adapter("failover")
+        assert isinstance(adapter, CompositeAdapter)
+        assert [a.provider_key for a in adapter.adapters] == ["fast-local", "slow-local"]
+        assert json.dumps(adapter.provider_stats())
+    finally:
+        _adapter_instances.clear()
+
+
+def test_default_failover_uses_only_available_providers(monkeypatch):
+    from backend import llm_adapter
+
+    monkeypatch.setattr(llm_adapter, "_providers", dict(llm_adapter._providers))
+    register_provider("local", lambda: LocalProvider("local"))
+    monkeypatch.delenv("LLM_FAILOVER_PROVIDERS", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    _adapter_instances.clear()
+    try:
+        adapter = get_adapter("failover")
+        assert [a.provider_key for a in adapter.adapters] == ["local"]
+    finally:
+        _adapter_instances.clear()
+    assert not OpenAIAdapter.configured()
+    assert not AnthropicAdapter.implemented
+
+
+def test_failover_rejects_unimplemented_provider(monkeypatch):
+    from backend import llm_adapter
+
+    monkeypatch.setattr(llm_adapter, "_providers", dict(llm_adapter._providers))
+    register_provider("local", lambda: LocalProvider("local"))
+    monkeypatch.setenv("LLM_FAILOVER_PROVIDERS", "local,anthropic")
+    _adapter_instances.clear()
+    try:
+        with pytest.raises(ValueError, match="anthropic is not implemented"):
+            get_adapter("failover")
+    finally:
+        _adapter_instances.clear()
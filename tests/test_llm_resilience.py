@@ -0,0 +1,232 @@
+import threading
+import time
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.llm_adapter import AbstractAdapter, DailyCostTracker
+from backend.llm_resilience import (
+    AIMDLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitError,
+    TokenBucket,
+    get_guard,
+    retry_after,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeProvider(AbstractAdapter):
+    """Adapter replaying a script of outcomes: "ok", "429", "error"."""
+
+    provider = "fake"
+
+    def __init__(self, script=(), latency=0.0):
+        super().__init__("fake-model", batch_size=2, max_retries=3)
+        self.script = list(script)
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _send(self, prompts):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            outcome = self.script.pop(0) if self.script else "ok"
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if outcome == "429":
+                raise RateLimitError(retry_after=0.25)
+            if outcome == "error":
+                raise ConnectionError("provider down")
+            return {
+                "labels": [("Groceries", 0.9)] * len(prompts),
+                "usage": {"prompt_tokens": 1, "completion_tokens": 0},
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def tracker(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    tracker = DailyCostTracker(limit=100.0, job_limit=100.0, flush_interval=0)
+    monkeypatch.setattr("backend.llm_adapter.get_session", get_session_override)
+    monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
+    return tracker
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr("backend.llm_adapter.time.sleep", recorded.append)
+    return recorded
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+    for _ in range(6):
+        bucket.acquire()
+    # two burst tokens, then four more at two per second
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_token_bucket_defer_blocks_all_callers():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=100, capacity=10, clock=clock, sleep=clock.sleep)
+    bucket.defer(5)
+    bucket.acquire()
+    assert clock.now == pytest.approx(5.0)
+
+
+def test_aimd_halves_on_throttle_and_grows_on_success():
+    limiter = AIMDLimiter(initial=8, minimum=1, maximum=10)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 1
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit > 1
+
+
+def test_circuit_breaker_transitions():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()  # single half-open probe
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_retry_after_from_response_headers():
+    class Response:
+        headers = {"retry-after": "3"}
+
+    class ApiError(Exception):
+        status_code = 429
+        response = Response()
+
+    assert retry_after(ApiError()) == 3.0
+
+
+def test_429_honours_retry_after_and_reduces_concurrency(sleeps):
+    adapter = FakeProvider(["429", "ok"])
+    limiter = get_guard("fake").limiter
+    before = limiter.limit
+    out = adapter.classify(["a"], job_id=1)
+    assert out[0]["label"] == "Groceries"
+    assert adapter.calls == 2
+    assert sleeps == [0.25]
+    assert limiter.limit < before
+
+
+def test_open_circuit_marks_prompts_unknown(sleeps, monkeypatch):
+    monkeypatch.setenv("LLM_BREAKER_THRESHOLD", "3")
+    adapter = FakeProvider(["error"] * 10)
+    out = adapter.classify(["a", "b", "c", "d"], job_id=1)
+    # three failed attempts open the breaker; everything is left unknown
+    assert adapter.calls == 3
+    assert [r["label"] for r in out] == ["unknown"] * 4
+    assert all(r["skipped"] for r in out)
+
+    # another job hitting the same provider fails fast without calling it
+    other = FakeProvider()
+    out = other.classify(["e"], job_id=2)
+    assert other.calls == 0
+    assert out[0]["label"] == "unknown"
+
+
+def test_open_circuit_releases_reservation(sleeps, tracker):
+    guard = get_guard("fake")
+    for _ in range(guard.breaker.failure_threshold):
+        guard.breaker.record_failure()
+    FakeProvider().classify(["a"], job_id=1)
+    assert tracker.job_costs[1] == 0.0
+
+
+def test_guard_bounds_concurrency_across_jobs(monkeypatch):
+    monkeypatch.setenv("LLM_INITIAL_CONCURRENCY", "2")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+    monkeypatch.setenv("LLM_RATE_PER_SEC", "1000")
+    monkeypatch.setenv("LLM_RATE_BURST", "1000")
+    adapter = FakeProvider(latency=0.02)
+    threads = [
+        threading.Thread(target=adapter.classify, args=(["a", "b"], job_id))
+        for job_id in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert adapter.calls == 6
+    assert adapter.max_in_flight <= 2
+
+
+class PerPromptProvider(FakeProvider):
+    """Provider making one request per prompt, like the OpenAI adapter."""
+
+    request_per_prompt = True
+
+    def _send(self, prompts):
+        for _ in prompts:
+            self._throttle()
+        return super()._send(prompts)
+
+
+@pytest.mark.parametrize("adapter_cls, waited", [(FakeProvider, 0.5), (PerPromptProvider, 2.0)])
+def test_rate_limit_counts_provider_requests(adapter_cls, waited):
+    clock = FakeClock()
+    guard = get_guard("fake")
+    guard.bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+    adapter_cls().classify(["a", "b", "c", "d", "e", "f"], job_id=1)
+    # three batches of two prompts: three tokens, or six for per-prompt requests
+    assert clock.now == pytest.approx(waited)
+
+
+def test_guarded_send_raises_when_open():
+    guard = get_guard("fake")
+    for _ in range(guard.breaker.failure_threshold):
+        guard.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        FakeProvider()._guarded_send(["a"])
@@ -0,0 +1,160 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app import app, get_adapter_dependency, get_local_classifier_dependency
+from backend.database import get_session
+from backend.llm_adapter import AbstractAdapter
+from backend.local_classifier import (
+    NaiveBayesClassifier,
+    get_local_classifier,
+    model_version,
+    train_from_session,
+)
+from backend.models import Transaction, UserRule
+
+SAMPLES = [
+    ("tesco stores", "Groceries"),
+    ("tesco express", "Groceries"),
+    ("sainsburys local", "Groceries"),
+    ("sainsburys superstore", "Groceries"),
+    ("tfl travel charge", "Transport"),
+    ("tfl oyster", "Transport"),
+    ("trainline", "Transport"),
+    ("uber trip", "Transport"),
+    ("netflix com", "Subscriptions"),
+    ("spotify premium", "Subscriptions"),
+]
+
+
+def test_predicts_similar_merchants():
+    model = NaiveBayesClassifier().fit(SAMPLES)
+    label, confidence = model.predict("tesco metro")
+    assert label == "Groceries"
+    assert confidence > 0.5
+    # unfamiliar text is never predicted confidently
+    assert model.predict("zzqx widgets")[1] < 0.5
+    assert model.predict("tfl travel")[0] == "Transport"
+    assert sum(model.predict_proba("anything").values()) == pytest.approx(1.0)
+
+
+def test_empty_model_predicts_nothing():
+    assert NaiveBayesClassifier().predict("tesco") == ("", 0.0)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    model = NaiveBayesClassifier().fit(SAMPLES, min_count=2)
+    path = model.save(tmp_path / "model.json.gz")
+    loaded = NaiveBayesClassifier.load(path)
+    assert loaded.labels == model.labels
+    assert loaded.predict_proba("tesco metro") == pytest.approx(
+        model.predict_proba("tesco metro")
+    )
+    assert model_version(loaded) == model_version(model)
+    assert model_version(model.fit(SAMPLES)) != model_version(loaded)
+
+
+def test_get_local_classifier_reads_artifact(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_MODEL_PATH", str(tmp_path / "model.json.gz"))
+    assert get_local_classifier() is None
+    NaiveBayesClassifier().fit(SAMPLES).save(tmp_path / "model.json.gz")
+    model = get_local_classifier()
+    assert model is not None
+    assert get_local_classifier() is model
+
+
+def test_train_from_session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(
+            Transaction(
+                job_id=1,
+                merchant_signature="tesco stores",
+                category="Groceries",
+                label="Groceries",
+                classification_type="llm",
+            )
+        )
+        session.add(
+            Transaction(
+                job_id=1,
+                merchant_signature="mystery",
+                category="unknown",
+                label="unknown",
+                classification_type="unknown",
+            )
+        )
+        session.add(UserRule(user_id=1, label="Transport", pattern="tfltravelcharge"))
+        session.commit()
+        model = train_from_session(session)
+    assert model.labels == ["Groceries", "Transport"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("AUTH_BYPASS", "1")
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    class CountingAdapter(AbstractAdapter):
+        def __init__(self):
+            super().__init__("test")
+            self.prompts = []
+
+        def _send(self, prompts):
+            self.prompts.extend(prompts)
+            return {"labels": [("Fees", 0.5)] * len(prompts), "usage": {"total_tokens": 0}}
+
+    adapter = CountingAdapter()
+    model = NaiveBayesClassifier().fit(SAMPLES)
+    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_adapter_dependency] = lambda: adapter
+    app.dependency_overrides[get_local_classifier_dependency] = lambda: model
+    monkeypatch.setattr("backend.llm_adapter.get_session", get_session_override)
+    try:
+        with TestClient(app) as c:
+            c.adapter = adapter
+            yield c
+    finally:
+        app.dependency_overrides.clear()
+        from backend import app as app_module
+
+        app_module.SIGNATURE_CACHE.clear()
+
+
+def test_confident_local_predictions_skip_llm(client, monkeypatch):
+    monkeypatch.setenv("LOCAL_CLASSIFIER_THRESHOLD", "0.6")
+    content = "\n".join(
+        json.dumps({"description": d, "type": "debit"})
+        for d in ["Tesco Stores 1234", "Zzqx Widgets"]
+    )
+    job_id = client.post(
+        "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+    ).json()["job_id"]
+    txs = client.post("/classify", json={"job_id": job_id}).json()["transactions"]
+    assert txs[0]["category"] == "Groceries"
+    assert txs[0]["classification_type"] == "local"
+    # the unfamiliar merchant is escalated to the LLM
+    assert client.adapter.prompts == ["zzqx widgets"]
+    assert txs[1]["classification_type"] == "llm"
+
+
+def test_threshold_escalates_everything(client, monkeypatch):
+    monkeypatch.setenv("LOCAL_CLASSIFIER_THRESHOLD", "1.01")
+    content = json.dumps({"description": "Tesco Stores 1234", "type": "debit"})
+    job_id = client.post(
+        "/upload", data=content, headers={"Content-Type": "application/x-ndjson"}
+    ).json()["job_id"]
+    txs = client.post("/classify", json={"job_id": job_id}).json()["transactions"]
+    assert client.adapter.prompts == ["tesco stores 1234"]
+    assert txs[0]["classification_type"] == "llm"
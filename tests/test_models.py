@@ -0,0 +1,138 @@
+import json
+from datetime import date
+
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend import migrations
+from backend.models import Transaction, amount_to_pence, format_pence
+
+
+def _engine():
+    return create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+
+
+def test_pence_helpers():
+    assert amount_to_pence("12.34") == 1234
+    assert amount_to_pence("-0.05") == -5
+    assert amount_to_pence("1.005") is None
+    assert amount_to_pence("abc") is None
+    assert amount_to_pence(None) is None
+    assert format_pence(-5) == "-0.05"
+    assert format_pence(123456) == "1234.56"
+
+
+def test_transaction_round_trips_through_columns():
+    data = {
+        "date": "2024-01-05",
+        "description": "TESCO 123",
+        "amount": "12.30",
+        "balance": "100.00",
+        "type": "debit",
+        "merchant_signature": "tesco",
+        "category": "Groceries",
+        "label": "Groceries",
+        "classification_type": "rule",
+    }
+    odd = {"date": "05/01/2024", "amount": "5", "type": "debit", "category": None, "x": [1]}
+    engine = _engine()
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Transaction.from_data(1, data))
+        session.add(Transaction.from_data(1, odd))
+        session.commit()
+        first, second = session.exec(select(Transaction).order_by(Transaction.id)).all()
+        assert first.date == date(2024, 1, 5) and first.amount_pence == 1230
+        assert first.extras == {"balance": "100.00"}
+        assert first.data == data
+        assert second.amount_pence == 500 and second.date is None
+        # amounts are compared to the penny and come back in canonical form
+        assert "amount" not in second.extras
+        assert second.data == {**odd, "amount": "5.00"}
+        rows = session.exec(select(*Transaction.data_columns())).all()
+        assert [Transaction.data_from_row(r) for r in rows] == [data, {**odd, "amount": "5.00"}]
+
+
+def test_exact_amounts_skip_extras():
+    for amount in ("+12.50", 12.5, "12.5", 12):
+        tx = Transaction.from_data(1, {"amount": amount, "type": "credit"})
+        assert tx.extras is None
+    assert Transaction.from_data(1, {"amount": "1.005"}).extras == {"amount": "1.005"}
+
+
+def test_upgrade_moves_json_into_columns():
+    engine = _engine()
+    tx = {"date": "2024-02-01", "amount": "9.99", "type": "debit", "merchant_signature": "netflix"}
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                'CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, '
+                "description VARCHAR, data JSON, label VARCHAR, classification_type VARCHAR)"
+            )
+        )
+        conn.execute(
+            text(
+                'INSERT INTO "transaction" (job_id, description, data, label, classification_type) '
+                "VALUES (3, 'NETFLIX', :data, 'Subscriptions', 'llm')"
+            ),
+            {"data": json.dumps({**tx, "description": "NETFLIX", "label": "Subscriptions", "classification_type": "llm"})},
+        )
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    assert "data" not in {c["name"] for c in inspect(engine).get_columns("transaction")}
+    with Session(engine) as session:
+        row = session.exec(select(Transaction)).one()
+        assert row.amount_pence == 999 and row.merchant_signature == "netflix"
+        assert row.data == {**tx, "description": "NETFLIX", "label": "Subscriptions", "classification_type": "llm"}
+
+
+def test_upgrade_keeps_data_column_on_old_sqlite(monkeypatch):
+    monkeypatch.setattr(migrations.sqlite3, "sqlite_version_info", (3, 31, 1))
+    engine = _engine()
+    tx = {"date": "2024-02-01", "amount": "9.99", "type": "debit", "merchant_signature": "netflix"}
+    with engine.begin() as conn:
+        conn.execute(
+            text('CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, data JSON)')
+        )
+        conn.execute(
+            text('INSERT INTO "transaction" (job_id, data) VALUES (3, :data)'),
+            {"data": json.dumps(tx)},
+        )
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    assert "data" in {c["name"] for c in inspect(engine).get_columns("transaction")}
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT data FROM "transaction"')).scalar() is None
+    with Session(engine) as session:
+        session.add(Transaction.from_data(3, {"amount": "1.00"}))
+        session.commit()
+        rows = session.exec(select(Transaction).order_by(Transaction.id)).all()
+        assert [row.data for row in rows] == [tx, {"amount": "1.00"}]
+
+
+def test_upgrade_hashes_and_compresses_existing_uploads():
+    from backend.models import ProcessingJob, Upload
+    from backend.uploads import content_hash, upload_lines
+
+    engine = _engine()
+    with engine.begin() as conn:
+        conn.execute(
+            text("CREATE TABLE upload (id INTEGER PRIMARY KEY, content VARCHAR NOT NULL, created_at DATETIME)")
+        )
+        conn.execute(
+            text("CREATE TABLE processingjob (id INTEGER PRIMARY KEY, upload_id INTEGER, status VARCHAR)")
+        )
+        conn.execute(text("INSERT INTO upload (content) VALUES ('{\"a\": 1}\n\n')"))
+        conn.execute(text("INSERT INTO processingjob (upload_id, status) VALUES (1, 'completed')"))
+    migrations.upgrade(engine)
+    migrations.upgrade(engine)
+    with Session(engine) as session:
+        upload = session.exec(select(Upload)).one()
+        assert upload.content_hash == content_hash('{"a": 1}')
+        assert upload.content == "" and upload.body.startswith(b"\x1f\x8b")
+        assert list(upload_lines(session, upload.id)) == ['{"a": 1}']
+        job = session.exec(select(ProcessingJob)).one()
+        assert job.user_id is None and job.rules_version is None
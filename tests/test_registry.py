@@ -0,0 +1,76 @@
+import json
+from pathlib import Path
+
+import pytest
+from jsonschema import ValidationError
+
+from bankcleanr import registry
+from backend.analytics import generate_summary
+
+
+def test_documents_and_validators_are_cached(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "object", "required": ["a"]}))
+    validator = registry.get_validator(path)
+    assert registry.get_validator(str(path)) is validator
+    assert registry.load_json(path) is registry.load_json(path)
+
+    registry.validate({"a": 1}, validator)
+    with pytest.raises(ValidationError):
+        registry.validate({}, validator)
+
+
+def test_load_categories_returns_copy():
+    categories = registry.load_categories()
+    categories.append("Bogus")
+    assert "Bogus" not in registry.load_categories()
+    assert "Bogus" not in registry.category_set()
+
+
+def test_summary_does_not_reread_files(tmp_path: Path, monkeypatch):
+    txs = [{"date": "2024-01-10", "amount": "10", "merchant_signature": "a", "type": "credit", "category": "Income"}]
+    kwargs = dict(
+        job_id="00000000-0000-0000-0000-000000000000",
+        user_id="user",
+        period={"start": "2024-01-01", "end": "2024-01-31"},
+        output_dir=tmp_path,
+    )
+    generate_summary(txs, **kwargs)
+
+    reads = []
+    original = Path.read_text
+
+    def tracking_read_text(self, *args, **kwargs):
+        reads.append(self)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "read_text", tracking_read_text)
+    built = registry._validator.cache_info().misses
+    generate_summary(txs, **kwargs)
+    assert reads == []
+    assert registry._validator.cache_info().misses == built
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        {"date": "d", "description": "x", "amount": "1", "merchant_signature": "", "type": "credit"},
+        {"date": "d", "description": "x", "amount": "1", "balance": None, "merchant_signature": "", "type": "debit"},
+        {"date": "d", "description": "x", "amount": 1, "merchant_signature": "", "type": "credit"},
+        {"date": "d", "description": "x", "amount": "1", "merchant_signature": "", "type": "refund"},
+        {"date": "d", "description": "x", "amount": "1", "merchant_signature": "", "type": ["credit"]},
+        {"date": "d", "description": "x", "amount": "1", "merchant_signature": ""},
+        {"date": "d", "description": "x", "amount": "1", "merchant_signature": "", "type": "credit", "extra": 1},
+        {"date": "d", "description": "x", "amount": "1", "balance": 3, "merchant_signature": "", "type": "credit"},
+        ["not", "an", "object"],
+    ],
+)
+def test_transaction_checker_agrees_with_jsonschema(item):
+    path = registry.transaction_schema_path()
+    check = registry.get_checker(path)
+    expected = list(registry.get_validator(path).iter_errors(item))
+    if expected:
+        with pytest.raises(ValidationError):
+            check(item)
+    else:
+        check(item)
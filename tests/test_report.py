@@ -1,6 +1,8 @@
 import json
 import os
 import sys
+import threading
+import time
 import types
 from pathlib import Path
 
@@ -33,6 +35,7 @@ class DummyCSS:
 def client_fixture(tmp_path: Path, monkeypatch):
     os.environ["AUTH_BYPASS"] = "1"
     os.environ["STORAGE_DIR"] = str(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
 
     engine = create_engine(
         "sqlite://",
@@ -46,11 +49,13 @@ def client_fixture(tmp_path: Path, monkeypatch):
             yield session
 
     def dummy_llm(prompt: str):
+        dummy_llm.prompts.append(prompt)
         return "<html><body>Report</body></html>", {
             "prompt_tokens": 10,
             "completion_tokens": 5,
         }
 
+    dummy_llm.prompts = []
     tracker = DailyCostTracker(limit=1.0)
     monkeypatch.setattr("backend.llm_adapter.cost_tracker", tracker)
     monkeypatch.setattr("backend.llm_adapter.get_session", get_session_override)
@@ -61,6 +66,7 @@ def client_fixture(tmp_path: Path, monkeypatch):
     app.dependency_overrides[get_llm] = lambda: dummy_llm
 
     with TestClient(app) as c:
+        c.llm = dummy_llm
         yield c, engine
 
     app.dependency_overrides.clear()
@@ -73,9 +79,7 @@ def _create_job(client: TestClient) -> int:
     return resp.json()["job_id"]
 
 
-def test_report_generation(client: tuple[TestClient, any], tmp_path: Path):
-    client_obj, engine = client
-    job_id = _create_job(client_obj)
+def _write_summary(job_id: int) -> None:
     summary = {
         "job_id": str(job_id),
         "user_id": "1",
@@ -83,13 +87,33 @@ def test_report_generation(client: tuple[TestClient, any], tmp_path: Path):
         "currency": "GBP",
         "totals": {"income": 0, "expenses": 0, "net": 0},
         "categories": [],
+        "generated_at": f"2024-02-0{job_id}T00:00:00Z",
     }
     summary_path = Path(os.environ["STORAGE_DIR"]) / f"{job_id}_summary_v1.json"
     summary_path.write_text(json.dumps(summary))
 
+
+def _wait_for_report(client: TestClient, job_id: int) -> dict:
+    for _ in range(500):
+        status = client.get(f"/report/{job_id}/status").json()
+        if status["status"] != "pending":
+            return status
+        time.sleep(0.01)
+    raise AssertionError("report not generated")
+
+
+def test_report_generation(client: tuple[TestClient, any], tmp_path: Path):
+    client_obj, engine = client
+    job_id = _create_job(client_obj)
+    _write_summary(job_id)
+
     resp = client_obj.get(f"/report/{job_id}")
-    assert resp.status_code == 200
-    url = resp.json()["url"]
+    assert resp.status_code == 202
+    assert resp.json()["status_url"] == f"/report/{job_id}/status"
+    status = _wait_for_report(client_obj, job_id)
+    assert status["status"] == "ready"
+    url = status["url"]
+    assert client_obj.get(f"/report/{job_id}").json()["url"].startswith(f"/download/{job_id}/report")
 
     download = client_obj.get(url)
     assert download.status_code == 200
@@ -115,3 +139,140 @@ def test_report_missing_summary(client: tuple[TestClient, any]):
     job_id = _create_job(client_obj)
     resp = client_obj.get(f"/report/{job_id}")
     assert resp.status_code == 404
+
+
+def test_identical_summaries_share_cached_report(client: tuple[TestClient, any]):
+    client_obj, engine = client
+    first = _create_job(client_obj)
+    _write_summary(first)
+    client_obj.get(f"/report/{first}")
+    assert _wait_for_report(client_obj, first)["status"] == "ready"
+
+    # a re-upload summarises to the same content under another job id
+    second = _create_job(client_obj)
+    _write_summary(second)
+    resp = client_obj.get(f"/report/{second}")
+    assert resp.status_code == 200 and resp.json()["status"] == "ready"
+    assert len(client_obj.llm.prompts) == 1
+    assert '"job_id"' not in client_obj.llm.prompts[0]
+    storage = Path(os.environ["STORAGE_DIR"])
+    assert (storage / f"{second}_report.pdf").read_bytes() == (storage / f"{first}_report.pdf").read_bytes()
+    assert len(list((storage / "report_cache").glob("*.html"))) == 1
+
+    with Session(engine) as session:
+        assert {e.job_id for e in session.exec(select(LLMCost))} == {first}
+
+
+def test_report_status_before_request(client: tuple[TestClient, any]):
+    client_obj, _ = client
+    job_id = _create_job(client_obj)
+    assert client_obj.get(f"/report/{job_id}/status").status_code == 404
+    _write_summary(job_id)
+    resp = client_obj.get(f"/report/{job_id}/status")
+    assert resp.status_code == 404 and resp.json()["detail"] == "Report not requested"
+
+
+def _full_summary():
+    return {
+        "job_id": "1",
+        "user_id": "1",
+        "period": {"start": "2024-01-01", "end": "2024-03-31"},
+        "currency": "GBP",
+        "totals": {"income": 3000.0, "expenses": -1250.5, "net": 1749.5},
+        "categories": [
+            {"name": "Groceries", "total": -1000.0, "count": 12, "sample_merchants": ["aldi", "tesco"]},
+            {"name": "Subscriptions", "total": -250.5, "count": 3, "sample_merchants": ["<netflix>"]},
+            {"name": "Income", "total": 3000.0, "count": 3, "sample_merchants": ["acme"]},
+        ],
+        "recurring": [
+            {"merchant": "netflix", "cadence": "monthly", "avg_amount": 10.99, "count": 3, "last_seen": "2024-03-01"}
+        ],
+        "highlights": {"overspending": ["Category Groceries up 40% in 2024-03"], "anomalies": []},
+    }
+
+
+def test_render_report_html_is_deterministic():
+    from backend.report import render_report_html
+
+    summary = _full_summary()
+    html = render_report_html(summary, "Spending was steady.\n\nGroceries led.")
+    assert html == render_report_html(summary, "Spending was steady.\n\nGroceries led.")
+    assert "<p>Spending was steady.</p>" in html and "<p>Groceries led.</p>" in html
+    assert "1,749.50" in html and "-1,250.50" in html
+    assert "&lt;netflix&gt;" in html and "<netflix>" not in html
+    assert 'style="width: 100.0%"' in html and 'style="width: 25.1%"' in html
+    assert "Category Groceries up 40% in 2024-03" in html
+    assert "Unusual transactions" not in html
+    assert "Spending was steady" not in render_report_html(summary)
+
+
+def test_report_without_narrative_skips_llm(client: tuple[TestClient, any], monkeypatch):
+    client_obj, engine = client
+    monkeypatch.setenv("REPORT_NARRATIVE", "0")
+    app.dependency_overrides.pop(get_llm)
+    job_id = _create_job(client_obj)
+    _write_summary(job_id)
+    assert client_obj.get(f"/report/{job_id}").status_code == 202
+    assert _wait_for_report(client_obj, job_id)["status"] == "ready"
+    assert client_obj.llm.prompts == []
+    with Session(engine) as session:
+        assert [e.tokens_in for e in session.exec(select(LLMCost))] == [0]
+
+
+def test_report_without_api_key_skips_narrative(client: tuple[TestClient, any], monkeypatch):
+    client_obj, _ = client
+    monkeypatch.delenv("REPORT_NARRATIVE", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    app.dependency_overrides.pop(get_llm)
+    assert get_llm() is None
+    job_id = _create_job(client_obj)
+    _write_summary(job_id)
+    assert client_obj.get(f"/report/{job_id}").status_code == 202
+    assert _wait_for_report(client_obj, job_id)["status"] == "ready"
+    assert client_obj.llm.prompts == []
+
+
+def test_narrative_failure_still_renders_report(client: tuple[TestClient, any]):
+    client_obj, _ = client
+    calls = []
+
+    def broken_llm(prompt):
+        calls.append(prompt)
+        raise RuntimeError("provider down")
+
+    app.dependency_overrides[get_llm] = lambda: broken_llm
+    job_id = _create_job(client_obj)
+    _write_summary(job_id)
+    client_obj.get(f"/report/{job_id}")
+    assert _wait_for_report(client_obj, job_id)["status"] == "ready"
+    storage = Path(os.environ["STORAGE_DIR"])
+    assert (storage / f"{job_id}_report.pdf").exists()
+    # not cached, so the narrative is retried on the next request
+    assert not list((storage / "report_cache").glob("*.pdf"))
+    assert client_obj.get(f"/report/{job_id}").status_code == 202
+    _wait_for_report(client_obj, job_id)
+    assert len(calls) == 2
+
+
+def test_uncached_report_stays_ready(client: tuple[TestClient, any]):
+    client_obj, _ = client
+    release = threading.Event()
+
+    def broken_llm(prompt):
+        release.wait(5)
+        raise RuntimeError("provider down")
+
+    app.dependency_overrides[get_llm] = lambda: broken_llm
+    first, second = _create_job(client_obj), _create_job(client_obj)
+    _write_summary(first)
+    _write_summary(second)
+    # the second job shares the first job's running generation
+    assert client_obj.get(f"/report/{first}").status_code == 202
+    assert client_obj.get(f"/report/{second}").status_code == 202
+    release.set()
+    storage = Path(os.environ["STORAGE_DIR"])
+    for job_id in (first, second):
+        assert _wait_for_report(client_obj, job_id)["status"] == "ready"
+        # polling again still finds the uncached report
+        assert client_obj.get(f"/report/{job_id}/status").json()["status"] == "ready"
+        assert (storage / f"{job_id}_report.pdf").exists()
@@ -0,0 +1,106 @@
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend import search
+from backend.models import ProcessingJob, Transaction, Upload
+
+
+def _engine(install=True):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    if install:
+        search.install(engine)
+    return engine
+
+
+def _seed(session):
+    upload = Upload(filename="t.jsonl", content="")
+    session.add(upload)
+    session.commit()
+    jobs = []
+    for _ in range(2):
+        job = ProcessingJob(upload_id=upload.id, status="completed")
+        session.add(job)
+        session.commit()
+        jobs.append(job.id)
+    descriptions = ["TESCO Stores 123", "Coffee shop", "tesco express", "Uber", None]
+    for job_id in jobs:
+        for desc in descriptions:
+            session.add(Transaction(job_id=job_id, description=desc, label="x"))
+    session.commit()
+    return jobs
+
+
+def _search(session, job_id, term):
+    bind = session.get_bind()
+    query = (
+        select(Transaction.description)
+        .where(Transaction.job_id == job_id)
+        .where(search.description_filter(bind, term))
+        .order_by(Transaction.id)
+    )
+    return session.exec(query).all()
+
+
+def test_fts_matches_contains():
+    plain, indexed = _engine(install=False), _engine()
+    with Session(plain) as a, Session(indexed) as b:
+        job_a, job_b = _seed(a)[1], _seed(b)[1]
+        for term in ["tesco", "TESCO", "sto", "es", "shop", "nomatch", "%"]:
+            assert _search(b, job_b, term) == _search(a, job_a, term), term
+        assert _search(b, job_b, "tesco") == ["TESCO Stores 123", "tesco express"]
+
+
+def test_old_sqlite_falls_back_to_like(monkeypatch):
+    monkeypatch.setattr(search.sqlite3, "sqlite_version_info", (3, 31, 1))
+    engine = _engine()
+    with Session(engine) as session:
+        job_id = _seed(session)[0]
+        tables = session.exec(text("SELECT name FROM sqlite_master WHERE type = 'table'")).all()
+        assert (search.FTS_TABLE,) not in tables
+        assert _search(session, job_id, "tesco") == ["TESCO Stores 123", "tesco express"]
+
+
+def test_fts_follows_updates_and_deletes():
+    engine = _engine()
+    with Session(engine) as session:
+        job_id = _seed(session)[0]
+        tx = session.exec(
+            select(Transaction).where(Transaction.description == "Uber")
+        ).first()
+        tx.description = "Uber Eats"
+        session.add(tx)
+        session.commit()
+        assert _search(session, job_id, "eats") == ["Uber Eats"]
+        session.delete(tx)
+        session.commit()
+        assert _search(session, job_id, "uber") == []
+
+
+def test_install_is_idempotent_and_indexes_existing_rows():
+    engine = _engine(install=False)
+    with Session(engine) as session:
+        job_id = _seed(session)[0]
+    search.install(engine)
+    search.install(engine)
+    with Session(engine) as session:
+        assert _search(session, job_id, "coffee") == ["Coffee shop"]
+
+
+def test_filters_use_job_indexes():
+    engine = _engine()
+    with engine.connect() as conn:
+        for column, index in [
+            ("classification_type", "ix_transaction_job_type"),
+            ("label", "ix_transaction_job_label"),
+        ]:
+            plan = conn.execute(
+                text(
+                    f'EXPLAIN QUERY PLAN SELECT id FROM "transaction" '
+                    f"WHERE job_id = 1 AND {column} = 'rule'"
+                )
+            ).all()
+            assert index in " ".join(row[-1] for row in plan)
@@ -0,0 +1,131 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from backend import summary_shards
+from backend.analytics import generate_summary
+from backend.summary_shards import generate_summary_sharded, shard_of
+
+PERIOD = {"start": "2023-01-01", "end": "2024-12-31"}
+
+
+def _transactions(seed=0, n=600):
+    rng = random.Random(seed)
+    cats = ["Groceries", "Transport", "Subscriptions", "Dining Out", None]
+    txs = []
+    for _ in range(n):
+        txs.append(
+            {
+                "date": f"20{rng.randint(23, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "amount": f"{rng.randint(1, 9000) / 100:.2f}",
+                "type": rng.choice(["debit", "debit", "credit"]),
+                "merchant_signature": f"m{rng.randint(0, 40)}",
+                "category": rng.choice(cats),
+            }
+        )
+    for month in range(1, 13):
+        txs.append(
+            {
+                "date": f"2024-{month:02d}-03",
+                "amount": "9.99" if month < 12 else "12.99",
+                "type": "debit",
+                "merchant_signature": "netflix",
+                "category": "Subscriptions",
+            }
+        )
+    return txs
+
+
+def _strip(summary):
+    return {k: v for k, v in summary.items() if k != "generated_at"}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sharded_matches_serial(tmp_path: Path, monkeypatch, seed):
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", 1)
+    txs = _transactions(seed)
+    expected = generate_summary(txs, "1", "0", PERIOD, output_dir=tmp_path)
+    sharded = generate_summary_sharded(txs, "1", "0", PERIOD, output_dir=tmp_path, workers=3)
+    assert _strip(sharded) == _strip(expected)
+    assert expected["recurring"] and expected["highlights"]["overspending"]
+
+
+def test_sub_penny_amounts_fall_back_to_serial(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", 1)
+    monkeypatch.setattr(
+        summary_shards, "_partition", lambda *a: pytest.fail("should not shard")
+    )
+    txs = _transactions(1, n=50)
+    txs[0]["amount"] = "1.005"
+    summary = generate_summary_sharded(txs, "1", "0", PERIOD, output_dir=tmp_path, workers=2)
+    assert _strip(summary) == _strip(generate_summary(txs, "1", "0", PERIOD, output_dir=tmp_path))
+
+
+def test_shard_of_is_stable():
+    # fixed across processes and runs, unlike hash()
+    assert shard_of("netflix", 8) == 3
+    assert {shard_of(f"m{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+@pytest.fixture
+def session():
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import Session, SQLModel, create_engine
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _stored_job(session, txs):
+    from backend.models import ProcessingJob, Transaction, Upload
+
+    upload = Upload()
+    session.add(upload)
+    session.commit()
+    job = ProcessingJob(upload_id=upload.id, status="completed")
+    session.add(job)
+    session.commit()
+    session.add_all(Transaction.from_data(job.id, tx) for tx in txs)
+    session.commit()
+    return job.id
+
+
+def test_summary_from_rows_matches_aggregate(session, monkeypatch):
+    from backend.summary_state import SummaryAggregate
+
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", 1)
+    partition = summary_shards._partition
+    calls = []
+    monkeypatch.setattr(
+        summary_shards, "_partition", lambda *a: calls.append(1) or partition(*a)
+    )
+    txs = _transactions(2, n=200) + [{"amount": "1.00", "type": "debit", "merchant_signature": "x"}]
+    job_id = _stored_job(session, txs)
+    summary = summary_shards.summary_from_rows(session, job_id, "0", workers=2)
+    expected = SummaryAggregate.from_transactions(txs).summary(str(job_id), "0")
+    assert calls and _strip(summary) == _strip(expected)
+
+
+def test_large_fallback_summary_is_sharded(session, monkeypatch):
+    from backend.app import _fallback_summary
+    from backend.models import JobSummaryState
+
+    txs = _transactions(0, n=30)
+    job_id = _stored_job(session, txs)
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", len(txs))
+    monkeypatch.setattr(
+        summary_shards, "summary_from_rows", lambda s, j, u: {"sharded": j}
+    )
+    assert _fallback_summary(session, job_id, "0") == {"sharded": job_id}
+    assert session.get(JobSummaryState, job_id) is None
+
+    # smaller jobs, and jobs with stored aggregates, use the aggregates
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", len(txs) + 1)
+    assert _fallback_summary(session, job_id, "0")["job_id"] == str(job_id)
+    monkeypatch.setattr(summary_shards, "SHARD_MIN_ROWS", 1)
+    assert _fallback_summary(session, job_id, "0")["job_id"] == str(job_id)
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.models import ProcessingJob, Transaction, Upload
+from backend.summary_sql import summary_from_db
+from backend.summary_state import SummaryAggregate, save_state
+
+
+def _transactions(seed=0, n=300):
+    rng = random.Random(seed)
+    cats = ["Groceries", "Transport", "Subscriptions", "Income", "Weird", None, ""]
+    sigs = ["netflix", "tesco", "uber", "gym", "acme payroll", "kiosk"]
+    txs = []
+    for _ in range(n):
+        month = rng.randint(1, 9)
+        txs.append(
+            {
+                "date": f"2024-{month:02d}-{rng.choice([1, 1, 8, 15, 28]):02d}",
+                "amount": rng.choice(["10", "10.5", "12.99", "40", "-55.10", "0.1", "1999.99"]),
+                "type": rng.choice(["debit", "debit", "credit", None]),
+                "merchant_signature": rng.choice(sigs),
+                "category": rng.choice(cats),
+            }
+        )
+    # monthly subscription with a price rise, so recurring and its
+    # overspending highlight have something to find
+    for month in range(1, 10):
+        txs.append(
+            {
+                "date": f"2024-{month:02d}-03",
+                "amount": "9.99" if month < 9 else "11.99",
+                "type": "debit",
+                "merchant_signature": "spotify",
+                "category": "Subscriptions",
+            }
+        )
+    rng.shuffle(txs)
+    txs.append({"date": "", "amount": "1", "type": "debit", "merchant_signature": "x"})
+    txs.append({"amount": "2", "type": "debit", "merchant_signature": "x"})
+    return txs
+
+
+def _strip(summary):
+    return {k: v for k, v in summary.items() if k != "generated_at"}
+
+
+@pytest.fixture
+def session():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _job(session, txs):
+    upload = Upload(filename="t.jsonl", content="")
+    session.add(upload)
+    session.commit()
+    job = ProcessingJob(upload_id=upload.id, status="completed")
+    session.add(job)
+    session.commit()
+    session.add_all(Transaction.from_data(job.id, tx) for tx in txs)
+    session.commit()
+    return job.id
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("persisted", [True, False])
+def test_matches_aggregate(session, seed, persisted):
+    txs = _transactions(seed)
+    job_id = _job(session, txs)
+    state = SummaryAggregate.from_transactions(txs)
+    if persisted:
+        save_state(session, job_id, state)
+        session.commit()
+    expected = state.summary(str(job_id), "user")
+    assert expected["recurring"] and expected["highlights"]["overspending"]
+    assert _strip(summary_from_db(session, job_id, "user")) == _strip(expected)
+
+
+def test_empty_job(session):
+    job_id = _job(session, [{"date": "", "amount": "1", "merchant_signature": "x"}])
+    summary = summary_from_db(session, job_id, "user")
+    assert summary["period"] == {"start": "", "end": ""}
+    assert summary["totals"] == {"income": 0.0, "expenses": 0.0, "net": 0.0}
+    assert summary["categories"] == [] and summary["recurring"] == []
+
+
+def test_untyped_fields_fall_back(session):
+    txs = _transactions(0, n=20)
+    txs.append({"date": "01/02/2024", "amount": "3", "merchant_signature": "odd"})
+    job_id = _job(session, txs)
+    assert summary_from_db(session, job_id, "user") is None
+
+    # extras that only hold undated leftovers do not force the fallback
+    other = _job(session, [*_transactions(0, n=20), {"amount": "n/a", "merchant_signature": "z"}])
+    assert summary_from_db(session, other, "user") is not None
@@ -0,0 +1,117 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from backend.analytics import generate_summary
+from backend.summary_state import SummaryAggregate
+
+
+def _transactions(seed=0, n=120):
+    rng = random.Random(seed)
+    cats = ["Groceries", "Transport", "Subscriptions", "Weird", None]
+    txs = []
+    for i in range(n):
+        month = rng.randint(1, 6)
+        txs.append(
+            {
+                "date": f"2024-{month:02d}-{rng.choice([1, 1, 8, 15]):02d}",
+                "amount": str(rng.choice([10, 10, 12, 40, 55])),
+                "type": rng.choice(["debit", "debit", "credit"]),
+                "merchant_signature": rng.choice(["netflix", "tesco", "uber", "gym"]),
+                "category": rng.choice(cats),
+            }
+        )
+    txs.append({"date": "", "amount": "1", "type": "debit", "merchant_signature": "x"})
+    return txs
+
+
+def _strip(summary):
+    return {k: v for k, v in summary.items() if k != "generated_at"}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_full_recomputation(tmp_path: Path, seed):
+    txs = _transactions(seed)
+    dated = [t for t in txs if t.get("date")]
+    dates = [t["date"] for t in dated]
+    expected = generate_summary(
+        dated,
+        job_id="1",
+        user_id="0",
+        period={"start": min(dates), "end": max(dates)},
+        output_dir=tmp_path,
+    )
+    state = SummaryAggregate.from_transactions(txs)
+    assert _strip(state.summary("1", "0")) == _strip(expected)
+
+
+def test_remove_and_relabel_match_rebuild():
+    txs = _transactions(1)
+    state = SummaryAggregate.from_transactions(txs)
+    for tx in txs[:40]:
+        state.remove(tx)
+    relabelled = {**txs[50], "category": "Health"}
+    state.replace(txs[50], relabelled)
+
+    remaining = txs[40:50] + [relabelled] + txs[51:]
+    rebuilt = SummaryAggregate.from_transactions(remaining)
+    assert state.summary("1", "0")["categories"] == rebuilt.summary("1", "0")["categories"]
+    assert state.summary("1", "0")["totals"] == rebuilt.summary("1", "0")["totals"]
+    assert state.period == rebuilt.period
+
+
+def test_remove_unknown_transaction_leaves_state_untouched():
+    txs = _transactions(2, n=10)
+    state = SummaryAggregate.from_transactions(txs)
+    before = state.to_dict()
+    with pytest.raises(ValueError):
+        state.remove({**txs[0], "amount": "999"})
+    assert state.to_dict() == before
+
+
+def test_exact_decimal_totals_and_roundtrip():
+    txs = [
+        {"date": "2024-01-01", "amount": "0.1", "type": "credit", "merchant_signature": "a"},
+        {"date": "2024-01-02", "amount": "0.2", "type": "credit", "merchant_signature": "a"},
+    ]
+    state = SummaryAggregate.from_transactions(txs)
+    state.add({"date": "2024-01-03", "amount": "0.1", "type": "credit", "merchant_signature": "b"})
+    state.remove({"date": "2024-01-03", "amount": "0.1", "type": "credit", "merchant_signature": "b"})
+    assert state.summary("1", "0")["totals"]["income"] == 0.3
+
+    restored = SummaryAggregate.from_dict(state.to_dict())
+    assert restored.to_dict() == state.to_dict()
+    assert _strip(restored.summary("1", "0")) == _strip(state.summary("1", "0"))
+
+
+def test_merchant_state_is_bounded(tmp_path: Path):
+    from backend.analytics import RECURRING_WINDOW
+
+    txs = [
+        {
+            "date": f"{2000 + i // 12}-{i % 12 + 1:02d}-05",
+            "amount": "9.99" if i % 7 else "10.49",
+            "type": "debit",
+            "merchant_signature": "netflix",
+            "category": "Subscriptions",
+        }
+        for i in range(240)
+    ]
+    state = SummaryAggregate.from_transactions(txs)
+    count, first, _, _, _, window = state.to_dict()["merchant_series"]["netflix"]
+    assert (count, first) == (240, "2000-01-05")
+    assert len(window) == RECURRING_WINDOW
+    assert window[-1][0] == "2019-12-05"
+
+    expected = generate_summary(
+        txs, job_id="1", user_id="0", period=state.period, output_dir=tmp_path, write=False
+    )
+    assert _strip(state.summary("1", "0")) == _strip(expected)
+    assert expected["recurring"][0]["count"] == 240
+
+    # relabelling keeps the merchant series exact
+    relabelled = {**txs[3], "category": "Entertainment"}
+    state.replace(txs[3], relabelled)
+    rebuilt = SummaryAggregate.from_transactions(txs[:3] + [relabelled] + txs[4:])
+    assert state.summary("1", "0")["recurring"] == rebuilt.summary("1", "0")["recurring"]